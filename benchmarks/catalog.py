@@ -0,0 +1,165 @@
+"""تولید کاتالوگ مصنوعی تأمین‌کنندگان و ترکیب فیلترهای جستجو برای بنچمارک
+
+هر دو تولیدکننده با seed ثابت قطعی هستند تا نتایج قبل و بعد از یک تغییر
+روی داده یکسان مقایسه شوند.
+"""
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List
+
+from database.models import CooperationType, RequestStatus, WorkStyle
+
+# شهرها با وزن تقریبی جمعیت؛ چند نگارش با حروف عربی/فاصله برای واقعی‌تر بودن داده
+CITIES = [
+    (("تهران", "طهران", "تهران "), 35),
+    (("مشهد",), 12),
+    (("اصفهان",), 8),
+    (("کرج",), 7),
+    (("شیراز",), 6),
+    (("تبریز",), 6),
+    (("قم",), 4),
+    (("اهواز",), 4),
+    (("کرمانشاه",), 3),
+    (("رشت",), 3),
+    (("بندر عباس", "بندرعباس"), 2),
+    (("بندر انزلی", "بندر‌انزلي"), 1),
+    (("یزد",), 2),
+    (("کیش", "كيش"), 1),
+]
+
+AREAS = ["شمال", "جنوب", "شرق", "غرب", "مرکز"]
+GENDERS = [("زن", 65), ("مرد", 35)]
+HAIR_COLORS = ["مشکی", "قهوه‌ای", "بلوند", "شرابی", "طلایی", "جوگندمی"]
+EYE_COLORS = ["مشکی", "قهوه‌ای", "عسلی", "سبز", "آبی", "طوسی"]
+SKIN_COLORS = ["روشن", "گندمی", "سبزه", "تیره"]
+SIZES = ["S", "M", "L", "XL"]
+FEATURES = [
+    "خال روی گونه", "موی بلند", "موی فر", "کک و مک", "بدون تتو", "تتو روی دست",
+    "چال گونه", "ابروی پهن", "لبخند زیبا", "قد بلند", "چشم رنگی", "موی کوتاه",
+]
+
+# انتخاب‌های موجود در کیبوردهای جستجوی درخواست‌کننده
+SEARCH_PRICE_RANGES = [
+    ((0, 500000), 20), ((500000, 1000000), 30), ((1000000, 2000000), 20),
+    ((2000000, float('inf')), 10), (None, 20),
+]
+SEARCH_AGE_RANGES = [((18, 25), 30), ((20, 30), 25), ((25, 35), 20), ((30, 45), 10), (None, 15)]
+SEARCH_FEATURES = ["موی بلند", "چشم سبز", "بدون تتو", "بلوند", "خال", "قد بلند"]
+
+REQUEST_STATUSES = [
+    (RequestStatus.PENDING, 30), (RequestStatus.ACCEPTED, 40),
+    (RequestStatus.REJECTED, 25), (RequestStatus.CANCELLED, 5),
+]
+# سهم درخواست‌هایی که به چند تأمین‌کننده پرطرفدار (شناسه‌های ۱ تا ۱۰) می‌رسند
+POPULAR_SUPPLIERS = 10
+POPULAR_SHARE = 0.1
+REQUESTS_EPOCH = datetime(2024, 1, 1)
+
+
+def _weighted(rng: random.Random, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights=weights)[0]
+
+
+def generate_suppliers(count: int, seed: int = 42) -> Iterator[Dict]:
+    """تولید ردیف‌های تأمین‌کننده با توزیع‌های نزدیک به داده واقعی"""
+    rng = random.Random(seed)
+    styles = [style.value for style in WorkStyle]
+    cooperation_types = [cooperation.value for cooperation in CooperationType]
+
+    for supplier_id in range(1, count + 1):
+        gender = _weighted(rng, GENDERS)
+        # سن بیشتر بین ۱۸ تا ۳۵ و کودکان به صورت جداگانه
+        if rng.random() < 0.05:
+            age = rng.randint(4, 15)
+            work_styles = ["children"] + rng.sample(styles, rng.randint(0, 1))
+        else:
+            age = max(16, min(60, int(rng.gauss(27, 6))))
+            work_styles = rng.sample(styles, rng.choices([1, 2, 3, 4], weights=[30, 40, 20, 10])[0])
+
+        # قیمت با توزیع log-normal و گرد شده به ۵۰ هزار تومان
+        has_price = rng.random() < 0.85
+        price_min = round(rng.lognormvariate(13.5, 0.6) / 50000) * 50000 + 100000 if has_price else None
+        price_max = price_min * rng.choice([1, 1.5, 2, 3]) if has_price else None
+
+        features = ", ".join(rng.sample(FEATURES, rng.choices([0, 1, 2, 3], weights=[40, 30, 20, 10])[0]))
+        city = rng.choice(_weighted(rng, CITIES))
+
+        yield {
+            "id": supplier_id,
+            "full_name": f"تأمین‌کننده {supplier_id}",
+            "gender": gender,
+            "age": age,
+            "phone_number": f"0912{supplier_id:07d}",
+            "height": int(rng.gauss(170 if gender == "زن" else 180, 7)),
+            "weight": int(rng.gauss(58 if gender == "زن" else 75, 8)),
+            "hair_color": rng.choice(HAIR_COLORS),
+            "eye_color": rng.choice(EYE_COLORS),
+            "skin_color": rng.choice(SKIN_COLORS),
+            "top_size": rng.choice(SIZES),
+            "bottom_size": rng.choice(SIZES),
+            "special_features": features or None,
+            "price_range_min": float(price_min) if has_price else None,
+            "price_range_max": float(price_max) if has_price else None,
+            "price_unit": rng.choice(["hourly", "daily", "project"]),
+            "city": city,
+            "area": rng.choice(AREAS),
+            "cooperation_types": rng.sample(cooperation_types, rng.randint(1, len(cooperation_types))),
+            "work_styles": work_styles,
+        }
+
+
+def generate_criteria(count: int, seed: int = 7) -> List[Dict]:
+    """تولید فیلترهای جستجو به همان شکلی که هندلرهای DemanderSearch در state ذخیره می‌کنند"""
+    rng = random.Random(seed)
+    styles = [style.value for style in WorkStyle]
+    criteria = []
+
+    for _ in range(count):
+        city = rng.choice(_weighted(rng, CITIES))
+        if rng.random() < 0.1:
+            # بخشی از کاربران فقط ابتدای نام شهر را تایپ می‌کنند
+            city = city[:2]
+
+        selected_styles = rng.sample(styles, rng.choices([0, 1, 2, 3], weights=[35, 40, 20, 5])[0])
+        criteria.append({
+            "search_city": city,
+            "search_gender": rng.choices(["زن", "مرد", None], weights=[50, 25, 25])[0],
+            "search_age_range": _weighted(rng, SEARCH_AGE_RANGES),
+            "search_work_styles": selected_styles,
+            "selected_search_styles": selected_styles,
+            "search_price_range": _weighted(rng, SEARCH_PRICE_RANGES),
+            "search_special_features": rng.choice(SEARCH_FEATURES) if rng.random() < 0.2 else None,
+        })
+    return criteria
+
+
+def generate_requests(count: int, suppliers: int, demanders: int, seed: int = 11) -> Iterator[Dict]:
+    """تولید درخواست‌ها با چند تأمین‌کننده پرطرفدار و حداکثر یک درخواست در انتظار برای هر جفت"""
+    rng = random.Random(seed)
+    pending_pairs = set()
+
+    for request_id in range(1, count + 1):
+        if rng.random() < POPULAR_SHARE:
+            supplier_id = rng.randint(1, min(POPULAR_SUPPLIERS, suppliers))
+        else:
+            supplier_id = rng.randint(1, suppliers)
+        demander_id = rng.randint(1, demanders)
+
+        status = _weighted(rng, REQUEST_STATUSES)
+        if status is RequestStatus.PENDING:
+            if (demander_id, supplier_id) in pending_pairs:
+                # uq_requests_pending_pair
+                status = RequestStatus.CANCELLED
+            else:
+                pending_pairs.add((demander_id, supplier_id))
+
+        yield {
+            "id": request_id,
+            "demander_id": demander_id,
+            "supplier_id": supplier_id,
+            "status": status,
+            "message": f"درخواست همکاری {request_id}",
+            "response_message": None if status is RequestStatus.PENDING else "پاسخ",
+            "created_at": REQUESTS_EPOCH + timedelta(seconds=rng.randint(0, 365 * 24 * 3600)),
+        }
@@ -7,7 +7,45 @@ load_dotenv()
 class Settings(BaseSettings):
     bot_token: str = os.getenv("BOT_TOKEN")
     database_url: str = os.getenv("DATABASE_URL")
+    database_replica_urls: str = os.getenv("DATABASE_REPLICA_URLS", "")
+    replica_sticky_seconds: int = int(os.getenv("REPLICA_STICKY_SECONDS", "10"))
     redis_url: str = os.getenv("REDIS_URL")
     log_level: str = os.getenv("LOG_LEVEL")
+    search_cursor_ttl: int = int(os.getenv("SEARCH_CURSOR_TTL", "1800"))
+    search_cache_ttl: int = int(os.getenv("SEARCH_CACHE_TTL", "300"))
+    search_index_enabled: bool = os.getenv("SEARCH_INDEX_ENABLED", "true").lower() == "true"
+    search_history_batch_size: int = int(os.getenv("SEARCH_HISTORY_BATCH_SIZE", "200"))
+    search_history_flush_ms: int = int(os.getenv("SEARCH_HISTORY_FLUSH_MS", "1000"))
+    search_history_queue_size: int = int(os.getenv("SEARCH_HISTORY_QUEUE_SIZE", "10000"))
+    counters_flush_interval: int = int(os.getenv("COUNTERS_FLUSH_INTERVAL", "10"))
+    view_log_sample_rate: float = float(os.getenv("VIEW_LOG_SAMPLE_RATE", "0.1"))
+    identity_cache_size: int = int(os.getenv("IDENTITY_CACHE_SIZE", "10000"))
+    identity_cache_local_ttl: int = int(os.getenv("IDENTITY_CACHE_LOCAL_TTL", "30"))
+    identity_cache_ttl: int = int(os.getenv("IDENTITY_CACHE_TTL", "3600"))
+    idempotency_ttl: int = int(os.getenv("IDEMPOTENCY_TTL", "86400"))
+    idempotency_tap_ttl: int = int(os.getenv("IDEMPOTENCY_TAP_TTL", "5"))
+    use_webhook: bool = os.getenv("USE_WEBHOOK", "false").lower() == "true"
+    webhook_url: str = os.getenv("WEBHOOK_URL", "")
+    webhook_path: str = os.getenv("WEBHOOK_PATH", "/webhook")
+    webhook_secret: str = os.getenv("WEBHOOK_SECRET", "")
+    webhook_host: str = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    webhook_port: int = int(os.getenv("WEBHOOK_PORT", "8080"))
+    webhook_workers: int = int(os.getenv("WEBHOOK_WORKERS", "1"))
+    send_global_rate: float = float(os.getenv("SEND_GLOBAL_RATE", "30"))
+    send_chat_rate: float = float(os.getenv("SEND_CHAT_RATE", "1"))
+    send_group_rate_per_minute: float = float(os.getenv("SEND_GROUP_RATE_PER_MINUTE", "20"))
+    send_chat_burst: int = int(os.getenv("SEND_CHAT_BURST", "3"))
+    send_max_retries: int = int(os.getenv("SEND_MAX_RETRIES", "3"))
+    notification_batch_size: int = int(os.getenv("NOTIFICATION_BATCH_SIZE", "100"))
+    notification_poll_interval: float = float(os.getenv("NOTIFICATION_POLL_INTERVAL", "1"))
+    notification_max_attempts: int = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "8"))
+    notification_lease_seconds: int = int(os.getenv("NOTIFICATION_LEASE_SECONDS", "60"))
+    notification_retention_days: int = int(os.getenv("NOTIFICATION_RETENTION_DAYS", "7"))
+    notification_digest_window: int = int(os.getenv("NOTIFICATION_DIGEST_WINDOW", "900"))
+    admin_ids: str = os.getenv("ADMIN_IDS", "")
+    broadcast_workers: int = int(os.getenv("BROADCAST_WORKERS", "30"))
+    broadcast_chunk_size: int = int(os.getenv("BROADCAST_CHUNK_SIZE", "1000"))
+    broadcast_progress_interval: int = int(os.getenv("BROADCAST_PROGRESS_INTERVAL", "15"))
+    broadcast_lease_seconds: int = int(os.getenv("BROADCAST_LEASE_SECONDS", "120"))
 
 settings = Settings()
\ No newline at end of file
@@ -1,13 +1,24 @@
+from itertools import cycle
+from typing import Callable, Optional
+
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from config.settings import settings
 
-engine = create_async_engine(
-    settings.database_url.replace("postgresql://", "postgresql+asyncpg://"),
-    echo=False,
-    pool_size=10,
-    max_overflow=20
-)
+def _create_engine(database_url: str):
+    return create_async_engine(
+        database_url.replace("postgresql://", "postgresql+asyncpg://"),
+        echo=False,
+        pool_size=10,
+        max_overflow=20
+    )
+
+# دیتابیس اصلی (همه نوشتن‌ها) و replicaهای فقط‌خواندنی
+engine = _create_engine(settings.database_url)
+replica_engines = [
+    _create_engine(url.strip())
+    for url in (settings.database_replica_urls or "").split(",") if url.strip()
+]
 
 AsyncSessionLocal = sessionmaker(
     engine,
@@ -15,6 +26,22 @@ AsyncSessionLocal = sessionmaker(
     expire_on_commit=False
 )
 
+ReplicaSessionLocals = [
+    sessionmaker(replica_engine, class_=AsyncSession, expire_on_commit=False)
+    for replica_engine in replica_engines
+]
+_replica_round_robin = cycle(ReplicaSessionLocals)
+
+def get_replica_session_factory() -> Optional[Callable[[], AsyncSession]]:
+    """factory یکی از replicaها به نوبت؛ None اگر replica تنظیم نشده باشد"""
+    if not ReplicaSessionLocals:
+        return None
+    return next(_replica_round_robin)
+
+async def dispose_engines():
+    for database_engine in [engine, *replica_engines]:
+        await database_engine.dispose()
+
 async def get_session() -> AsyncSession:
     async with AsyncSessionLocal() as session:
         yield session
@@ -1,9 +1,12 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Enum, Float, JSON
+from sqlalchemy import Column, BigInteger, Integer, String, Text, Boolean, DateTime, ForeignKey, Enum, Float, JSON, Computed, Index, UniqueConstraint, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
 
+from utils.normalize import sql_normalize_text
+
 Base = declarative_base()
 
 class UserRole(enum.Enum):
@@ -25,6 +28,10 @@ class WorkStyle(enum.Enum):
     OUTDOOR = "outdoor"
     STUDIO = "studio"
 
+class NotificationMode(enum.Enum):
+    IMMEDIATE = "immediate"
+    DIGEST = "digest"  # درخواست‌های جدید در یک پنجره زمانی در یک پیام خلاصه می‌شوند
+
 class RequestStatus(enum.Enum):
     PENDING = "pending"
     ACCEPTED = "accepted"
@@ -35,9 +42,10 @@ class User(Base):
     __tablename__ = "users"
     
     id = Column(Integer, primary_key=True)
-    telegram_id = Column(String(50), unique=True, nullable=False)
+    telegram_id = Column(BigInteger, unique=True, index=True, nullable=False)
     username = Column(String(100))
-    role = Column(Enum(UserRole), nullable=False)
+    # مانند RequestStatus، نوع userrole در migration 001 با مقادیر ('supplier', 'demander') ساخته شده است
+    role = Column(Enum(UserRole, name="userrole", values_callable=lambda roles: [role.value for role in roles]), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = Column(Boolean, default=True)
@@ -68,14 +76,24 @@ class Supplier(Base):
     bottom_size = Column(String(10))
     special_features = Column(Text)
     
+    # متن یکسان‌سازی‌شده ویژگی‌های ظاهری برای جستجوی trigram
+    features_search = Column(Text, Computed(
+        sql_normalize_text(
+            "coalesce(special_features, '') || ' ' || coalesce(hair_color, '') || ' ' || coalesce(eye_color, '')"
+        ),
+        persisted=True
+    ))
+    
     # اطلاعات همکاری
     price_range_min = Column(Float)
     price_range_max = Column(Float)
     price_unit = Column(String(20))  # hourly, daily
     city = Column(String(100))
     area = Column(String(100))
-    cooperation_types = Column(JSON)  # List of types
-    work_styles = Column(JSON)  # List of styles
+    city_norm = Column(String(100))  # normalize_place(city)
+    area_norm = Column(String(100))  # normalize_place(area)
+    cooperation_types = Column(JSONB)  # List of CooperationType values
+    work_styles = Column(JSONB)  # List of WorkStyle values
     
     # سابقه و توضیحات
     brand_experience = Column(Text)
@@ -83,12 +101,40 @@ class Supplier(Base):
     
     # عکس‌ها
     portfolio_photos = Column(JSON)  # List of photo URLs
+    media_count = Column(Integer, default=0, server_default="0", nullable=False)
+    
+    # آمار (از طریق utils/counters به صورت دسته‌ای به‌روز می‌شود)
+    view_count = Column(Integer, default=0, server_default="0", nullable=False)
+    request_count = Column(Integer, default=0, server_default="0", nullable=False)
+    last_active = Column(DateTime)
     
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     user = relationship("User", back_populates="supplier_profile")
     requests_received = relationship("Request", back_populates="supplier", foreign_keys="Request.supplier_id")
+    
+    # کپی users.is_active برای فیلتر جستجو بدون EXISTS روی users (utils.users.set_supplier_active)
+    is_active = Column(Boolean, default=True, server_default=text("true"), nullable=False)
+    
+    # NotificationMode.value؛ نحوه اعلان درخواست‌های جدید
+    notification_mode = Column(String(20), default=NotificationMode.IMMEDIATE.value, server_default="immediate", nullable=False)
+    
+    __table_args__ = (
+        # ایندکس‌های جستجو فقط روی کاتالوگ فعال (WHERE is_active)
+        Index(
+            "ix_suppliers_features_search_active_trgm", features_search,
+            postgresql_using="gin", postgresql_ops={"features_search": "gin_trgm_ops"},
+            postgresql_where=is_active
+        ),
+        Index(
+            "ix_suppliers_city_norm_active", city_norm,
+            postgresql_ops={"city_norm": "text_pattern_ops"}, postgresql_where=is_active
+        ),
+        Index("ix_suppliers_area_norm", area_norm, postgresql_ops={"area_norm": "text_pattern_ops"}),
+        Index("ix_suppliers_work_styles_active_gin", work_styles, postgresql_using="gin", postgresql_where=is_active),
+        Index("ix_suppliers_cooperation_types_gin", cooperation_types, postgresql_using="gin"),
+    )
 
 class Demander(Base):
     __tablename__ = "demanders"
@@ -113,7 +159,11 @@ class Request(Base):
     demander_id = Column(Integer, ForeignKey("demanders.id"))
     supplier_id = Column(Integer, ForeignKey("suppliers.id"))
     
-    status = Column(Enum(RequestStatus), default=RequestStatus.PENDING)
+    # مقادیر enum دیتابیس حروف کوچک هستند ('pending' و ...)، نه نام اعضای RequestStatus
+    status = Column(
+        Enum(RequestStatus, name="requeststatus", values_callable=lambda statuses: [status.value for status in statuses]),
+        default=RequestStatus.PENDING, server_default="pending", nullable=False, index=True
+    )
     message = Column(Text)
     response_message = Column(Text)
     
@@ -122,3 +172,99 @@ class Request(Base):
     
     demander = relationship("Demander", back_populates="requests_sent")
     supplier = relationship("Supplier", back_populates="requests_received")
+    
+    __table_args__ = (
+        # حداکثر یک درخواست در انتظار برای هر جفت درخواست‌کننده/تأمین‌کننده
+        Index(
+            "uq_requests_pending_pair", "demander_id", "supplier_id",
+            unique=True, postgresql_where=text("status = 'pending'")
+        ),
+        # لیست‌های درخواست (utils.requests) بدون Sort از روی ایندکس خوانده می‌شوند
+        Index("ix_requests_supplier_status_created", supplier_id, status, created_at.desc(), id.desc()),
+        Index("ix_requests_demander_created", demander_id, created_at.desc(), id.desc()),
+    )
+
+class Media(Base):
+    __tablename__ = "media"
+    
+    id = Column(Integer, primary_key=True)
+    supplier_id = Column(Integer, ForeignKey("suppliers.id", ondelete="CASCADE"), nullable=False, index=True)
+    file_id = Column(String(200), nullable=False)
+    file_type = Column(String(20), nullable=False)  # 'photo' or 'video'
+    caption = Column(Text)
+    order_index = Column(Integer, default=0, server_default="0", nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class SearchHistory(Base):
+    __tablename__ = "search_history"
+    
+    id = Column(Integer, primary_key=True)
+    demander_id = Column(Integer, ForeignKey("demanders.id", ondelete="CASCADE"), nullable=False, index=True)
+    search_criteria = Column(JSONB, nullable=False)
+    results_count = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class ViewLog(Base):
+    __tablename__ = "view_logs"
+    
+    id = Column(Integer, primary_key=True)
+    supplier_id = Column(Integer, ForeignKey("suppliers.id", ondelete="CASCADE"), nullable=False, index=True)
+    demander_id = Column(Integer, ForeignKey("demanders.id", ondelete="SET NULL"))
+    view_type = Column(String(20), nullable=False)  # 'list' or 'detail'
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class SavedSearch(Base):
+    __tablename__ = "saved_searches"
+    
+    id = Column(Integer, primary_key=True)
+    demander_id = Column(Integer, ForeignKey("demanders.id", ondelete="CASCADE"), nullable=False)
+    search_criteria = Column(JSONB, nullable=False)  # search.cache.to_json_criteria
+    criteria_hash = Column(String(40), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        UniqueConstraint("demander_id", "criteria_hash", name="uq_saved_searches_demander_criteria"),
+    )
+
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+    
+    id = Column(BigInteger, primary_key=True)
+    kind = Column(String(40), nullable=False)  # utils.notifications.NOTIFICATIONS
+    chat_id = Column(BigInteger, nullable=False)
+    payload = Column(JSONB, nullable=False)
+    status = Column(String(20), nullable=False, default="pending", server_default="pending")  # pending, sent, dead
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    # زمان تلاش بعدی (با ساعت دیتابیس)؛ هنگام ارسال به عنوان پایان lease استفاده می‌شود
+    available_at = Column(DateTime, nullable=False, server_default=text("now()"))
+    last_error = Column(Text)
+    created_at = Column(DateTime, nullable=False, server_default=text("now()"))
+    sent_at = Column(DateTime)
+    
+    __table_args__ = (
+        Index("ix_notification_outbox_pending", "available_at", "id", postgresql_where=text("status = 'pending'")),
+        Index("ix_notification_outbox_sent_at", "sent_at", postgresql_where=text("status = 'sent'")),
+        # یافتن خلاصه باز یک چت هنگام ثبت اعلان (utils.outbox.enqueue_batched)
+        Index("ix_notification_outbox_pending_chat", "chat_id", "kind", postgresql_where=text("status = 'pending'")),
+    )
+
+class Broadcast(Base):
+    __tablename__ = "broadcasts"
+    
+    id = Column(Integer, primary_key=True)
+    created_by = Column(BigInteger, nullable=False)  # telegram_id ادمین
+    # پیام ادمین که با copyMessage برای گیرندگان کپی می‌شود
+    source_chat_id = Column(BigInteger, nullable=False)
+    source_message_id = Column(Integer, nullable=False)
+    progress_message_id = Column(Integer)  # پیام وضعیت در چت ادمین
+    filters = Column(JSONB, nullable=False)  # utils.broadcast.BroadcastFilters
+    status = Column(String(20), nullable=False, default="running", server_default="running")  # running, completed, cancelled
+    # checkpoint: همه گیرندگان با users.id <= last_user_id پردازش شده‌اند
+    last_user_id = Column(Integer, nullable=False, default=0, server_default="0")
+    total = Column(Integer, nullable=False, default=0, server_default="0")
+    sent = Column(Integer, nullable=False, default=0, server_default="0")
+    failed = Column(Integer, nullable=False, default=0, server_default="0")
+    blocked = Column(Integer, nullable=False, default=0, server_default="0")
+    lease_until = Column(DateTime)  # پروسه‌ای که پخش را اجرا می‌کند تا این زمان آن را در اختیار دارد
+    created_at = Column(DateTime, nullable=False, server_default=text("now()"))
+    finished_at = Column(DateTime)
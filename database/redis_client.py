@@ -0,0 +1,11 @@
+import redis.asyncio as redis
+from config.settings import settings
+
+_client = None
+
+def get_redis() -> redis.Redis | None:
+    """کلاینت مشترک Redis؛ اگر REDIS_URL تنظیم نشده باشد None برمی‌گرداند"""
+    global _client
+    if _client is None and settings.redis_url:
+        _client = redis.from_url(settings.redis_url)
+    return _client
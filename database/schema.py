@@ -0,0 +1,62 @@
+import logging
+from pathlib import Path
+from typing import Set
+
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = Path(__file__).resolve().parents[1] / "alembic.ini"
+
+
+class SchemaVersionError(RuntimeError):
+    """نسخه schema دیتابیس با migrationهای کد یکسان نیست"""
+
+
+def get_alembic_config() -> Config:
+    return Config(str(ALEMBIC_INI))
+
+
+def get_expected_heads() -> Set[str]:
+    """head(های) migration از روی فایل‌های database/versions بدون اتصال به دیتابیس"""
+    return set(ScriptDirectory.from_config(get_alembic_config()).get_heads())
+
+
+async def get_current_revisions(conn) -> Set[str]:
+    """نسخه(های) ثبت‌شده در alembic_version؛ اگر جدول وجود نداشته باشد مجموعه خالی"""
+    if await conn.scalar(text("SELECT to_regclass('alembic_version')")) is None:
+        return set()
+    result = await conn.execute(text("SELECT version_num FROM alembic_version"))
+    return {row[0] for row in result}
+
+
+async def check_schema_version(engine: AsyncEngine):
+    """مقایسه نسخه دیتابیس با head؛ در صورت اختلاف SchemaVersionError
+
+    به جای create_all در هر راه‌اندازی فقط جدول یک‌ردیفی alembic_version
+    خوانده می‌شود. اعمال migrationها با `python main.py --migrate` یا
+    `alembic upgrade head` و جدا از اجرای ربات انجام می‌شود.
+    """
+    expected = get_expected_heads()
+    try:
+        async with engine.connect() as conn:
+            current = await get_current_revisions(conn)
+    except DBAPIError as e:
+        raise SchemaVersionError(f"Could not read schema version: {e}") from e
+
+    if current != expected:
+        raise SchemaVersionError(
+            f"Database schema is at {sorted(current) or 'no revision'}, expected {sorted(expected)}. "
+            "Run `python main.py --migrate` (or `alembic upgrade head`) before starting the bot."
+        )
+    logger.info(f"Database schema is at revision {', '.join(sorted(current))}")
+
+
+def run_migrations(revision: str = "head"):
+    """اعمال migrationها تا revision داده‌شده (env.py خودش event loop می‌سازد؛ خارج از loop صدا زده شود)"""
+    command.upgrade(get_alembic_config(), revision)
@@ -0,0 +1,40 @@
+"""Add trigram searchable document for supplier appearance features
+
+Revision ID: 004
+Revises: 003
+Create Date: 2024-02-10 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '004'
+down_revision: Union[str, None] = '003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# معادل utils.normalize.normalize_text روی سه ستون ویژگی ظاهری؛
+# به صورت ثابت نوشته شده تا تغییرات بعدی کد روی این migration اثر نگذارد
+FEATURES_SEARCH_SQL = (
+    "btrim(regexp_replace(lower(translate("
+    "coalesce(special_features, '') || ' ' || coalesce(hair_color, '') || ' ' || coalesce(eye_color, ''), "
+    "'يكىةۀأإٱ٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹‌ًٌٍَُِّْـ', 'یکیههااا01234567890123456789 ')), "
+    "'\\s+', ' ', 'g'))"
+)
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    
+    # ستون محاسبه‌شده متن یکسان‌سازی‌شده و ایندکس GIN سه‌حرفی روی آن
+    op.add_column('suppliers', sa.Column(
+        'features_search', sa.Text(), sa.Computed(FEATURES_SEARCH_SQL, persisted=True), nullable=True
+    ))
+    op.create_index(
+        'ix_suppliers_features_search_trgm', 'suppliers', ['features_search'], unique=False,
+        postgresql_using='gin', postgresql_ops={'features_search': 'gin_trgm_ops'}
+    )
+
+def downgrade() -> None:
+    op.drop_index('ix_suppliers_features_search_trgm', table_name='suppliers')
+    op.drop_column('suppliers', 'features_search')
@@ -0,0 +1,31 @@
+"""Store work styles and cooperation types as indexed JSONB
+
+Revision ID: 005
+Revises: 004
+Create Date: 2024-02-15 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '005'
+down_revision: Union[str, None] = '004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # تبدیل ستون‌ها (آرایه یا json) به jsonb؛ to_jsonb برای هر دو نوع ورودی کار می‌کند
+    for column in ('work_styles', 'cooperation_types'):
+        op.execute(f"ALTER TABLE suppliers ALTER COLUMN {column} TYPE jsonb USING to_jsonb({column})")
+        op.execute(f"UPDATE suppliers SET {column} = '[]'::jsonb WHERE {column} IS NULL OR {column} = 'null'::jsonb")
+    
+    # ایندکس GIN (jsonb_ops) برای عملگرهای ?| و @>
+    op.create_index('ix_suppliers_work_styles_gin', 'suppliers', ['work_styles'], unique=False, postgresql_using='gin')
+    op.create_index('ix_suppliers_cooperation_types_gin', 'suppliers', ['cooperation_types'], unique=False, postgresql_using='gin')
+
+def downgrade() -> None:
+    op.drop_index('ix_suppliers_cooperation_types_gin', table_name='suppliers')
+    op.drop_index('ix_suppliers_work_styles_gin', table_name='suppliers')
+    for column in ('work_styles', 'cooperation_types'):
+        op.execute(f"ALTER TABLE suppliers ALTER COLUMN {column} TYPE json USING {column}::json")
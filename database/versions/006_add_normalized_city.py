@@ -0,0 +1,74 @@
+"""Add normalized city/area columns with prefix indexes
+
+Revision ID: 006
+Revises: 005
+Create Date: 2024-02-20 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '006'
+down_revision: Union[str, None] = '005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+# کپی normalize_place نسخه 006: city_norm ردیف‌های قدیمی با همان قاعده‌ای پر می‌شود
+# که ثبت‌نام‌های همان زمان استفاده می‌کردند، نه با نسخه فعلی utils.normalize
+_PLACE_TABLE = str.maketrans(
+    "يكىةۀأإٱ" "٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹" "‌",
+    "یکیههااا" "0123456789" "0123456789" " ",
+    "ًٌٍَُِّْـ",
+)
+_PLACE_ALIASES = {"طهران": "تهران"}
+
+def _normalize_place(text):
+    if not text:
+        return ""
+    folded = "".join(text.translate(_PLACE_TABLE).lower().split())
+    for alias, canonical in _PLACE_ALIASES.items():
+        if folded.startswith(alias):
+            folded = canonical + folded[len(alias):]
+    return folded
+
+def upgrade() -> None:
+    op.add_column('suppliers', sa.Column('city_norm', sa.String(length=100), nullable=True))
+    op.add_column('suppliers', sa.Column('area_norm', sa.String(length=100), nullable=True))
+    
+    # پر کردن ستون‌ها با همان یکسان‌سازی که هنگام ثبت‌نام استفاده می‌شود
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.text("SELECT id, city, area FROM suppliers WHERE id > :last_id ORDER BY id LIMIT :limit"),
+            {"last_id": last_id, "limit": BATCH_SIZE}
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            sa.text("UPDATE suppliers SET city_norm = :city_norm, area_norm = :area_norm WHERE id = :id"),
+            [
+                {"id": row.id, "city_norm": _normalize_place(row.city), "area_norm": _normalize_place(row.area)}
+                for row in rows
+            ]
+        )
+        last_id = rows[-1].id
+    
+    # text_pattern_ops تا LIKE 'prefix%' هم از ایندکس استفاده کند
+    op.create_index(
+        'ix_suppliers_city_norm', 'suppliers', ['city_norm'], unique=False,
+        postgresql_ops={'city_norm': 'text_pattern_ops'}
+    )
+    op.create_index(
+        'ix_suppliers_area_norm', 'suppliers', ['area_norm'], unique=False,
+        postgresql_ops={'area_norm': 'text_pattern_ops'}
+    )
+
+def downgrade() -> None:
+    op.drop_index('ix_suppliers_area_norm', table_name='suppliers')
+    op.drop_index('ix_suppliers_city_norm', table_name='suppliers')
+    op.drop_column('suppliers', 'area_norm')
+    op.drop_column('suppliers', 'city_norm')
@@ -0,0 +1,32 @@
+"""Add saved searches for new supplier alerts
+
+Revision ID: 007
+Revises: 006
+Create Date: 2024-03-01 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = '007'
+down_revision: Union[str, None] = '006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.create_table('saved_searches',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('demander_id', sa.Integer(), nullable=False),
+        sa.Column('search_criteria', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('criteria_hash', sa.String(length=40), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['demander_id'], ['demanders.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        # هر درخواست‌کننده یک بار برای هر ترکیب فیلتر
+        sa.UniqueConstraint('demander_id', 'criteria_hash', name='uq_saved_searches_demander_criteria')
+    )
+
+def downgrade() -> None:
+    op.drop_table('saved_searches')
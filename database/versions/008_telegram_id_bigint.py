@@ -0,0 +1,73 @@
+"""Store users.telegram_id as BIGINT
+
+Revision ID: 008
+Revises: 007
+Create Date: 2024-03-05 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '008'
+down_revision: Union[str, None] = '007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+def upgrade() -> None:
+    # ستون جدید کنار ستون قدیمی؛ تریگر نوشته‌های نسخه قبلی ربات را در طول backfill همگام نگه می‌دارد
+    op.add_column('users', sa.Column('telegram_id_new', sa.BigInteger(), nullable=True))
+    op.execute("""
+        CREATE FUNCTION users_sync_telegram_id() RETURNS trigger AS $$
+        BEGIN
+            NEW.telegram_id_new := NEW.telegram_id::bigint;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER users_sync_telegram_id BEFORE INSERT OR UPDATE OF telegram_id ON users
+        FOR EACH ROW EXECUTE FUNCTION users_sync_telegram_id()
+    """)
+
+    # backfill در تراکنش‌های کوتاه و ساخت ایندکس بدون قفل نوشتن
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        max_id = bind.execute(sa.text("SELECT coalesce(max(id), 0) FROM users")).scalar()
+        for start in range(0, max_id, BATCH_SIZE):
+            bind.execute(
+                sa.text(
+                    "UPDATE users SET telegram_id_new = telegram_id::bigint "
+                    "WHERE id > :start AND id <= :end AND telegram_id_new IS NULL"
+                ),
+                {"start": start, "end": start + BATCH_SIZE}
+            )
+        op.execute("CREATE UNIQUE INDEX CONCURRENTLY ix_users_telegram_id_new ON users (telegram_id_new)")
+        # CHECK معتبرشده باعث می‌شود SET NOT NULL بدون اسکن کامل جدول انجام شود
+        op.execute(
+            "ALTER TABLE users ADD CONSTRAINT ck_users_telegram_id_new_not_null "
+            "CHECK (telegram_id_new IS NOT NULL) NOT VALID"
+        )
+        op.execute("ALTER TABLE users VALIDATE CONSTRAINT ck_users_telegram_id_new_not_null")
+
+    # جابجایی ستون‌ها در یک تراکنش کوتاه؛ حذف ستون قدیمی ایندکس و unique constraint آن را هم حذف می‌کند
+    op.alter_column('users', 'telegram_id_new', nullable=False)
+    op.drop_constraint('ck_users_telegram_id_new_not_null', 'users', type_='check')
+    op.execute("DROP TRIGGER users_sync_telegram_id ON users")
+    op.execute("DROP FUNCTION users_sync_telegram_id()")
+    op.drop_column('users', 'telegram_id')
+    op.alter_column('users', 'telegram_id_new', new_column_name='telegram_id')
+    op.execute("ALTER INDEX ix_users_telegram_id_new RENAME TO ix_users_telegram_id")
+
+def downgrade() -> None:
+    op.drop_index('ix_users_telegram_id', table_name='users')
+    op.alter_column(
+        'users', 'telegram_id',
+        type_=sa.String(length=50),
+        existing_nullable=False,
+        postgresql_using='telegram_id::text'
+    )
+    op.create_unique_constraint('users_telegram_id_key', 'users', ['telegram_id'])
+    op.create_index(op.f('ix_users_telegram_id'), 'users', ['telegram_id'], unique=True)
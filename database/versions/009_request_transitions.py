@@ -0,0 +1,51 @@
+"""Guard request state transitions: cancelled status and one pending request per pair
+
+Revision ID: 009
+Revises: 008
+Create Date: 2024-03-10 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+
+revision: str = '009'
+down_revision: Union[str, None] = '008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        # ADD VALUE باید قبل از استفاده از مقدار جدید commit شده باشد
+        op.execute("ALTER TYPE requeststatus ADD VALUE IF NOT EXISTS 'cancelled'")
+        
+        # اگر اجرای قبلی در حین ساخت ایندکس شکست خورده باشد (مثلاً درخواست تکراری
+        # بین لغو تکراری‌ها و ساخت ایندکس ثبت شده)، ایندکس INVALID باقی می‌ماند؛
+        # آن را حذف می‌کنیم تا اجرای دوباره migration از نو بسازد
+        op.execute("""
+            DO $$
+            BEGIN
+                IF EXISTS (
+                    SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid
+                    WHERE pg_class.relname = 'uq_requests_pending_pair' AND NOT pg_index.indisvalid
+                ) THEN
+                    DROP INDEX uq_requests_pending_pair;
+                END IF;
+            END $$
+        """)
+        
+        # درخواست‌های تکراری در انتظار (از دوبار زدن دکمه) به جز جدیدترین لغو می‌شوند؛
+        # درست پیش از ساخت ایندکس تا فاصله دو مرحله کوتاه بماند
+        op.execute("""
+            UPDATE requests SET status = 'cancelled', updated_at = now()
+            WHERE status = 'pending' AND id NOT IN (
+                SELECT max(id) FROM requests WHERE status = 'pending' GROUP BY demander_id, supplier_id
+            )
+        """)
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_requests_pending_pair "
+            "ON requests (demander_id, supplier_id) WHERE status = 'pending'"
+        )
+
+def downgrade() -> None:
+    op.drop_index('uq_requests_pending_pair', table_name='requests')
+    # مقدار اضافه‌شده به enum در PostgreSQL قابل حذف نیست
@@ -0,0 +1,54 @@
+"""Denormalize is_active onto suppliers with partial search indexes
+
+Revision ID: 010
+Revises: 009
+Create Date: 2024-03-15 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '010'
+down_revision: Union[str, None] = '009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+# ایندکس‌های جستجو که فقط روی کاتالوگ فعال ساخته می‌شوند: (نام قدیمی، نام جدید، تعریف)
+PARTIAL_INDEXES = [
+    ('ix_suppliers_city_norm', 'ix_suppliers_city_norm_active', 'btree (city_norm text_pattern_ops)'),
+    ('ix_suppliers_work_styles_gin', 'ix_suppliers_work_styles_active_gin', 'gin (work_styles)'),
+    ('ix_suppliers_features_search_trgm', 'ix_suppliers_features_search_active_trgm', 'gin (features_search gin_trgm_ops)'),
+]
+
+def upgrade() -> None:
+    # DEFAULT ثابت در PostgreSQL 11+ بدون بازنویسی جدول اضافه می‌شود
+    op.add_column('suppliers', sa.Column('is_active', sa.Boolean(), server_default=sa.text('true'), nullable=False))
+
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        # فقط تأمین‌کنندگانی که کاربرشان غیرفعال است باید به‌روز شوند
+        max_id = bind.execute(sa.text("SELECT coalesce(max(id), 0) FROM suppliers")).scalar()
+        for start in range(0, max_id, BATCH_SIZE):
+            bind.execute(
+                sa.text(
+                    "UPDATE suppliers SET is_active = false FROM users "
+                    "WHERE users.id = suppliers.user_id AND users.is_active IS false "
+                    "AND suppliers.id > :start AND suppliers.id <= :end"
+                ),
+                {"start": start, "end": start + BATCH_SIZE}
+            )
+
+        for old_name, new_name, definition in PARTIAL_INDEXES:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {new_name} ON suppliers USING {definition} WHERE is_active")
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {old_name}")
+        op.execute("ANALYZE suppliers")
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for old_name, new_name, definition in PARTIAL_INDEXES:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {old_name} ON suppliers USING {definition}")
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {new_name}")
+    op.drop_column('suppliers', 'is_active')
@@ -0,0 +1,31 @@
+"""Composite indexes for request inbox/outbox lists
+
+Revision ID: 011
+Revises: 010
+Create Date: 2024-03-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+
+revision: str = '011'
+down_revision: Union[str, None] = '010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# ترتیب ستون‌ها همان ORDER BY created_at DESC, id DESC لیست‌هاست تا Sort حذف شود
+INDEXES = [
+    ('ix_requests_supplier_status_created', 'requests (supplier_id, status, created_at DESC, id DESC)'),
+    ('ix_requests_demander_created', 'requests (demander_id, created_at DESC, id DESC)'),
+]
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, definition in INDEXES:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}")
+        op.execute("ANALYZE requests")
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _ in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
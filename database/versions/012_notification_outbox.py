@@ -0,0 +1,41 @@
+"""Add notification outbox for durable request notifications
+
+Revision ID: 012
+Revises: 011
+Create Date: 2024-03-20 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = '012'
+down_revision: Union[str, None] = '011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.create_table('notification_outbox',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('kind', sa.String(length=40), nullable=False),
+        sa.Column('chat_id', sa.BigInteger(), nullable=False),
+        sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('status', sa.String(length=20), server_default='pending', nullable=False),
+        sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('available_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    # dispatcher فقط ردیف‌های در انتظار را به ترتیب زمان تلاش بعدی می‌خواند
+    op.create_index('ix_notification_outbox_pending', 'notification_outbox', ['available_at', 'id'],
+                    postgresql_where=sa.text("status = 'pending'"))
+    op.create_index('ix_notification_outbox_sent_at', 'notification_outbox', ['sent_at'],
+                    postgresql_where=sa.text("status = 'sent'"))
+
+def downgrade() -> None:
+    op.drop_index('ix_notification_outbox_sent_at', table_name='notification_outbox')
+    op.drop_index('ix_notification_outbox_pending', table_name='notification_outbox')
+    op.drop_table('notification_outbox')
@@ -0,0 +1,26 @@
+"""Add per-supplier notification mode for new-request digests
+
+Revision ID: 014
+Revises: 013
+Create Date: 2024-03-28 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '014'
+down_revision: Union[str, None] = '013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # تأمین‌کنندگان فعلی با 'immediate' مثل قبل هر درخواست را جداگانه دریافت می‌کنند
+    op.add_column('suppliers', sa.Column('notification_mode', sa.String(length=20), server_default='immediate', nullable=False))
+    # هر اعلان خلاصه، خلاصه باز همان چت را در ردیف‌های در انتظار جستجو می‌کند
+    op.create_index('ix_notification_outbox_pending_chat', 'notification_outbox', ['chat_id', 'kind'],
+                    postgresql_where=sa.text("status = 'pending'"))
+
+def downgrade() -> None:
+    op.drop_index('ix_notification_outbox_pending_chat', table_name='notification_outbox')
+    op.drop_column('suppliers', 'notification_mode')
@@ -0,0 +1,135 @@
+from aiogram import Router, F
+from aiogram.types import Message, CallbackQuery
+from aiogram.fsm.context import FSMContext
+from aiogram.filters import Command, CommandObject, StateFilter
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+
+from config.settings import settings
+from database.models import Broadcast
+from keyboards.inline import get_broadcast_confirmation_keyboard, get_broadcast_progress_keyboard
+from states.common import AdminStates
+from utils.broadcast import (
+    RUNNING, BroadcastFilters, broadcast_manager, broadcast_stats, cancel_broadcast, count_recipients,
+    create_broadcast, format_progress, parse_filters,
+)
+from utils.outbox import from_payload, to_payload
+from middlewares.database import READ_ONLY
+from middlewares.idempotency import IDEMPOTENT
+import logging
+
+logger = logging.getLogger(__name__)
+router = Router()
+
+# شناسه تلگرام ادمین‌ها (ADMIN_IDS با کاما جدا می‌شود)؛ پیام‌های دیگران به routerهای بعدی می‌رسد
+ADMIN_IDS = {int(telegram_id) for telegram_id in settings.admin_ids.split(",") if telegram_id.strip()}
+router.message.filter(F.from_user.id.in_(ADMIN_IDS))
+router.callback_query.filter(F.from_user.id.in_(ADMIN_IDS))
+
+RECENT_BROADCASTS = 5
+
+BROADCAST_USAGE = """
+📣 ارسال پیام همگانی
+
+/broadcast — همه کاربران فعال
+/broadcast role=supplier — فقط تأمین‌کنندگان
+/broadcast role=demander — فقط درخواست‌کنندگان
+/broadcast role=supplier city=تهران — تأمین‌کنندگان یک شهر
+/broadcast all — شامل کاربران غیرفعال
+
+برای نام چندکلمه‌ای از نقل‌قول استفاده کنید: city="بندر عباس"
+/broadcasts — وضعیت آخرین ارسال‌ها
+"""
+
+@router.message(Command("broadcast"))
+async def cmd_broadcast(message: Message, command: CommandObject, state: FSMContext, session: AsyncSession):
+    """شروع ارسال پیام همگانی: بررسی فیلترها و شمارش گیرندگان"""
+    try:
+        filters = parse_filters(command.args)
+    except ValueError as e:
+        await message.answer(f"❌ {e}\n{BROADCAST_USAGE}")
+        return
+
+    total = await count_recipients(session, filters)
+    if not total:
+        await message.answer(f"هیچ گیرنده‌ای با این فیلتر یافت نشد ({filters.describe()}).")
+        return
+
+    await state.set_state(AdminStates.broadcast_message)
+    await state.update_data(broadcast_filters=to_payload(filters), broadcast_total=total)
+    await message.answer(
+        f"👥 گیرندگان: {total} ({filters.describe()})\n\n"
+        "پیام مورد نظر را بفرستید (متن، عکس، ویدیو و ...)؛ همان پیام برای کاربران کپی می‌شود.\n"
+        "برای انصراف: /cancel"
+    )
+
+@router.message(StateFilter(AdminStates.broadcast_message))
+async def receive_broadcast_message(message: Message, state: FSMContext):
+    """دریافت پیام همگانی و درخواست تأیید"""
+    if message.text == "/cancel":
+        await state.clear()
+        await message.answer("❌ ارسال همگانی لغو شد.")
+        return
+
+    data = await state.get_data()
+    await state.update_data(broadcast_source=[message.chat.id, message.message_id])
+    await message.reply(
+        f"این پیام برای {data['broadcast_total']} کاربر ارسال شود؟",
+        reply_markup=get_broadcast_confirmation_keyboard()
+    )
+
+@router.callback_query(F.data == "broadcast_confirm", StateFilter(AdminStates.broadcast_message), flags=IDEMPOTENT)
+async def confirm_broadcast(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    """ثبت پیام همگانی و شروع ارسال در پس‌زمینه"""
+    data = await state.get_data()
+    if not data.get("broadcast_source"):
+        await callback.answer("ابتدا پیام را بفرستید.", show_alert=True)
+        return
+
+    source_chat_id, source_message_id = data["broadcast_source"]
+    filters = from_payload(BroadcastFilters, data["broadcast_filters"])
+    # همین پیام تأیید به پیام وضعیت ارسال تبدیل می‌شود
+    broadcast = await create_broadcast(
+        session, callback.from_user.id, source_chat_id, source_message_id, filters,
+        progress_message_id=callback.message.message_id
+    )
+    await session.commit()
+    await state.clear()
+    broadcast_manager.wake()
+
+    await callback.message.edit_text(
+        format_progress(broadcast.id, broadcast_stats(broadcast), RUNNING),
+        reply_markup=get_broadcast_progress_keyboard(broadcast.id)
+    )
+    await callback.answer("📣 ارسال شروع شد")
+
+@router.callback_query(F.data == "broadcast_abort")
+async def abort_broadcast(callback: CallbackQuery, state: FSMContext):
+    """انصراف از ارسال پیام همگانی پیش از شروع"""
+    await state.clear()
+    await callback.message.edit_text("❌ ارسال همگانی لغو شد.")
+    await callback.answer()
+
+@router.callback_query(F.data.regexp(r"^broadcast_cancel:\d+$"))
+async def stop_broadcast(callback: CallbackQuery, session: AsyncSession):
+    """توقف ارسال همگانی در جریان"""
+    broadcast_id = int(callback.data.split(":")[1])
+    if not await cancel_broadcast(session, broadcast_id):
+        await callback.answer("این ارسال در جریان نیست.", show_alert=True)
+        return
+    await session.commit()
+    await callback.answer("⏹ ارسال تا چند ثانیه دیگر متوقف می‌شود")
+
+@router.message(Command("broadcasts"), flags=READ_ONLY)
+async def cmd_broadcasts(message: Message, session: AsyncSession):
+    """وضعیت آخرین پیام‌های همگانی (تا آخرین checkpoint)"""
+    result = await session.execute(select(Broadcast).order_by(Broadcast.id.desc()).limit(RECENT_BROADCASTS))
+    broadcasts = result.scalars().all()
+    if not broadcasts:
+        await message.answer(f"هنوز پیام همگانی ارسال نشده است.\n{BROADCAST_USAGE}")
+        return
+
+    await message.answer("\n\n".join(
+        format_progress(broadcast.id, broadcast_stats(broadcast), broadcast.status)
+        for broadcast in broadcasts
+    ))
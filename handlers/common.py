@@ -6,11 +6,15 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update
 from datetime import datetime
 
-from database.models import User, Supplier, Demander, Request, RequestStatus
-from keyboards.reply import get_main_menu_keyboard
-from keyboards.inline import get_profile_actions_keyboard, get_request_detail_keyboard
+from database.models import Supplier, Demander, Request, RequestStatus
+from keyboards.reply import get_main_menu, get_supplier_menu_keyboard, get_demander_menu_keyboard
+from keyboards.inline import get_profile_actions_keyboard, get_request_action_keyboard, get_pagination_keyboard
 from states.common import ProfileEdit
 from utils.validators import validate_phone_number
+from utils.identity import identity_cache, Identity
+from utils.requests import list_supplier_inbox, list_demander_outbox
+from utils.dataloader import get_supplier
+from middlewares.database import READ_ONLY
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,29 +27,24 @@ async def cmd_menu(message: Message, state: FSMContext, session: AsyncSession):
     await state.clear()
     
     # بررسی نقش کاربر
-    user_result = await session.execute(
-        select(User).where(User.telegram_id == str(message.from_user.id))
-    )
-    user = user_result.scalar_one_or_none()
+    identity = await identity_cache.get(session, message.from_user.id)
     
-    if not user:
+    if not identity:
         await message.answer(
             "لطفاً ابتدا با دستور /start شروع کنید.",
-            reply_markup=get_main_menu_keyboard()
+            reply_markup=get_main_menu()
         )
         return
     
     keyboard = None
-    if user.role == 'supplier':
-        from keyboards.reply import get_supplier_menu_keyboard
+    if identity.is_supplier:
         keyboard = get_supplier_menu_keyboard()
         text = "📋 منوی تأمین‌کننده"
-    elif user.role == 'demander':
-        from keyboards.reply import get_demander_menu_keyboard
+    elif identity.is_demander:
         keyboard = get_demander_menu_keyboard()
         text = "📋 منوی درخواست‌کننده"
     else:
-        keyboard = get_main_menu_keyboard()
+        keyboard = get_main_menu()
         text = "منوی اصلی"
     
     await message.answer(text, reply_markup=keyboard)
@@ -78,26 +77,20 @@ async def cmd_help(message: Message):
 """
     await message.answer(help_text)
 
-@router.message(Command("profile"))
+@router.message(Command("profile"), flags=READ_ONLY)
 async def cmd_profile(message: Message, session: AsyncSession):
     """مشاهده پروفایل کاربر"""
     # دریافت اطلاعات کاربر
-    user_result = await session.execute(
-        select(User).where(User.telegram_id == str(message.from_user.id))
-    )
-    user = user_result.scalar_one_or_none()
+    identity = await identity_cache.get(session, message.from_user.id)
     
-    if not user:
+    if not identity:
         await message.answer("شما هنوز ثبت‌نام نکرده‌اید! از /start شروع کنید.")
         return
     
     profile_text = f"👤 پروفایل شما\n\n"
     
-    if user.role == 'supplier':
-        supplier_result = await session.execute(
-            select(Supplier).where(Supplier.user_id == user.id)
-        )
-        supplier = supplier_result.scalar_one_or_none()
+    if identity.is_supplier and identity.supplier_id:
+        supplier = await get_supplier(session, identity.supplier_id)
         
         if supplier:
             profile_text += f"""
@@ -111,11 +104,8 @@ async def cmd_profile(message: Message, session: AsyncSession):
             if supplier.instagram_id:
                 profile_text += f"📷 اینستاگرام: @{supplier.instagram_id}\n"
                 
-    elif user.role == 'demander':
-        demander_result = await session.execute(
-            select(Demander).where(Demander.user_id == user.id)
-        )
-        demander = demander_result.scalar_one_or_none()
+    elif identity.is_demander and identity.demander_id:
+        demander = await session.get(Demander, identity.demander_id)
         
         if demander:
             profile_text += f"""
@@ -128,7 +118,7 @@ async def cmd_profile(message: Message, session: AsyncSession):
     
     await message.answer(
         profile_text,
-        reply_markup=get_profile_actions_keyboard(user.role)
+        reply_markup=get_profile_actions_keyboard(identity.role.value)
     )
 
 def format_price_for_profile(supplier):
@@ -149,88 +139,66 @@ def format_price_for_profile(supplier):
         return f"{unit} {min_price} تا {max_price} تومان"
 
 # مدیریت درخواست‌ها
-@router.message(F.text == "📥 درخواست‌های من")
+@router.message(F.text.in_({"📥 درخواست‌های من", "📨 درخواست‌های جدید"}), flags=READ_ONLY)
 async def my_requests(message: Message, session: AsyncSession):
     """نمایش درخواست‌های کاربر"""
-    user_result = await session.execute(
-        select(User).where(User.telegram_id == str(message.from_user.id))
-    )
-    user = user_result.scalar_one_or_none()
+    identity = await identity_cache.get(session, message.from_user.id)
     
-    if not user:
+    if not identity:
         await message.answer("لطفاً ابتدا ثبت‌نام کنید.")
         return
     
     # بر اساس نقش کاربر
-    if user.role == 'supplier':
-        await show_supplier_requests(message, user, session)
-    elif user.role == 'demander':
-        await show_demander_requests(message, user, session)
+    if identity.is_supplier:
+        await show_supplier_requests(message, identity, session)
+    elif identity.is_demander:
+        await show_demander_requests(message, identity, session)
 
-async def show_supplier_requests(message: Message, user: User, session: AsyncSession):
+async def show_supplier_requests(message: Message, identity: Identity, session: AsyncSession, page: int = 1, edit: bool = False):
     """نمایش درخواست‌های دریافتی برای تأمین‌کننده"""
-    # دریافت supplier
-    supplier_result = await session.execute(
-        select(Supplier).where(Supplier.user_id == user.id)
-    )
-    supplier = supplier_result.scalar_one_or_none()
-    
-    if not supplier:
+    if not identity.supplier_id:
         await message.answer("پروفایل تأمین‌کننده یافت نشد!")
         return
     
-    # دریافت درخواست‌های pending
-    requests_result = await session.execute(
-        select(Request)
-        .where(Request.supplier_id == supplier.id)
-        .where(Request.status == RequestStatus.PENDING)
-        .order_by(Request.created_at.desc())
-    )
-    requests = requests_result.scalars().all()
+    # دریافت درخواست‌های pending (یک کوئری با نام درخواست‌کننده)
+    requests_page = await list_supplier_inbox(session, identity.supplier_id, page)
     
-    if not requests:
+    if not requests_page.items:
         await message.answer("📭 شما درخواست جدیدی ندارید.")
         return
     
-    text = f"📥 درخواست‌های دریافتی ({len(requests)} مورد):\n\n"
+    text = f"📥 درخواست‌های دریافتی ({requests_page.total} مورد):\n\n"
     
-    for i, req in enumerate(requests, 1):
-        text += f"{i}. از: {req.demander.full_name}\n"
+    offset = (requests_page.page - 1) * requests_page.page_size
+    for i, req in enumerate(requests_page.items, offset + 1):
+        text += f"{i}. از: {req.counterpart_name or '-'}\n"
         text += f"   زمان: {req.created_at.strftime('%Y/%m/%d %H:%M')}\n"
         text += f"   وضعیت: در انتظار پاسخ\n\n"
     
-    await message.answer(text)
+    keyboard = get_pagination_keyboard(requests_page.page, requests_page.total_pages, "inbox") if requests_page.total_pages > 1 else None
+    if edit:
+        await message.edit_text(text, reply_markup=keyboard)
+    else:
+        await message.answer(text, reply_markup=keyboard)
     
     # نمایش جزئیات هر درخواست
-    for req in requests[:5]:  # حداکثر 5 درخواست اخیر
+    for req in requests_page.items[:5]:  # حداکثر 5 درخواست از این صفحه
         await message.answer(
-            f"👤 {req.demander.full_name}\n"
-            f"💬 {req.message[:200]}{'...' if len(req.message) > 200 else ''}",
-            reply_markup=get_request_detail_keyboard(req.id)
+            f"👤 {req.counterpart_name or '-'}\n"
+            f"💬 {req.message_preview}{'...' if req.message_truncated else ''}",
+            reply_markup=get_request_action_keyboard(req.id)
         )
 
-async def show_demander_requests(message: Message, user: User, session: AsyncSession):
+async def show_demander_requests(message: Message, identity: Identity, session: AsyncSession, page: int = 1, edit: bool = False):
     """نمایش درخواست‌های ارسالی برای درخواست‌کننده"""
-    # دریافت demander
-    demander_result = await session.execute(
-        select(Demander).where(Demander.user_id == user.id)
-    )
-    demander = demander_result.scalar_one_or_none()
-    
-    if not demander:
+    if not identity.demander_id:
         await message.answer("پروفایل درخواست‌کننده یافت نشد!")
         return
     
-    # دریافت درخواست‌های ارسالی
-    requests_result = await session.execute(
-        select(Request)
-        .where(Request.demander_id == demander.id)
-        .order_by(Request.created_at.desc())
-        .limit(10)
-    )
-    requests = requests_result.scalars().all()
+    # دریافت درخواست‌های ارسالی (یک کوئری با نام تأمین‌کننده)
+    requests_page = await list_demander_outbox(session, identity.demander_id, page)
     
-    if not requests:
+    if not requests_page.items:
         await message.answer("📭 شما هنوز درخواستی ارسال نکرده‌اید.")
         return
     
@@ -248,17 +216,36 @@ async def show_demander_requests(message: Message, user: User, session: AsyncSes
         RequestStatus.REJECTED: "رد شده"
     }
     
-    for req in requests:
-        text += f"{status_emoji.get(req.status, '❓')} به: {req.supplier.full_name}\n"
+    for req in requests_page.items:
+        text += f"{status_emoji.get(req.status, '❓')} به: {req.counterpart_name or '-'}\n"
         text += f"   زمان: {req.created_at.strftime('%Y/%m/%d %H:%M')}\n"
         text += f"   وضعیت: {status_text.get(req.status, 'نامشخص')}\n"
         
-        if req.status == RequestStatus.ACCEPTED and req.response_message:
-            text += f"   پیام: {req.response_message[:50]}...\n"
+        if req.status == RequestStatus.ACCEPTED and req.response_preview:
+            text += f"   پیام: {req.response_preview}...\n"
         
         text += "\n"
     
-    await message.answer(text)
+    keyboard = get_pagination_keyboard(requests_page.page, requests_page.total_pages, "outbox") if requests_page.total_pages > 1 else None
+    if edit:
+        await message.edit_text(text, reply_markup=keyboard)
+    else:
+        await message.answer(text, reply_markup=keyboard)
+
+@router.callback_query(F.data.regexp(r"^(inbox|outbox):page:\d+$"), flags=READ_ONLY)
+async def handle_requests_pagination(callback: CallbackQuery, session: AsyncSession):
+    """صفحه‌بندی لیست درخواست‌ها"""
+    await callback.answer()
+    box, _, page = callback.data.split(":")
+    
+    identity = await identity_cache.get(session, callback.from_user.id)
+    if not identity:
+        return
+    
+    if box == "inbox":
+        await show_supplier_requests(callback.message, identity, session, int(page), edit=True)
+    else:
+        await show_demander_requests(callback.message, identity, session, int(page), edit=True)
 
 # Callback handlers
 @router.callback_query(F.data == "edit_profile")
@@ -266,16 +253,13 @@ async def edit_profile_callback(callback: CallbackQuery, state: FSMContext, sess
     """شروع فرآیند ویرایش پروفایل"""
     await callback.answer()
     
-    user_result = await session.execute(
-        select(User).where(User.telegram_id == str(callback.from_user.id))
-    )
-    user = user_result.scalar_one_or_none()
+    identity = await identity_cache.get(session, callback.from_user.id)
     
-    if not user:
+    if not identity:
         await callback.message.answer("خطا در دریافت اطلاعات کاربر!")
         return
     
-    if user.role == 'supplier':
+    if identity.is_supplier:
         # منوی ویرایش برای تأمین‌کننده
         text = """
 🛠 کدام بخش را می‌خواهید ویرایش کنید؟
@@ -308,7 +292,7 @@ async def select_field_to_edit(message: Message, state: FSMContext, session: Asy
     """انتخاب فیلد برای ویرایش"""
     if message.text == "/cancel":
         await state.clear()
-        await message.answer("❌ ویرایش لغو شد.", reply_markup=get_main_menu_keyboard())
+        await message.answer("❌ ویرایش لغو شد.", reply_markup=get_main_menu())
         return
     
     choice = message.text.strip()
@@ -343,7 +327,7 @@ async def cmd_cancel(message: Message, state: FSMContext):
     await state.clear()
     await message.answer(
         "❌ عملیات لغو شد.",
-        reply_markup=get_main_menu_keyboard()
+        reply_markup=get_main_menu()
     )
 
 # Error handler
@@ -2,16 +2,33 @@ from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, ReplyKeyboardRemove, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_, cast, String
-from typing import List
+from sqlalchemy import select, delete, and_, or_, String, func, literal, bindparam, true
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.postgresql import ARRAY
+from typing import List, Optional, Tuple
 import math
 import logging
 
-from database.models import User, Demander, Supplier, UserRole, Request, RequestStatus
+from database.models import User, Demander, Supplier, UserRole, Request, RequestStatus, WorkStyle, SavedSearch
 from states.demander import DemanderRegistration, DemanderSearch
 from keyboards.reply import *
 from keyboards.inline import *
 from utils.users import get_or_create_user
+from utils.identity import identity_cache
+from search.index import supplier_index
+from search.cache import search_cache, canonical_criteria, criteria_hash, to_json_criteria
+from search.alerts import saved_search_index, SavedQuery, MAX_SAVED_SEARCHES
+from search.cursor import SearchCursor, PAGE_SIZE, NEXT, PREVIOUS, CURRENT, slice_sorted, keyset_clause
+from config.settings import settings
+from utils.normalize import normalize_text, normalize_place
+from utils.search_history import search_history_writer
+from utils.counters import supplier_counters
+from utils.dataloader import get_supplier
+from utils.invalidation import SAVED_SEARCH, invalidation_bus
+from utils.requests import create_request
+from utils.notifications import notification_dispatcher, queue_supplier_new_request
+from middlewares.idempotency import IDEMPOTENT
+from middlewares.database import READ_ONLY
 
 router = Router()
 logging.basicConfig(level=logging.INFO)
@@ -94,6 +111,7 @@ async def process_demander_phone(message: Message, state: FSMContext, session: A
         
         session.add(demander)
         await session.commit()
+        await identity_cache.invalidate(message.from_user.id)
         
         await message.answer(
             "✅ ثبت‌نام شما با موفقیت انجام شد!\n\n" 
@@ -123,6 +141,11 @@ async def show_search_menu(message: Message, state: FSMContext, session: AsyncSe
     )
     await state.set_state(DemanderSearch.city)
 
+@router.message(F.text == "🔍 جستجوی تأمین‌کننده")
+async def start_search_from_menu(message: Message, state: FSMContext):
+    """شروع جستجو از منوی درخواست‌کننده"""
+    await show_search_menu(message, state)
+
 @router.message(DemanderSearch.city)
 async def process_search_city(message: Message, state: FSMContext):
     """پردازش شهر برای جستجو"""
@@ -262,7 +285,7 @@ async def process_search_price_range(message: Message, state: FSMContext):
     )
     await state.set_state(DemanderSearch.special_features)
 
-@router.message(DemanderSearch.special_features)
+@router.message(DemanderSearch.special_features, flags=READ_ONLY)
 async def process_search_special_features(message: Message, state: FSMContext, session: AsyncSession):
     """پردازش ویژگی‌های خاص و شروع جستجو"""
     if message.text == "↩️ بازگشت":
@@ -277,24 +300,31 @@ async def process_search_special_features(message: Message, state: FSMContext, s
     
     try:
         data = await state.get_data()
-        suppliers = await search_suppliers(session, data)
+        total_count = await count_search_results(session, data)
+        search_history_writer.record(message.from_user.id, data, total_count)
         
-        if not suppliers:
+        if not total_count:
             await message.answer(
                 "متأسفانه تأمین‌کننده‌ای با مشخصات مورد نظر شما یافت نشد.\n\n" 
                 "می‌توانید با تغییر فیلترها مجدداً جستجو کنید.",
                 reply_markup=get_main_menu()
             )
-            await state.clear()
+            await message.answer(
+                "می‌خواهید وقتی تأمین‌کننده جدیدی با این مشخصات ثبت‌نام کرد خبرتان کنیم؟",
+                reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
+                    InlineKeyboardButton(text="🔔 خبرم کن", callback_data="save_search")
+                ]])
+            )
+            # فیلترها برای دکمه «خبرم کن» در state باقی می‌مانند
+            await state.set_state(None)
             return
         
         await state.update_data(
-            search_results=[s.id for s in suppliers],
-            current_page=1,
-            total_pages=math.ceil(len(suppliers) / 5)
+            search_cursor=SearchCursor.new().encode(),
+            total_pages=math.ceil(total_count / PAGE_SIZE)
         )
         
-        await show_search_results(message, state, 1, session)
+        await show_search_results(message, state, session)
         await state.set_state(DemanderSearch.viewing_results)
 
     except Exception as e:
@@ -305,26 +335,34 @@ async def process_search_special_features(message: Message, state: FSMContext, s
         )
         await state.clear()
 
-async def show_search_results(message: Message, state: FSMContext, page: int, session: AsyncSession):
-    """نمایش نتایج جستجو با صفحه‌بندی"""
+async def show_search_results(message: Message, state: FSMContext, session: AsyncSession, direction: str = CURRENT):
+    """نمایش نتایج جستجو با صفحه‌بندی keyset"""
     data = await state.get_data()
-    supplier_ids = data.get('search_results', [])
     total_pages = data.get('total_pages', 1)
     
-    start_idx = (page - 1) * 5
-    end_idx = start_idx + 5
-    page_supplier_ids = supplier_ids[start_idx:end_idx]
+    cursor = SearchCursor.decode(data.get('search_cursor'))
+    if cursor is None or cursor.is_expired(settings.search_cursor_ttl):
+        await message.answer(
+            "⏳ نتایج این جستجو منقضی شده است. لطفاً جستجوی جدیدی انجام دهید.",
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
+                InlineKeyboardButton(text="🔙 جستجوی جدید", callback_data="new_search")
+            ]])
+        )
+        return
     
-    if not page_supplier_ids:
+    page_rows = await fetch_search_page(session, data, cursor, direction)
+    
+    if not page_rows:
         await message.answer("هیچ نتیجه‌ای برای نمایش در این صفحه وجود ندارد.")
         return
-        
-    stmt = select(Supplier).where(Supplier.id.in_(page_supplier_ids)).order_by(Supplier.id)
-    result = await session.execute(stmt)
-    suppliers = result.scalars().all()
     
-    supplier_map = {s.id: s for s in suppliers}
-    ordered_suppliers = [supplier_map[id] for id in page_supplier_ids if id in supplier_map]
+    cursor = cursor.moved(direction, [key for key, _ in page_rows])
+    await state.update_data(search_cursor=cursor.encode())
+    
+    page = cursor.page
+    start_idx = (page - 1) * PAGE_SIZE
+    ordered_suppliers = [supplier for _, supplier in page_rows]
+    await supplier_counters.record_views([supplier.id for supplier in ordered_suppliers], message.chat.id, 'list')
     
     text = f"📋 نتایج جستجو (صفحه {page} از {total_pages}):\n\n"
     builder = InlineKeyboardBuilder()
@@ -343,6 +381,7 @@ async def show_search_results(message: Message, state: FSMContext, page: int, se
         pagination_builder.button(text="بعدی ▶️", callback_data=f"search_page:{page+1}")
     
     builder.attach(pagination_builder)
+    builder.row(InlineKeyboardButton(text="🔔 خبرم کن از موارد جدید", callback_data="save_search"))
     builder.row(InlineKeyboardButton(text="🔙 جستجوی جدید", callback_data="new_search"))
     
     try:
@@ -356,35 +395,43 @@ async def show_search_results(message: Message, state: FSMContext, page: int, se
         # If editing fails, send as new message
         await message.answer(text, reply_markup=builder.as_markup())
 
-@router.callback_query(F.data.startswith("search_page:"))
+@router.callback_query(F.data.startswith("search_page:"), flags=READ_ONLY)
 async def handle_search_pagination(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     """هندل کردن صفحه‌بندی نتایج"""
     try:
         page = int(callback.data.split(":")[1])
-        await state.update_data(current_page=page)
+        data = await state.get_data()
+        cursor = SearchCursor.decode(data.get('search_cursor'))
+        direction = cursor.direction_to(page) if cursor else CURRENT
+        if direction is None:
+            # دکمه پیام قدیمی: صفحه فعلی با دکمه‌های درست دوباره نمایش داده می‌شود
+            await show_search_results(callback.message, state, session, CURRENT)
+            await callback.answer(f"این دکمه قدیمی است؛ صفحه فعلی {cursor.page} است.")
+            return
         try:
-            await show_search_results(callback.message, state, page, session)
+            await show_search_results(callback.message, state, session, direction)
         except Exception as e:
             # If editing fails, send a new message
             await callback.message.answer("🔄 بارگذاری نتایج جدید...")
-            await show_search_results(callback.message, state, page, session)
+            await show_search_results(callback.message, state, session, direction)
         await callback.answer()
     except Exception as e:
         await callback.answer("❌ خطا در بارگذاری صفحه")
 
-@router.callback_query(F.data.startswith("view_supplier:"))
+@router.callback_query(F.data.startswith("view_supplier:"), flags=READ_ONLY)
 async def view_supplier_details(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     """نمایش جزئیات تأمین‌کننده"""
     supplier_id = int(callback.data.split(":")[1])
     
-    result = await session.execute(select(Supplier).where(Supplier.id == supplier_id))
-    supplier = result.scalar_one_or_none()
+    # جستجوهای هم‌زمان کاربران مختلف در یک کوئری ادغام می‌شوند
+    supplier = await get_supplier(session, supplier_id)
     
     if not supplier:
         await callback.answer("تأمین‌کننده یافت نشد!", show_alert=True)
         return
     
     await state.update_data(selected_supplier_id=supplier_id)
+    await supplier_counters.record_views([supplier_id], callback.from_user.id, 'detail')
     await callback.message.edit_text(
         format_supplier_details(supplier),
         reply_markup=get_supplier_detail_keyboard(supplier_id)
@@ -392,11 +439,10 @@ async def view_supplier_details(callback: CallbackQuery, state: FSMContext, sess
     await state.set_state(DemanderSearch.viewing_supplier)
     await callback.answer()
 
-@router.callback_query(F.data == "back_to_list")
+@router.callback_query(F.data == "back_to_list", flags=READ_ONLY)
 async def back_to_search_results(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     """بازگشت به لیست نتایج"""
-    data = await state.get_data()
-    await show_search_results(callback.message, state, data.get('current_page', 1), session)
+    await show_search_results(callback.message, state, session)
     await state.set_state(DemanderSearch.viewing_results)
     await callback.answer()
 
@@ -422,26 +468,37 @@ async def process_appointment_message(message: Message, state: FSMContext, sessi
     await message.answer(preview_text, reply_markup=get_request_confirmation_keyboard())
     await state.update_data(appointment_message=message.text)
 
-@router.callback_query(F.data == "confirm_request")
+@router.callback_query(F.data == "confirm_request", flags=IDEMPOTENT)
 async def confirm_appointment_request(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     """تأیید و ارسال درخواست وقت"""
     data = await state.get_data()
     
-    result = await session.execute(select(User).where(User.telegram_id == str(callback.from_user.id)))
-    user = result.scalar_one_or_none()
+    identity = await identity_cache.get(session, callback.from_user.id)
     
-    if not user or not user.demander_profile:
+    if not identity or not identity.demander_id:
         await callback.answer("خطا: پروفایل شما یافت نشد!", show_alert=True)
         return
     
-    request = Request(
-        demander_id=user.demander_profile.id,
-        supplier_id=data['appointment_supplier_id'],
-        message=data['appointment_message'],
-        status=RequestStatus.PENDING
+    if not data.get('appointment_supplier_id') or not data.get('appointment_message'):
+        await callback.answer("این درخواست قبلاً ارسال شده است.", show_alert=True)
+        return
+    
+    # ثبت اتمیک؛ دوبار زدن دکمه درخواست تکراری نمی‌سازد
+    request = await create_request(
+        session, identity.demander_id, data['appointment_supplier_id'], data['appointment_message']
     )
-    session.add(request)
+    if request is None:
+        await session.commit()
+        await callback.answer("درخواست قبلی شما به این تأمین‌کننده هنوز در انتظار پاسخ است.", show_alert=True)
+        return
+    
+    # اعلان در همان تراکنش درخواست ثبت و در پس‌زمینه ارسال می‌شود
+    await queue_supplier_new_request(session, request)
     await session.commit()
+    notification_dispatcher.wake()
+    
+    await supplier_counters.record_request(data['appointment_supplier_id'])
+    await state.update_data(appointment_supplier_id=None, appointment_message=None)
     
     await callback.message.edit_text(
         "✅ درخواست شما با موفقیت ارسال شد!\n\n" 
@@ -463,6 +520,66 @@ async def cancel_appointment_request(callback: CallbackQuery, state: FSMContext)
     await state.set_state(DemanderSearch.viewing_supplier)
     await callback.answer()
 
+@router.callback_query(F.data == "save_search")
+async def save_current_search(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    """ذخیره جستجوی فعلی برای اطلاع‌رسانی تأمین‌کنندگان جدید"""
+    data = await state.get_data()
+    if 'search_city' not in data:
+        await callback.answer("⏳ این جستجو منقضی شده است. لطفاً دوباره جستجو کنید.", show_alert=True)
+        return
+    
+    identity = await identity_cache.get(session, callback.from_user.id)
+    if not identity or not identity.demander_id:
+        await callback.answer("خطا: پروفایل شما یافت نشد!", show_alert=True)
+        return
+    demander_id = identity.demander_id
+    
+    saved_count = await session.scalar(
+        select(func.count()).select_from(SavedSearch).where(SavedSearch.demander_id == demander_id)
+    )
+    if saved_count >= MAX_SAVED_SEARCHES:
+        await callback.answer(
+            f"حداکثر {MAX_SAVED_SEARCHES} جستجو را می‌توانید ذخیره کنید.", show_alert=True
+        )
+        return
+    
+    stmt = (
+        pg_insert(SavedSearch)
+        .values(
+            demander_id=demander_id,
+            search_criteria=to_json_criteria(data),
+            criteria_hash=criteria_hash(canonical_criteria(data)),
+        )
+        .on_conflict_do_nothing(constraint="uq_saved_searches_demander_criteria")
+        .returning(SavedSearch.id)
+    )
+    saved_search_id = (await session.execute(stmt)).scalar_one_or_none()
+    await session.commit()
+    
+    if saved_search_id is not None:
+        saved_search_index.add(SavedQuery(saved_search_id, demander_id, callback.from_user.id, data))
+        await invalidation_bus.publish(SAVED_SEARCH, saved_search_id)
+    await callback.answer("🔔 وقتی تأمین‌کننده جدیدی با این مشخصات ثبت شود به شما خبر می‌دهیم.", show_alert=True)
+
+@router.callback_query(F.data.startswith("unsave_search:"))
+async def delete_saved_search(callback: CallbackQuery, session: AsyncSession):
+    """لغو اطلاع‌رسانی یک جستجوی ذخیره‌شده"""
+    saved_search_id = int(callback.data.split(":")[1])
+    identity = await identity_cache.get(session, callback.from_user.id)
+    if not identity or not identity.demander_id:
+        await callback.answer("خطا: پروفایل شما یافت نشد!", show_alert=True)
+        return
+    
+    await session.execute(
+        delete(SavedSearch)
+        .where(SavedSearch.id == saved_search_id, SavedSearch.demander_id == identity.demander_id)
+    )
+    await session.commit()
+    
+    saved_search_index.remove(saved_search_id)
+    await invalidation_bus.publish(SAVED_SEARCH, saved_search_id)
+    await callback.answer("🔕 اطلاع‌رسانی این جستجو لغو شد.")
+
 @router.callback_query(F.data == "new_search")
 async def start_new_search(callback: CallbackQuery, state: FSMContext):
     """شروع جستجوی جدید"""
@@ -473,12 +590,96 @@ async def start_new_search(callback: CallbackQuery, state: FSMContext):
 
 # ========== Helper Functions ========== 
 
-async def search_suppliers(session: AsyncSession, search_criteria: dict) -> List[Supplier]:
-    """جستجوی تأمین‌کنندگان بر اساس فیلترها"""
-    query = select(Supplier).where(Supplier.user.has(is_active=True))
-    
-    if city := search_criteria.get('search_city'):
-        query = query.where(Supplier.city.ilike(f"%{city}%"))
+async def search_suppliers(session: AsyncSession, search_criteria: dict) -> List[int]:
+    """جستجوی تأمین‌کنندگان بر اساس فیلترها و بازگرداندن شناسه‌ها به ترتیب رتبه"""
+    return [supplier_id for _, supplier_id in await rank_suppliers(session, search_criteria)]
+
+async def rank_suppliers(session: AsyncSession, search_criteria: dict) -> List[Tuple[float, int]]:
+    """کلیدهای (rank, id) همه نتایج، مرتب بر اساس rank نزولی و سپس id"""
+    if supplier_index.ready:
+        return supplier_index.search_ranked(search_criteria)
+    
+    result = await session.execute(ranked_search_query(search_criteria))
+    return [(float(row_rank), supplier_id) for supplier_id, row_rank in result]
+
+async def count_search_results(session: AsyncSession, search_criteria: dict) -> int:
+    """تعداد کل نتایج برای نمایش «صفحه X از Y» (از کش یا با COUNT)"""
+    if supplier_index.ready:
+        return len(supplier_index.search(search_criteria))
+    
+    cached_count = await search_cache.get_count(search_criteria)
+    if cached_count is not None:
+        return cached_count
+    return await session.scalar(search_count_query(search_criteria))
+
+async def fetch_search_page(
+    session: AsyncSession,
+    search_criteria: dict,
+    cursor: Optional[SearchCursor] = None,
+    direction: str = CURRENT
+) -> List[Tuple[tuple, Supplier]]:
+    """دریافت فقط ردیف‌های یک صفحه (مرتب بر اساس rank و سپس Supplier.id) به همراه کلید keyset"""
+    anchor = cursor.anchor(direction) if cursor else None
+    
+    if supplier_index.ready:
+        keys = supplier_index.search_ranked(search_criteria)
+        return await load_page_suppliers(session, slice_sorted(keys, anchor, direction, PAGE_SIZE))
+    
+    keys = await search_cache.get_page(search_criteria, anchor, direction, PAGE_SIZE)
+    if keys is not None:
+        return await load_page_suppliers(session, keys)
+    
+    if search_cache.redis is not None:
+        # با ایندکس درون‌حافظه‌ای خاموش، لیست رتبه‌بندی‌شده یک بار محاسبه و ذخیره می‌شود
+        # تا صفحات بعدی و جستجوهای مشابه از Redis خوانده شوند
+        generation = await search_cache.generation(search_criteria)
+        keys = await rank_suppliers(session, search_criteria)
+        await search_cache.store(search_criteria, keys, generation)
+        return await load_page_suppliers(session, slice_sorted(keys, anchor, direction, PAGE_SIZE))
+    
+    result = await session.execute(search_page_query(search_criteria, anchor, direction))
+    rows = result.all()
+    if direction == PREVIOUS:
+        rows.reverse()
+    return [((float(row_rank), supplier.id), supplier) for supplier, row_rank in rows]
+
+async def load_page_suppliers(session: AsyncSession, keys: List[tuple]) -> List[Tuple[tuple, Supplier]]:
+    """بارگذاری ردیف‌های Supplier یک صفحه به ترتیب کلیدهای داده‌شده"""
+    result = await session.execute(select(Supplier).where(Supplier.id.in_([key[1] for key in keys])))
+    supplier_map = {s.id: s for s in result.scalars()}
+    return [(key, supplier_map[key[1]]) for key in keys if key[1] in supplier_map]
+
+def search_count_query(search_criteria: dict):
+    """کوئری تعداد کل نتایج"""
+    return apply_search_filters(select(func.count(Supplier.id)), search_criteria)
+
+def ranked_search_query(search_criteria: dict):
+    """کوئری کلیدهای (id, rank) همه نتایج، مرتب بر اساس rank نزولی و سپس id"""
+    rank = search_rank(search_criteria)
+    _, order_by = keyset_clause(rank, Supplier.id, None, CURRENT)
+    return apply_search_filters(
+        select(Supplier.id, rank if rank is not None else literal(0)), search_criteria
+    ).order_by(*order_by)
+
+def search_page_query(search_criteria: dict, anchor: Optional[tuple] = None, direction: str = CURRENT):
+    """کوئری ردیف‌های یک صفحه (Supplier, rank) از نقطه anchor در جهت direction"""
+    rank = search_rank(search_criteria)
+    clause, order_by = keyset_clause(rank, Supplier.id, anchor, direction)
+    query = apply_search_filters(
+        select(Supplier, rank if rank is not None else literal(0)), search_criteria
+    ).order_by(*order_by).limit(PAGE_SIZE)
+    if clause is not None:
+        query = query.where(clause)
+    return query
+
+def apply_search_filters(query, search_criteria: dict):
+    """اعمال فیلترهای جستجو روی کوئری (مسیر جایگزین وقتی ایندکس آماده نیست)"""
+    # "= true" تا با شرط ایندکس‌های جزئی WHERE is_active تطبیق داده شود
+    query = query.where(Supplier.is_active == true())
+    
+    if city := normalize_place(search_criteria.get('search_city')):
+        # تطبیق پیشوندی روی شکل یکسان‌شده که با ایندکس ix_suppliers_city_norm پاسخ داده می‌شود
+        query = query.where(Supplier.city_norm.like(f"{escape_like(city)}%", escape='/'))
     
     if gender := search_criteria.get('search_gender'):
         query = query.where(Supplier.gender == gender)
@@ -491,23 +692,27 @@ async def search_suppliers(session: AsyncSession, search_criteria: dict) -> List
         query = query.where(and_(Supplier.price_range_min <= max_price, Supplier.price_range_max >= min_price))
     
     if styles := search_criteria.get('search_work_styles'):
-        from sqlalchemy.dialects.postgresql import JSONB
-        from sqlalchemy import cast, func
-        style_conditions = []
-        for style in styles:
-            # Cast work_styles to JSONB and use PostgreSQL's @> operator
-            style_conditions.append(
-                cast(Supplier.work_styles, JSONB).contains([style])
-            )
-        if style_conditions:
-            query = query.where(or_(*style_conditions))
-    
-    if features := search_criteria.get('search_special_features'):
-        feature_clauses = [col.ilike(f"%{features}%") for col in [Supplier.special_features, Supplier.hair_color, Supplier.eye_color]]
-        query = query.where(or_(*feature_clauses))
-    
-    result = await session.execute(query)
-    return result.scalars().all()
+        # یک عملگر ?| روی ستون jsonb که با ایندکس GIN پاسخ داده می‌شود
+        valid_styles = sorted({style.value for style in WorkStyle} & set(styles))
+        query = query.where(Supplier.work_styles.has_any(
+            bindparam('search_work_styles', valid_styles, type_=ARRAY(String))
+        ))
+    
+    if features := normalize_text(search_criteria.get('search_special_features')):
+        # الگو در پایتون ساخته می‌شود تا برای ایندکس GIN سه‌حرفی ثابت باشد
+        query = query.where(Supplier.features_search.like(f"%{escape_like(features)}%", escape='/'))
+    
+    return query
+
+def escape_like(text: str) -> str:
+    """escape کاراکترهای ویژه LIKE با '/'"""
+    return text.replace('/', '//').replace('%', '/%').replace('_', '/_')
+
+def search_rank(search_criteria: dict):
+    """عبارت رتبه‌بندی: شباهت سه‌حرفی با ویژگی‌های ظاهری، یا None اگر فیلتر متنی نباشد"""
+    if features := normalize_text(search_criteria.get('search_special_features')):
+        return func.similarity(Supplier.features_search, features)
+    return None
 
 def format_supplier_summary(supplier: Supplier) -> str:
     """فرمت خلاصه اطلاعات تأمین‌کننده برای نمایش در لیست"""
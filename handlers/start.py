@@ -3,10 +3,8 @@ from aiogram.filters import CommandStart
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
 
-from database.models import User, UserRole
+from utils.identity import identity_cache
 from keyboards.reply import get_main_menu, get_back_keyboard
 from states.supplier import SupplierRegistration
 from states.demander import DemanderRegistration
@@ -18,14 +16,12 @@ async def cmd_start(message: Message, state: FSMContext, session: AsyncSession):
     """هندلر دستور /start"""
     await state.clear()
     
-    # بررسی کاربر در دیتابیس
-    stmt = select(User).where(User.telegram_id == str(message.from_user.id))
-    result = await session.execute(stmt)
-    user = result.scalar_one_or_none()
+    # بررسی کاربر (از کش هویت یا دیتابیس)
+    identity = await identity_cache.get(session, message.from_user.id)
     
-    if user:
+    if identity:
         # کاربر قبلاً ثبت‌نام کرده
-        if user.role == UserRole.SUPPLIER:
+        if identity.is_supplier:
             await message.answer(
                 f"سلام {message.from_user.full_name} عزیز! 👋\n"
                 "شما قبلاً به عنوان تأمین‌کننده ثبت‌نام کرده‌اید.\n"
@@ -53,12 +49,10 @@ async def cmd_start(message: Message, state: FSMContext, session: AsyncSession):
 @router.message(F.text == "🎭 تأمین‌کننده")
 async def select_supplier_role(message: Message, state: FSMContext, session: AsyncSession):
     """انتخاب نقش تأمین‌کننده"""
-    # بررسی وجود کاربر
-    stmt = select(User).options(selectinload(User.supplier_profile)).where(User.telegram_id == str(message.from_user.id))
-    result = await session.execute(stmt)
-    user = result.scalar_one_or_none()
+    # بررسی وجود پروفایل تأمین‌کننده
+    identity = await identity_cache.get(session, message.from_user.id)
     
-    if user and user.supplier_profile:
+    if identity and identity.supplier_id:
         # کاربر قبلاً پروفایل تأمین‌کننده دارد
         from handlers.supplier import show_supplier_menu
         await show_supplier_menu(message, state, session)
@@ -74,12 +68,10 @@ async def select_supplier_role(message: Message, state: FSMContext, session: Asy
 @router.message(F.text == "🔍 درخواست‌کننده")
 async def select_demander_role(message: Message, state: FSMContext, session: AsyncSession):
     """انتخاب نقش درخواست‌کننده"""
-    # بررسی وجود کاربر
-    stmt = select(User).options(selectinload(User.demander_profile)).where(User.telegram_id == str(message.from_user.id))
-    result = await session.execute(stmt)
-    user = result.scalar_one_or_none()
+    # بررسی وجود پروفایل درخواست‌کننده
+    identity = await identity_cache.get(session, message.from_user.id)
     
-    if user and user.demander_profile:
+    if identity and identity.demander_id:
         # کاربر قبلاً پروفایل درخواست‌کننده دارد
         from handlers.demander import show_search_menu
         await show_search_menu(message, state, session)
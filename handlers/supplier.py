@@ -8,14 +8,24 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from datetime import datetime
 
-from database.models import User, Supplier, UserRole, Request, RequestStatus
+from database.models import User, Supplier, UserRole, Request, RequestStatus, NotificationMode
 from states.supplier import SupplierRegistration, SupplierMenu, SupplierEditProfile, PhotoEditState, SupplierSettings
 from keyboards.reply import *
 from keyboards.inline import get_request_action_keyboard
 from utils.validators import validate_phone_number, validate_age, validate_height_weight
 from aiogram.types import KeyboardButton, ReplyKeyboardMarkup
-from sqlalchemy.orm import selectinload
-from utils.users import get_or_create_user
+from utils.users import get_or_create_user, set_supplier_active, set_supplier_notification_mode
+from utils.identity import identity_cache
+from utils.dataloader import get_supplier
+from search.index import SupplierDocument
+from search.events import notify_supplier_changed
+from search.alerts import dispatch_search_alerts
+from utils.normalize import normalize_place
+from middlewares.database import READ_ONLY
+from middlewares.idempotency import IDEMPOTENT
+from utils.requests import transition_request
+from utils.notifications import notification_dispatcher, queue_request_response
+from config.settings import settings
 
 router = Router()
 logging.basicConfig(level=logging.INFO)
@@ -116,6 +126,7 @@ async def process_confirmation(message: Message, state: FSMContext, session: Asy
                 'skin_color': data['skin_color'], 'top_size': data['top_size'], 'bottom_size': data['bottom_size'],
                 'special_features': data.get('special_features'), 'price_range_min': price_min,
                 'price_range_max': price_max, 'price_unit': price_unit, 'city': data['city'], 'area': data['area'],
+                'city_norm': normalize_place(data['city']), 'area_norm': normalize_place(data['area']),
                 'cooperation_types': data.get('cooperation_types', []), 'work_styles': data.get('work_styles', []),
                 'brand_experience': data.get('brand_experience'), 'additional_notes': data.get('additional_notes')
             }
@@ -123,6 +134,7 @@ async def process_confirmation(message: Message, state: FSMContext, session: Asy
             result = await session.execute(select(Supplier).filter_by(user_id=user.id))
             supplier = result.scalar_one_or_none()
 
+            before = SupplierDocument.from_supplier(supplier) if supplier else None
             if supplier:
                 for key, value in supplier_data.items():
                     setattr(supplier, key, value)
@@ -131,6 +143,12 @@ async def process_confirmation(message: Message, state: FSMContext, session: Asy
                 session.add(supplier)
             
             await session.commit()
+            await identity_cache.invalidate(message.from_user.id)
+            # پروفایل غیرفعال در ایندکس و نتایج جستجو نمی‌ماند و اعلانی نمی‌فرستد
+            after = SupplierDocument.from_supplier(supplier) if supplier.is_active else None
+            await notify_supplier_changed(before, after)
+            if after is not None:
+                dispatch_search_alerts(message.bot, supplier, before, after)
             await message.answer("✅ ثبت‌نام شما با موفقیت انجام شد!", reply_markup=get_supplier_menu_keyboard())
             await state.set_state(SupplierMenu.main_menu)
             
@@ -141,14 +159,14 @@ async def process_confirmation(message: Message, state: FSMContext, session: Asy
 
 # ========== Supplier Menu ========== 
 
-@router.message(F.text == "👤 مشاهده پروفایل", StateFilter(SupplierMenu.main_menu))
+@router.message(F.text == "👤 مشاهده پروفایل", StateFilter(SupplierMenu.main_menu), flags=READ_ONLY)
 async def view_profile(message: Message, session: AsyncSession):
-    user = await get_user_by_telegram_id(session, str(message.from_user.id))
-    if not user or not user.supplier_profile:
+    identity = await identity_cache.get(session, message.from_user.id)
+    supplier = await get_supplier(session, identity.supplier_id) if identity and identity.supplier_id else None
+    if not supplier:
         await message.answer("پروفایل شما یافت نشد!")
         return
     
-    supplier = user.supplier_profile
     profile_text = create_supplier_profile_text(supplier)
     
     if supplier.portfolio_photos:
@@ -163,14 +181,115 @@ async def view_profile(message: Message, session: AsyncSession):
     else:
         await message.answer(profile_text)
 
+def digest_mode_title() -> str:
+    """عنوان حالت اعلان خلاصه با طول پنجره"""
+    return f"خلاصه هر {settings.notification_digest_window // 60} دقیقه"
+
+@router.message(F.text == "⚙️ تنظیمات", StateFilter(SupplierMenu.main_menu))
+async def show_settings(message: Message, state: FSMContext, session: AsyncSession):
+    """منوی تنظیمات تأمین‌کننده"""
+    identity = await identity_cache.get(session, message.from_user.id)
+    supplier = await get_supplier(session, identity.supplier_id) if identity and identity.supplier_id else None
+    if not supplier:
+        await message.answer("پروفایل شما یافت نشد!")
+        return
+    
+    status = "فعال ✅" if supplier.is_active else "غیرفعال ⛔️"
+    digest = supplier.notification_mode == NotificationMode.DIGEST.value
+    await message.answer(
+        f"⚙️ تنظیمات\n\nوضعیت پروفایل: {status}\n"
+        f"اعلان درخواست‌های جدید: {digest_mode_title() + ' 🗂' if digest else 'فوری 🔔'}\n\n"
+        "پروفایل غیرفعال در نتایج جستجو نمایش داده نمی‌شود.",
+        reply_markup=get_settings_keyboard(supplier.is_active, digest)
+    )
+    await state.set_state(SupplierSettings.menu)
+
+@router.message(F.text.in_({"🔴 غیرفعال کردن پروفایل", "🟢 فعال کردن پروفایل"}), StateFilter(SupplierSettings.menu))
+async def toggle_profile_active(message: Message, state: FSMContext, session: AsyncSession):
+    """فعال/غیرفعال کردن پروفایل"""
+    identity = await identity_cache.get(session, message.from_user.id)
+    if not identity or not identity.supplier_id:
+        await message.answer("پروفایل شما یافت نشد!")
+        return
+    
+    is_active = message.text == "🟢 فعال کردن پروفایل"
+    supplier = await set_supplier_active(session, identity.supplier_id, is_active)
+    if supplier is None:
+        await message.answer("پروفایل شما یافت نشد!")
+        return
+    await session.commit()
+    await identity_cache.invalidate(message.from_user.id)
+    
+    # حذف از (یا بازگشت به) ایندکس و کش جستجو
+    document = SupplierDocument.from_supplier(supplier)
+    digest = supplier.notification_mode == NotificationMode.DIGEST.value
+    if is_active:
+        await notify_supplier_changed(None, document)
+        await message.answer("🟢 پروفایل شما فعال شد و در جستجوها نمایش داده می‌شود.", reply_markup=get_settings_keyboard(True, digest))
+    else:
+        await notify_supplier_changed(document, None)
+        await message.answer("🔴 پروفایل شما غیرفعال شد و در جستجوها نمایش داده نمی‌شود.", reply_markup=get_settings_keyboard(False, digest))
+
+@router.message(F.text.in_({"🗂 اعلان خلاصه درخواست‌ها", "🔔 اعلان فوری درخواست‌ها"}), StateFilter(SupplierSettings.menu))
+async def toggle_notification_mode(message: Message, state: FSMContext, session: AsyncSession):
+    """تغییر اعلان درخواست‌های جدید بین فوری و خلاصه"""
+    identity = await identity_cache.get(session, message.from_user.id)
+    if not identity or not identity.supplier_id:
+        await message.answer("پروفایل شما یافت نشد!")
+        return
+    
+    digest = message.text == "🗂 اعلان خلاصه درخواست‌ها"
+    mode = NotificationMode.DIGEST if digest else NotificationMode.IMMEDIATE
+    supplier = await set_supplier_notification_mode(session, identity.supplier_id, mode)
+    if supplier is None:
+        await message.answer("پروفایل شما یافت نشد!")
+        return
+    await session.commit()
+    
+    if digest:
+        text = f"🗂 درخواست‌های جدید از این پس به صورت {digest_mode_title()} در یک پیام برای شما ارسال می‌شوند."
+    else:
+        text = "🔔 هر درخواست جدید بلافاصله برای شما ارسال می‌شود."
+    await message.answer(text, reply_markup=get_settings_keyboard(supplier.is_active, digest))
+
+@router.message(F.text == "↩️ بازگشت به منو", StateFilter(SupplierSettings.menu))
+async def back_from_settings(message: Message, state: FSMContext, session: AsyncSession):
+    """بازگشت از تنظیمات به منوی تأمین‌کننده"""
+    await show_supplier_menu(message, state, session)
+
 # ... (Other menu handlers remain the same) ...
 
-# ========== Helper Functions ========== 
+# ========== Request Management ========== 
 
-async def get_user_by_telegram_id(session: AsyncSession, telegram_id: str) -> User | None:
-    stmt = select(User).options(selectinload(User.supplier_profile)).where(User.telegram_id == telegram_id)
-    result = await session.execute(stmt)
-    return result.scalar_one_or_none()
+@router.callback_query(F.data.regexp(r"^(accept|reject)_request:\d+$"), flags=IDEMPOTENT)
+async def respond_to_request(callback: CallbackQuery, session: AsyncSession):
+    """پذیرش یا رد درخواست دریافتی"""
+    action, request_id = callback.data.split(":")
+    identity = await identity_cache.get(session, callback.from_user.id)
+    if not identity or not identity.supplier_id:
+        await callback.answer("پروفایل تأمین‌کننده یافت نشد!", show_alert=True)
+        return
+    
+    status = RequestStatus.ACCEPTED if action == "accept_request" else RequestStatus.REJECTED
+    # فقط اولین پاسخ اعمال می‌شود (UPDATE ... WHERE status = 'pending')
+    transition = await transition_request(session, int(request_id), identity.supplier_id, status)
+    if transition is None:
+        await session.commit()
+        await callback.answer("به این درخواست قبلاً پاسخ داده شده است.", show_alert=True)
+        return
+    
+    # اعلان به درخواست‌کننده همراه با تغییر وضعیت commit می‌شود
+    await queue_request_response(session, transition)
+    await session.commit()
+    notification_dispatcher.wake()
+    
+    result_text = "✅ درخواست پذیرفته شد." if status == RequestStatus.ACCEPTED else "❌ درخواست رد شد."
+    
+    if callback.message and callback.message.text:
+        await callback.message.edit_text(f"{callback.message.text}\n\n{result_text}")
+    await callback.answer(result_text)
+
+# ========== Helper Functions ========== 
 
 def create_supplier_summary(data: dict) -> str:
     coop_types_fa = {'in_person': 'حضوری', 'project_based': 'پروژه‌ای', 'part_time': 'پاره‌وقت'}
@@ -69,3 +69,63 @@ def get_request_confirmation_keyboard():
     )
     builder.adjust(2)
     return builder.as_markup()
+
+def get_saved_search_alert_keyboard(supplier_id: int, saved_search_id: int):
+    """کیبورد اعلان تأمین‌کننده جدید برای جستجوی ذخیره‌شده"""
+    builder = InlineKeyboardBuilder()
+    builder.button(
+        text="👁 مشاهده",
+        callback_data=f"view_supplier:{supplier_id}"
+    )
+    builder.button(
+        text="🔕 لغو این اطلاع‌رسانی",
+        callback_data=f"unsave_search:{saved_search_id}"
+    )
+    builder.adjust(1)
+    return builder.as_markup()
+
+def get_profile_actions_keyboard(role: str):
+    """کیبورد اقدامات روی پروفایل"""
+    builder = InlineKeyboardBuilder()
+    builder.button(
+        text="✏️ ویرایش پروفایل",
+        callback_data="edit_profile"
+    )
+    builder.button(
+        text="🗑 حذف پروفایل",
+        callback_data="delete_profile"
+    )
+    builder.adjust(2)
+    return builder.as_markup()
+
+def get_broadcast_confirmation_keyboard():
+    """کیبورد تأیید پیام همگانی"""
+    builder = InlineKeyboardBuilder()
+    builder.button(
+        text="📣 ارسال",
+        callback_data="broadcast_confirm"
+    )
+    builder.button(
+        text="❌ انصراف",
+        callback_data="broadcast_abort"
+    )
+    builder.adjust(2)
+    return builder.as_markup()
+
+def get_broadcast_progress_keyboard(broadcast_id: int):
+    """کیبورد پیام وضعیت پیام همگانی"""
+    builder = InlineKeyboardBuilder()
+    builder.button(
+        text="⏹ توقف ارسال",
+        callback_data=f"broadcast_cancel:{broadcast_id}"
+    )
+    return builder.as_markup()
+
+def get_inbox_keyboard():
+    """کیبورد رفتن به درخواست‌های دریافتی (اعلان خلاصه)"""
+    builder = InlineKeyboardBuilder()
+    builder.button(
+        text="📥 مشاهده درخواست‌ها",
+        callback_data="inbox:page:1"
+    )
+    return builder.as_markup()
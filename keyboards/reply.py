@@ -82,6 +82,14 @@ def get_supplier_menu_keyboard():
     kb.adjust(2, 2, 1)
     return kb.as_markup(resize_keyboard=True)
 
+def get_demander_menu_keyboard():
+    """منوی درخواست‌کننده"""
+    kb = ReplyKeyboardBuilder()
+    kb.button(text="🔍 جستجوی تأمین‌کننده")
+    kb.button(text="📥 درخواست‌های من")
+    kb.adjust(2)
+    return kb.as_markup(resize_keyboard=True)
+
 def get_edit_profile_keyboard():
     """کیبورد انتخاب فیلد برای ویرایش پروفایل"""
     kb = ReplyKeyboardBuilder()
@@ -99,15 +107,19 @@ def get_edit_profile_keyboard():
     kb.adjust(2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 1)
     return kb.as_markup(resize_keyboard=True)
 
-def get_settings_keyboard(is_active: bool):
+def get_settings_keyboard(is_active: bool, digest: bool = False):
     """کیبورد منوی تنظیمات"""
     kb = ReplyKeyboardBuilder()
     if is_active:
         kb.button(text="🔴 غیرفعال کردن پروفایل")
     else:
         kb.button(text="🟢 فعال کردن پروفایل")
+    if digest:
+        kb.button(text="🔔 اعلان فوری درخواست‌ها")
+    else:
+        kb.button(text="🗂 اعلان خلاصه درخواست‌ها")
     kb.button(text="↩️ بازگشت به منو")
-    kb.adjust(1, 1)
+    kb.adjust(1, 1, 1)
     return kb.as_markup(resize_keyboard=True)
 
 
@@ -1,19 +1,31 @@
+import argparse
 import asyncio
 import logging
 import sys
+from functools import partial
 from pathlib import Path
 
 from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.fsm.storage.redis import RedisStorage
-from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 from aiohttp import web
-import redis.asyncio as redis
 
 from config.settings import settings
 from middlewares.database import DatabaseMiddleware
-from handlers import start, supplier, demander
-from database.models import Base
-from database.connection import engine
+from middlewares.idempotency import IdempotencyMiddleware
+from handlers import start, admin, supplier, demander, common
+from database.connection import engine, AsyncSessionLocal, dispose_engines
+from database.schema import check_schema_version, run_migrations
+from database.redis_client import get_redis
+from search.index import supplier_index
+from search.alerts import saved_search_index
+from utils.search_history import search_history_writer
+from utils.counters import supplier_counters
+from utils.send_scheduler import send_scheduler, SendSchedulerMiddleware
+from utils.notifications import notification_dispatcher
+from utils.broadcast import broadcast_manager
+from utils.invalidation import SAVED_SEARCH, SUPPLIER, invalidation_bus
+from server.webhook import bind_socket, create_app, run_workers
 
 # تنظیم لاگینگ
 logging.basicConfig(
@@ -24,46 +36,138 @@ logger = logging.getLogger(__name__)
 
 async def on_startup(bot: Bot):
     """عملیات هنگام شروع ربات"""
-    # ایجاد جداول دیتابیس
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # بررسی یکسان بودن نسخه schema با migrationها (جداول فقط با alembic ساخته می‌شوند)
+    await check_schema_version(engine)
+    
+    # دریافت تغییرات workerهای دیگر؛ subscribe پیش از بارگذاری ایندکس‌ها کامل می‌شود
+    # و تغییرات رسیده در حین بارگذاری پس از آن دوباره خوانده می‌شوند
+    invalidation_bus.start()
+    await invalidation_bus.wait_subscribed()
+    
+    # بارگذاری ایندکس جستجوی تأمین‌کنندگان در حافظه
+    if settings.search_index_enabled:
+        async with invalidation_bus.loading(SUPPLIER), AsyncSessionLocal() as session:
+            await supplier_index.load(session)
+    
+    # بارگذاری ایندکس معکوس جستجوهای ذخیره‌شده برای اعلان تأمین‌کنندگان جدید
+    async with invalidation_bus.loading(SAVED_SEARCH), AsyncSessionLocal() as session:
+        await saved_search_index.load(session)
+    
+    # شروع ثبت دسته‌ای تاریخچه جستجو
+    search_history_writer.start()
+    
+    # شروع flush دوره‌ای شمارنده‌های بازدید و درخواست
+    supplier_counters.start()
+    
+    # شروع زمان‌بندی ارسال پیام‌ها (محدودیت نرخ Bot API)
+    send_scheduler.start()
+    
+    # ارسال اعلان‌های ثبت‌شده در outbox
+    notification_dispatcher.start(bot)
+    
+    # ادامه پیام‌های همگانی در جریان از آخرین checkpoint
+    broadcast_manager.start(bot)
     
     logger.info("Bot started successfully!")
 
 async def on_shutdown(bot: Bot):
     """عملیات هنگام خاموش شدن ربات"""
     logger.info("Bot shutting down...")
+    await invalidation_bus.stop()
+    await search_history_writer.stop()
+    await supplier_counters.stop()
+    await broadcast_manager.stop()
+    await notification_dispatcher.stop()
+    await send_scheduler.stop()
+    await dispose_engines()
 
-async def main():
-    """تابع اصلی برای راه‌اندازی ربات"""
-    # ایجاد bot و dispatcher
+def create_bot() -> Bot:
+    """ساخت bot؛ همه ارسال‌ها از SendScheduler عبور می‌کنند"""
     bot = Bot(token=settings.bot_token)
-    
-    # تنظیم storage برای FSM
-    redis_client = await redis.from_url(settings.redis_url)
-    storage = RedisStorage(redis=redis_client)
+    bot.session.middleware(SendSchedulerMiddleware())
+    return bot
+
+def create_dispatcher() -> Dispatcher:
+    """ساخت dispatcher با storage، middlewareها و routerها"""
+    # تنظیم storage برای FSM؛ با چند worker وضعیت باید در Redis مشترک باشد
+    redis_client = get_redis()
+    storage = RedisStorage(redis=redis_client) if redis_client is not None else MemoryStorage()
     
     dp = Dispatcher(storage=storage)
     
     # اضافه کردن middleware
     dp.message.middleware(DatabaseMiddleware())
+    dp.callback_query.middleware(IdempotencyMiddleware())
     dp.callback_query.middleware(DatabaseMiddleware())
     
     # اضافه کردن routers
     dp.include_router(start.router)
+    # فقط پیام‌های ادمین‌ها (ADMIN_IDS) به router ادمین می‌رسد
+    dp.include_router(admin.router)
     dp.include_router(supplier.router)
     dp.include_router(demander.router)
+    # common آخر ثبت می‌شود چون هندلر پیام‌های ناشناخته را دارد
+    dp.include_router(common.router)
     
     # تنظیم startup و shutdown
     dp.startup.register(on_startup)
     dp.shutdown.register(on_shutdown)
+    return dp
+
+async def main():
+    """تابع اصلی برای راه‌اندازی ربات با polling"""
+    bot = create_bot()
+    dp = create_dispatcher()
     
     # شروع polling
     await bot.delete_webhook(drop_pending_updates=True)
     await dp.start_polling(bot)
 
+async def set_webhook(dp: Dispatcher):
+    """ثبت آدرس webhook در تلگرام (یک بار، قبل از اجرای workerها)"""
+    bot = Bot(token=settings.bot_token)
+    try:
+        await bot.set_webhook(
+            url=f"{settings.webhook_url.rstrip('/')}{settings.webhook_path}",
+            secret_token=settings.webhook_secret or None,
+            allowed_updates=dp.resolve_used_update_types(),
+            drop_pending_updates=True,
+        )
+    finally:
+        await bot.session.close()
+    logger.info(f"Webhook set to {settings.webhook_url}{settings.webhook_path}")
+
+async def create_webhook_app(dp: Dispatcher) -> web.Application:
+    """برنامه aiohttp هر worker؛ bot (و session HTTP آن) پس از fork ساخته می‌شود"""
+    return create_app(dp, create_bot())
+
+def run_webhook():
+    """اجرای ربات با webhook پشت یک پورت (TLS در reverse proxy خاتمه می‌یابد)"""
+    if not settings.webhook_url:
+        sys.exit("WEBHOOK_URL is required when USE_WEBHOOK=true")
+    if settings.webhook_workers > 1 and not settings.redis_url:
+        sys.exit("REDIS_URL is required for WEBHOOK_WORKERS > 1 (FSM state must be shared)")
+    
+    # routerها فقط یک بار به dispatcher وصل می‌شوند؛ اتصال‌های Redis و دیتابیس
+    # lazy هستند و هر worker اتصال‌های خودش را پس از fork باز می‌کند
+    dp = create_dispatcher()
+    asyncio.run(set_webhook(dp))
+    sock = bind_socket(settings.webhook_host, settings.webhook_port)
+    run_workers(partial(create_webhook_app, dp), sock, settings.webhook_workers)
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Telegram bot")
+    parser.add_argument("--migrate", action="store_true", help="apply database migrations (alembic upgrade head) and exit")
+    args = parser.parse_args()
+    
+    if args.migrate:
+        run_migrations()
+        sys.exit(0)
+    
     try:
-        asyncio.run(main())
+        if settings.use_webhook:
+            run_webhook()
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
@@ -1,18 +1,175 @@
-from typing import Callable, Dict, Any, Awaitable
+import logging
+import time
+from collections import Counter
+from typing import Callable, Dict, Any, Awaitable, Optional
 from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
 from aiogram.types import TelegramObject
+from redis.exceptions import RedisError
 from sqlalchemy.ext.asyncio import AsyncSession
-from database.connection import AsyncSessionLocal
+from config.settings import settings
+from database.connection import AsyncSessionLocal, get_replica_session_factory
+from database.redis_client import get_redis
+from utils.dataloader import SessionLoaders, get_session_loaders
+
+logger = logging.getLogger(__name__)
+
+# فلگ هندلرهایی که فقط می‌خوانند و می‌توانند روی replica اجرا شوند:
+# @router.callback_query(..., flags=READ_ONLY)
+READ_ONLY_FLAG = "read_only"
+READ_ONLY = {READ_ONLY_FLAG: True}
+
+class LazySession:
+    """جانشین AsyncSession که فقط در اولین استفاده واقعی ساخته می‌شود
+
+    هندلرهایی که به دیتابیس کاری ندارند (مراحل ساده FSM، /help، پیام‌های
+    ناشناخته) هیچ session و اتصالی از pool نمی‌گیرند.
+    """
+    __slots__ = ("_factory", "_session", "_on_commit", "loaders")
+
+    def __init__(
+        self,
+        factory: Callable[[], AsyncSession],
+        on_commit: Optional[Callable[[], Awaitable[None]]] = None,
+        loaders: Optional[SessionLoaders] = None,
+    ):
+        self._factory = factory
+        self._session = None
+        self._on_commit = on_commit
+        # DataLoaderهای مشترک بین آپدیت‌های هم‌زمان (utils/dataloader)
+        self.loaders = loaders
+
+    @property
+    def used(self) -> bool:
+        return self._session is not None
+
+    def __getattr__(self, name: str):
+        if self._session is None:
+            self._session = self._factory()
+        return getattr(self._session, name)
+
+    async def commit(self):
+        if self._session is None:
+            return
+        await self._session.commit()
+        if self._on_commit is not None:
+            await self._on_commit()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+class SessionStats:
+    """آمار استفاده از session به ازای هر هندلر"""
+
+    def __init__(self):
+        self.updates = Counter()
+        self.used = Counter()
+
+    def record(self, handler_name: str, used: bool):
+        self.updates[handler_name] += 1
+        if used:
+            self.used[handler_name] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        return {
+            name: {"updates": count, "session_used": self.used[name]}
+            for name, count in self.updates.most_common()
+        }
+
+session_stats = SessionStats()
+
+class ReadYourWrites:
+    """کاربرانی که به تازگی commit کرده‌اند تا چند ثانیه فقط از دیتابیس اصلی می‌خوانند
+
+    تا تأخیر replica باعث نشود کاربر بلافاصله پس از ثبت‌نام یا ثبت درخواست
+    تغییر خودش را نبیند. با Redis بین همه پروسه‌ها مشترک است؛ اگر Redis
+    در دسترس نباشد به نفع دیتابیس اصلی تصمیم گرفته می‌شود.
+    """
+    KEY_PREFIX = "db:sticky"
+
+    def __init__(self, ttl: int = None):
+        self.ttl = ttl or settings.replica_sticky_seconds
+        self._local: Dict[int, float] = {}
+
+    @property
+    def redis(self):
+        return get_redis()
+
+    async def mark(self, telegram_id: int):
+        now = time.monotonic()
+        self._local[telegram_id] = now + self.ttl
+        if len(self._local) > 10000:
+            self._local = {key: expires_at for key, expires_at in self._local.items() if expires_at > now}
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(f"{self.KEY_PREFIX}:{telegram_id}", 1, ex=self.ttl)
+        except RedisError as e:
+            logger.warning(f"Could not mark {telegram_id} for primary reads: {e}")
+
+    async def is_sticky(self, telegram_id: int) -> bool:
+        if self._local.get(telegram_id, 0) > time.monotonic():
+            return True
+        if self.redis is None:
+            return False
+        try:
+            return bool(await self.redis.exists(f"{self.KEY_PREFIX}:{telegram_id}"))
+        except RedisError as e:
+            logger.warning(f"Read-your-writes check unavailable: {e}")
+            return True
+
+read_your_writes = ReadYourWrites()
 
 class DatabaseMiddleware(BaseMiddleware):
-    """Middleware برای اضافه کردن session دیتابیس به هر درخواست"""
-    
+    """Middleware برای اضافه کردن session دیتابیس (به صورت lazy) به هر درخواست
+
+    هندلرهای دارای فلگ READ_ONLY در صورت تنظیم replica به آن فرستاده می‌شوند،
+    مگر اینکه کاربر به تازگی خودش چیزی commit کرده باشد.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+        stats: SessionStats = session_stats,
+        replica_factory: Callable[[], Optional[Callable[[], AsyncSession]]] = get_replica_session_factory,
+        sticky: ReadYourWrites = read_your_writes,
+    ):
+        self.session_factory = session_factory
+        self.stats = stats
+        self.replica_factory = replica_factory
+        self.sticky = sticky
+
     async def __call__(
         self,
         handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
         event: TelegramObject,
         data: Dict[str, Any]
     ) -> Any:
-        async with AsyncSessionLocal() as session:
-            data["session"] = session
+        user = data.get("event_from_user")
+        factory = await self._choose_factory(data, user)
+        on_commit = (lambda: self.sticky.mark(user.id)) if user is not None else None
+
+        session = LazySession(factory, on_commit, get_session_loaders(factory))
+        data["session"] = session
+        try:
             return await handler(event, data)
+        finally:
+            await session.close()
+            handler_object = data.get("handler")
+            handler_name = getattr(getattr(handler_object, "callback", None), "__name__", type(event).__name__)
+            self.stats.record(handler_name, session.used)
+            logger.debug(
+                f"{handler_name}: session {'used' if session.used else 'not used'}"
+                f"{' (replica)' if factory is not self.session_factory else ''}"
+            )
+
+    async def _choose_factory(self, data: Dict[str, Any], user) -> Callable[[], AsyncSession]:
+        if not get_flag(data, READ_ONLY_FLAG):
+            return self.session_factory
+        replica = self.replica_factory()
+        if replica is None:
+            return self.session_factory
+        if user is not None and await self.sticky.is_sticky(user.id):
+            return self.session_factory
+        return replica
@@ -0,0 +1,105 @@
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import TelegramObject
+from redis.exceptions import RedisError
+
+from config.settings import settings
+from database.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# فلگ هندلرهایی که نباید برای یک callback دو بار اجرا شوند:
+# @router.callback_query(..., flags=IDEMPOTENT)
+IDEMPOTENT_FLAG = "idempotent"
+IDEMPOTENT = {IDEMPOTENT_FLAG: True}
+
+
+class IdempotencyKeys:
+    """ثبت یک‌باره کلیدها (SET NX) در Redis یا در صورت نبود آن درون پروسه"""
+    KEY_PREFIX = "idempotency"
+
+    def __init__(self, ttl: int = None):
+        self.ttl = ttl or settings.idempotency_ttl
+        self._local: Dict[str, float] = {}
+
+    @property
+    def redis(self):
+        return get_redis()
+
+    async def claim(self, key: str, ttl: int = None) -> bool:
+        """True اگر این اولین بار است که کلید (در ttl ثانیه اخیر) دیده می‌شود"""
+        ttl = ttl or self.ttl
+        if self.redis is not None:
+            try:
+                return bool(await self.redis.set(f"{self.KEY_PREFIX}:{key}", 1, nx=True, ex=ttl))
+            except RedisError as e:
+                # شرط‌های دیتابیس (status = 'pending' و ایندکس یکتا) همچنان از تکرار جلوگیری می‌کنند
+                logger.warning(f"Idempotency check unavailable: {e}")
+                return True
+
+        now = time.monotonic()
+        if len(self._local) > 10000:
+            self._local = {k: expires_at for k, expires_at in self._local.items() if expires_at > now}
+        if self._local.get(key, 0) > now:
+            return False
+        self._local[key] = now + ttl
+        return True
+
+    async def release(self, key: str):
+        """آزاد کردن کلید تا تلاش دوباره همان آپدیت پردازش شود (مثلاً پس از خطای هندلر)"""
+        self._local.pop(key, None)
+        if self.redis is None:
+            return
+        try:
+            await self.redis.delete(f"{self.KEY_PREFIX}:{key}")
+        except RedisError as e:
+            logger.warning(f"Idempotency key {key} could not be released: {e}")
+
+
+idempotency_keys = IdempotencyKeys()
+
+
+class IdempotencyMiddleware(BaseMiddleware):
+    """Middleware که callbackهای تکراری را برای هندلرهای IDEMPOTENT نادیده می‌گیرد
+
+    دو کلید بررسی می‌شود: شناسه callback برای ارسال مجدد همان آپدیت توسط
+    تلگرام (IDEMPOTENCY_TTL)، و کاربر و داده دکمه برای دو بار زدن پشت سر هم
+    که هر بار callback جدیدی می‌سازد (IDEMPOTENCY_TAP_TTL ثانیه).
+    اگر هندلر خطا بدهد کلیدها آزاد می‌شوند تا تلاش دوباره پردازش شود. به
+    callback تکراری فقط پاسخ خالی داده می‌شود تا دکمه در حالت بارگذاری نماند.
+    """
+
+    def __init__(self, keys: IdempotencyKeys = idempotency_keys, tap_ttl: int = None):
+        self.keys = keys
+        self.tap_ttl = tap_ttl or settings.idempotency_tap_ttl
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if not get_flag(data, IDEMPOTENT_FLAG):
+            return await handler(event, data)
+
+        redelivery = f"callback:{event.id}"
+        tap = f"tap:{event.from_user.id}:{event.data}"
+        if not await self.keys.claim(redelivery) or not await self.keys.claim(tap, self.tap_ttl):
+            logger.info(f"Duplicate callback {event.id} ignored")
+            try:
+                await event.answer()
+            except TelegramAPIError as e:
+                # پردازش اول قبلاً پاسخ داده یا callback منقضی شده است
+                logger.debug(f"Duplicate callback {event.id} not answered: {e}")
+            return None
+        try:
+            return await handler(event, data)
+        except Exception:
+            await self.keys.release(redelivery)
+            await self.keys.release(tap)
+            raise
@@ -0,0 +1,176 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set
+
+from aiogram import Bot
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.connection import AsyncSessionLocal
+from database.models import Demander, SavedSearch, User
+from search.cache import canonical_criteria, from_json_criteria
+from search.index import SupplierDocument, matches_criteria
+from utils.invalidation import SAVED_SEARCH, invalidation_bus
+from utils.normalize import normalize_place
+from utils.notifications import notify_demander_new_match
+
+logger = logging.getLogger(__name__)
+
+ANY = "*"
+MAX_SAVED_SEARCHES = 10
+
+
+@dataclass(slots=True)
+class SavedQuery:
+    """یک جستجوی ذخیره‌شده به همراه گیرنده اعلان"""
+    id: int
+    demander_id: int
+    telegram_id: int
+    criteria: dict
+
+
+class SavedSearchIndex:
+    """ایندکس معکوس جستجوهای ذخیره‌شده (شبیه percolator)
+
+    به جای اجرای دوباره همه جستجوها برای هر تغییر، هر جستجو زیر کلیدهای
+    شهر، جنسیت و سبک کاری خود ثبت می‌شود (یا * اگر آن فیلتر را ندارد). برای
+    یک تأمین‌کننده فقط جستجوهایی که در هر سه کلید مشترک‌اند با
+    matches_criteria بررسی کامل می‌شوند.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self._reset()
+
+    def _reset(self):
+        self._queries: Dict[int, SavedQuery] = {}
+        self._by_city: Dict[str, Set[int]] = {}
+        self._by_gender: Dict[str, Set[int]] = {}
+        self._by_style: Dict[str, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._queries)
+
+    @staticmethod
+    def _queries_query():
+        """جستجوهای ذخیره‌شده کاربران فعال به همراه telegram_id گیرنده"""
+        return (
+            select(SavedSearch.id, SavedSearch.demander_id, SavedSearch.search_criteria, User.telegram_id)
+            .join(Demander, SavedSearch.demander_id == Demander.id)
+            .join(User, Demander.user_id == User.id)
+            .where(User.is_active.is_(True))
+        )
+
+    async def load(self, session: AsyncSession):
+        """بارگذاری همه جستجوهای ذخیره‌شده کاربران فعال"""
+        result = await session.execute(self._queries_query())
+
+        self._reset()
+        for row in result:
+            self.add(SavedQuery(row.id, row.demander_id, row.telegram_id, from_json_criteria(row.search_criteria)))
+        self.ready = True
+        logger.info(f"Saved search index loaded with {len(self)} queries")
+
+    async def reload(self, session: AsyncSession, query_id: int):
+        """خواندن دوباره یک جستجوی ذخیره‌شده پس از ثبت یا حذف در پروسه دیگر"""
+        row = (await session.execute(self._queries_query().where(SavedSearch.id == query_id))).first()
+        if row is None:
+            self.remove(query_id)
+        else:
+            self.add(SavedQuery(row.id, row.demander_id, row.telegram_id, from_json_criteria(row.search_criteria)))
+
+    def add(self, query: SavedQuery):
+        self.remove(query.id)
+        query.criteria = canonical_criteria(query.criteria)
+        self._queries[query.id] = query
+        for buckets, keys in self._keys(query.criteria):
+            for key in keys:
+                buckets.setdefault(key, set()).add(query.id)
+
+    def remove(self, query_id: int):
+        query = self._queries.pop(query_id, None)
+        if query is None:
+            return
+        for buckets, keys in self._keys(query.criteria):
+            for key in keys:
+                buckets[key].discard(query_id)
+                if not buckets[key]:
+                    del buckets[key]
+
+    def match(self, doc: SupplierDocument) -> List[SavedQuery]:
+        """جستجوهای ذخیره‌شده‌ای که این تأمین‌کننده در آن‌ها صدق می‌کند"""
+        # فیلتر شهر پیشوندی است، پس همه پیشوندهای شهر تأمین‌کننده بررسی می‌شوند
+        by_city = self._union(self._by_city, [ANY] + [doc.city[:i] for i in range(1, len(doc.city) + 1)])
+        by_gender = self._union(self._by_gender, [ANY, doc.gender])
+        by_style = self._union(self._by_style, [ANY, *doc.work_styles])
+
+        candidates = set.intersection(*sorted((by_city, by_gender, by_style), key=len))
+        return [
+            self._queries[query_id] for query_id in sorted(candidates)
+            if matches_criteria(doc, self._queries[query_id].criteria)
+        ]
+
+    def new_matches(self, before: Optional[SupplierDocument], after: SupplierDocument) -> List[SavedQuery]:
+        """جستجوهایی که بعد از تغییر منطبق شده‌اند ولی قبل از آن نبودند؛ یکی برای هر درخواست‌کننده"""
+        already = {query.id for query in self.match(before)} if before is not None else set()
+        queries: Dict[int, SavedQuery] = {}
+        for query in self.match(after):
+            if query.id not in already:
+                queries.setdefault(query.demander_id, query)
+        return list(queries.values())
+
+    # ---------- داخلی ----------
+
+    def _keys(self, criteria: dict):
+        return (
+            (self._by_city, [normalize_place(criteria.get('search_city')) or ANY]),
+            (self._by_gender, [criteria.get('search_gender') or ANY]),
+            (self._by_style, criteria.get('search_work_styles') or [ANY]),
+        )
+
+    @staticmethod
+    def _union(buckets: Dict[str, Set[int]], keys: Iterable[str]) -> Set[int]:
+        ids = set()
+        for key in keys:
+            ids |= buckets.get(key, set())
+        return ids
+
+
+saved_search_index = SavedSearchIndex()
+
+
+async def reload_saved_search(query_id: int):
+    """اعمال ثبت/حذف جستجوی ذخیره‌شده‌ای که worker دیگری انجام داده"""
+    if saved_search_index.ready:
+        async with AsyncSessionLocal() as session:
+            await saved_search_index.reload(session, query_id)
+
+
+async def reload_saved_search_index():
+    if saved_search_index.ready:
+        async with AsyncSessionLocal() as session:
+            await saved_search_index.load(session)
+
+
+invalidation_bus.register(SAVED_SEARCH, reload_saved_search, resync=reload_saved_search_index)
+
+# ارجاع به taskهای در حال ارسال تا پیش از اتمام جمع‌آوری نشوند
+_delivery_tasks: Set[asyncio.Task] = set()
+
+
+def dispatch_search_alerts(bot: Bot, supplier, before: Optional[SupplierDocument], after: SupplierDocument):
+    """تطبیق تأمین‌کننده جدید/ویرایش‌شده با جستجوهای ذخیره‌شده و ارسال اعلان در پس‌زمینه"""
+    if not saved_search_index.ready:
+        return
+    matches = saved_search_index.new_matches(before, after)
+    if not matches:
+        return
+
+    async def deliver():
+        for query in matches:
+            await notify_demander_new_match(bot, query.telegram_id, supplier, query.id)
+
+    task = asyncio.create_task(deliver())
+    _delivery_tasks.add(task)
+    task.add_done_callback(_delivery_tasks.discard)
@@ -0,0 +1,290 @@
+import functools
+import hashlib
+import json
+import logging
+import math
+from typing import Dict, List, Optional, Sequence
+
+from redis.exceptions import RedisError, WatchError
+
+from config.settings import settings
+from database.redis_client import get_redis
+from search.cursor import NEXT, PREVIOUS, Key
+from search.index import SupplierDocument, matches_criteria
+from utils.normalize import normalize_place, normalize_text
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "search:cache"
+CITY_REGISTRY_KEY = f"{KEY_PREFIX}:cities"
+STATS_KEY = f"{KEY_PREFIX}:stats"
+ANY_CITY = "*"
+
+
+def canonical_criteria(search_criteria: dict) -> dict:
+    """شکل یکسان فیلترهای جستجو تا جستجوهای معادل یک کلید داشته باشند"""
+    age_range = search_criteria.get('search_age_range')
+    price_range = search_criteria.get('search_price_range')
+    return {
+        'search_city': normalize_place(search_criteria.get('search_city')) or None,
+        'search_gender': search_criteria.get('search_gender') or None,
+        'search_age_range': [int(age_range[0]), int(age_range[1])] if age_range else None,
+        'search_price_range': [float(price_range[0]), float(price_range[1])] if price_range else None,
+        'search_work_styles': sorted(set(search_criteria.get('search_work_styles') or [])) or None,
+        'search_special_features': normalize_text(search_criteria.get('search_special_features')) or None,
+    }
+
+
+def to_json_criteria(search_criteria: dict) -> dict:
+    """شکل canonical قابل ذخیره در JSONB؛ سقف باز بازه قیمت (inf) به null تبدیل می‌شود"""
+    canonical = canonical_criteria(search_criteria)
+    if price_range := canonical['search_price_range']:
+        canonical['search_price_range'] = [value if math.isfinite(value) else None for value in price_range]
+    return canonical
+
+
+def from_json_criteria(stored: dict) -> dict:
+    """بازگرداندن فیلترهای ذخیره‌شده با to_json_criteria"""
+    criteria = dict(stored)
+    if price_range := criteria.get('search_price_range'):
+        criteria['search_price_range'] = [
+            price_range[0] if price_range[0] is not None else 0,
+            price_range[1] if price_range[1] is not None else float('inf'),
+        ]
+    return criteria
+
+
+def criteria_hash(canonical: dict) -> str:
+    raw = json.dumps(canonical, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode()).hexdigest()[:20]
+
+
+def _member(key: Key) -> str:
+    return f"{float(key[0])!r}:{int(key[1])}"
+
+
+def _parse_member(member) -> Key:
+    if isinstance(member, bytes):
+        member = member.decode()
+    rank, supplier_id = member.split(":")
+    return float(rank), int(supplier_id)
+
+
+def _fail_open(method):
+    """خطای Redis نباید جستجو را متوقف کند؛ در این حالت کش نادیده گرفته می‌شود"""
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        if self.redis is None:
+            return None
+        try:
+            return await method(self, *args, **kwargs)
+        except RedisError as e:
+            logger.warning(f"Search cache unavailable ({method.__name__}): {e}")
+            return None
+    return wrapper
+
+
+class SearchResultCache:
+    """کش نتایج رتبه‌بندی‌شده جستجو در Redis با ابطال دقیق
+
+    برای هر ترکیب فیلتر دو کلید نگهداری می‌شود:
+    - ids: یک sorted set از کلیدهای (rank, id) با امتیاز برابر جایگاه در رتبه‌بندی
+    - meta: فیلترهای canonical و تعداد نتایج
+    هر ورودی زیر برچسب شهر خود ثبت می‌شود تا هنگام تغییر یک تأمین‌کننده فقط
+    ورودی‌های همان شهر (و جستجوهای بدون شهر) بررسی شوند.
+
+    هر شهر یک شمارنده نسل دارد که invalidate آن را افزایش می‌دهد. store فقط
+    وقتی نوشته می‌شود که نسل از پیش از خواندن دیتابیس تغییر نکرده باشد
+    (WATCH/MULTI)؛ وگرنه نتیجه‌ای که هم‌زمان با یک invalidate محاسبه شده
+    دوباره در کش نمی‌نشیند.
+
+    فقط وقتی استفاده می‌شود که ایندکس درون‌حافظه‌ای خاموش است
+    (SEARCH_INDEX_ENABLED=false)؛ با ایندکس فعال، جستجو از حافظه پاسخ داده
+    می‌شود و رفتن به Redis فقط هزینه اضافه است.
+    """
+
+    def __init__(self, ttl: int = None):
+        self.ttl = ttl or settings.search_cache_ttl
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def redis(self):
+        return get_redis()
+
+    # ---------- خواندن ----------
+
+    @_fail_open
+    async def get_count(self, search_criteria: dict) -> Optional[int]:
+        """تعداد نتایج از کش؛ در صورت نبودن ورودی None"""
+        digest = criteria_hash(canonical_criteria(search_criteria))
+        count = await self.redis.hget(self._meta_key(digest), "count")
+        await self._record(count is not None)
+        return None if count is None else int(count)
+
+    @_fail_open
+    async def get_page(
+        self,
+        search_criteria: dict,
+        anchor: Optional[Key],
+        direction: str,
+        limit: int
+    ) -> Optional[List[Key]]:
+        """دریافت کلیدهای یک صفحه از کش با keyset؛ None یعنی باید از دیتابیس خواند"""
+        ids_key = self._ids_key(criteria_hash(canonical_criteria(search_criteria)))
+        if anchor is None:
+            members = await self.redis.zrange(ids_key, 0, limit - 1)
+        else:
+            position = await self.redis.zscore(ids_key, _member(anchor))
+            if position is None:
+                await self._record(False)
+                return None
+            if direction == NEXT:
+                members = await self.redis.zrangebyscore(ids_key, f"({position}", "+inf", start=0, num=limit)
+            elif direction == PREVIOUS:
+                members = await self.redis.zrevrangebyscore(ids_key, f"({position}", "-inf", start=0, num=limit)
+                members.reverse()
+            else:
+                members = await self.redis.zrangebyscore(ids_key, position, "+inf", start=0, num=limit)
+
+        if not members and anchor is None and not await self.redis.exists(ids_key):
+            await self._record(False)
+            return None
+        await self._record(True)
+        return [_parse_member(member) for member in members]
+
+    @_fail_open
+    async def generation(self, search_criteria: dict) -> Optional[int]:
+        """نسل فعلی شهر جستجو؛ قبل از خواندن نتایج از دیتابیس گرفته و به store داده شود"""
+        city = canonical_criteria(search_criteria)['search_city'] or ANY_CITY
+        return int(await self.redis.get(self._generation_key(city)) or 0)
+
+    # ---------- نوشتن ----------
+
+    @_fail_open
+    async def store(self, search_criteria: dict, keys: Sequence[Key], generation: Optional[int]):
+        """ذخیره لیست رتبه‌بندی‌شده نتایج یک جستجو، اگر از generation به بعد invalidate نشده باشد"""
+        if generation is None:
+            return
+        canonical = canonical_criteria(search_criteria)
+        digest = criteria_hash(canonical)
+        city = canonical['search_city'] or ANY_CITY
+        ids_key, meta_key, generation_key = self._ids_key(digest), self._meta_key(digest), self._generation_key(city)
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            await pipe.watch(generation_key)
+            if int(await pipe.get(generation_key) or 0) != generation:
+                logger.debug(f"Search cache store skipped: {city} was invalidated meanwhile")
+                return
+            pipe.multi()
+            pipe.delete(ids_key)
+            if keys:
+                pipe.zadd(ids_key, {_member(key): position for position, key in enumerate(keys)})
+                pipe.expire(ids_key, self.ttl)
+            pipe.hset(meta_key, mapping={
+                "count": len(keys),
+                "criteria": json.dumps(canonical, ensure_ascii=False),
+            })
+            pipe.expire(meta_key, self.ttl)
+            # برچسب‌ها حداکثر به اندازه TTL ورودی‌ها بعد از آخرین store می‌مانند
+            pipe.sadd(CITY_REGISTRY_KEY, city)
+            pipe.expire(CITY_REGISTRY_KEY, self.ttl)
+            pipe.sadd(self._tag_key(city), digest)
+            pipe.expire(self._tag_key(city), self.ttl)
+            try:
+                await pipe.execute()
+            except WatchError:
+                logger.debug(f"Search cache store skipped: {city} was invalidated meanwhile")
+
+    @_fail_open
+    async def invalidate(self, before: Optional[SupplierDocument], after: Optional[SupplierDocument]):
+        """حذف فقط ورودی‌هایی که تأمین‌کننده تغییرکرده (قبل یا بعد از تغییر) در آن‌ها صدق می‌کند"""
+        docs = [doc for doc in (before, after) if doc is not None]
+        if not docs:
+            return
+
+        # قبل از خواندن برچسب‌ها: storeهایی که پیش از این تغییر شروع شده‌اند دیگر نوشته نمی‌شوند.
+        # فیلتر شهر پیشوندی است، پس نسل همه پیشوندهای شهر تأمین‌کننده افزایش می‌یابد
+        prefixes = {ANY_CITY} | {doc.city[:i] for doc in docs for i in range(1, len(doc.city) + 1)}
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for city in prefixes:
+                pipe.incr(self._generation_key(city))
+                pipe.expire(self._generation_key(city), self.ttl)
+            await pipe.execute()
+
+        cities = {self._decode(city) for city in await self.redis.smembers(CITY_REGISTRY_KEY)}
+        tags = {
+            city for city in cities
+            if city == ANY_CITY or any(matches_criteria(doc, {'search_city': city}) for doc in docs)
+        }
+
+        candidates = []
+        for city in tags:
+            candidates.extend((city, self._decode(digest)) for digest in await self.redis.smembers(self._tag_key(city)))
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for _, digest in candidates:
+                pipe.hget(self._meta_key(digest), "criteria")
+            stored_criteria = await pipe.execute()
+
+        # ورودی‌های منقضی‌شده هم فقط برچسبشان پاک می‌شود
+        stale = [
+            (city, digest)
+            for (city, digest), criteria in zip(candidates, stored_criteria)
+            if criteria is None or any(matches_criteria(doc, json.loads(criteria)) for doc in docs)
+        ]
+
+        if not stale:
+            return
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for city, digest in stale:
+                pipe.delete(self._ids_key(digest), self._meta_key(digest))
+                pipe.srem(self._tag_key(city), digest)
+            await pipe.execute()
+        logger.debug(f"Invalidated {len(stale)} cached searches")
+
+    # ---------- آمار ----------
+
+    async def get_stats(self) -> Dict[str, int]:
+        """آمار hit/miss کل (Redis) و همین پروسه"""
+        stats = {"local_hits": self.hits, "local_misses": self.misses, "hits": 0, "misses": 0}
+        if self.redis is not None:
+            try:
+                for field, value in (await self.redis.hgetall(STATS_KEY)).items():
+                    stats[self._decode(field)] = int(value)
+            except RedisError as e:
+                logger.warning(f"Search cache stats unavailable: {e}")
+        return stats
+
+    async def _record(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        await self.redis.hincrby(STATS_KEY, "hits" if hit else "misses", 1)
+
+    # ---------- کلیدها ----------
+
+    @staticmethod
+    def _decode(value) -> str:
+        return value.decode() if isinstance(value, bytes) else value
+
+    @staticmethod
+    def _ids_key(digest: str) -> str:
+        return f"{KEY_PREFIX}:{digest}:ids"
+
+    @staticmethod
+    def _meta_key(digest: str) -> str:
+        return f"{KEY_PREFIX}:{digest}:meta"
+
+    @staticmethod
+    def _tag_key(city: str) -> str:
+        return f"{KEY_PREFIX}:tag:{city}"
+
+    @staticmethod
+    def _generation_key(city: str) -> str:
+        return f"{KEY_PREFIX}:generation:{city}"
+
+
+search_cache = SearchResultCache()
@@ -0,0 +1,144 @@
+import base64
+import binascii
+import json
+import time
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, or_
+
+PAGE_SIZE = 5
+
+NEXT = "next"
+PREVIOUS = "prev"
+CURRENT = "current"
+
+# کلید مرتب‌سازی هر ردیف: (rank, supplier_id) با ترتیب rank نزولی و سپس id صعودی
+Key = Tuple[float, int]
+
+
+@dataclass
+class SearchCursor:
+    """مکان‌نمای صفحه‌بندی keyset برای نتایج یک جستجو
+
+    به جای لیست کامل شناسه‌ها فقط کلید اولین و آخرین ردیف صفحه فعلی
+    نگهداری می‌شود، پس اندازه آن به تعداد نتایج بستگی ندارد.
+    """
+    page: int = 1
+    first: Optional[Key] = None
+    last: Optional[Key] = None
+    issued_at: int = 0
+
+    @classmethod
+    def new(cls) -> "SearchCursor":
+        return cls(issued_at=int(time.time()))
+
+    def anchor(self, direction: str) -> Optional[Key]:
+        """کلید مرجع برای دریافت صفحه در جهت داده‌شده"""
+        return self.last if direction == NEXT else self.first
+
+    def target_page(self, direction: str) -> int:
+        if direction == NEXT:
+            return self.page + 1
+        if direction == PREVIOUS:
+            return max(self.page - 1, 1)
+        return self.page
+
+    def direction_to(self, page: int) -> Optional[str]:
+        """جهت رسیدن به صفحه داده‌شده؛ None برای صفحه غیرمجاور (دکمه پیام قدیمی)
+
+        keyset فقط صفحه مجاور صفحه فعلی را می‌شناسد، پس دکمه‌ای که صفحه
+        آن با مکان‌نمای فعلی همخوان نیست نباید فقط یک صفحه جابه‌جا کند.
+        """
+        if page == self.page + 1:
+            return NEXT
+        if page == self.page - 1:
+            return PREVIOUS
+        if page == self.page:
+            return CURRENT
+        return None
+
+    def moved(self, direction: str, keys: Sequence[Key]) -> "SearchCursor":
+        """مکان‌نمای صفحه جدید پس از دریافت کلیدهای آن"""
+        if not keys:
+            return self
+        return SearchCursor(
+            page=self.target_page(direction),
+            first=tuple(keys[0]),
+            last=tuple(keys[-1]),
+            issued_at=self.issued_at,
+        )
+
+    def is_expired(self, ttl: int) -> bool:
+        return time.time() - self.issued_at > ttl
+
+    def encode(self) -> str:
+        payload = [self.page, self.first, self.last, self.issued_at]
+        raw = json.dumps(payload, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: Optional[str]) -> Optional["SearchCursor"]:
+        """بازسازی مکان‌نما از رشته؛ در صورت نامعتبر بودن None"""
+        if not token:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            page, first, last, issued_at = json.loads(raw)
+        except (binascii.Error, ValueError, TypeError):
+            return None
+        return cls(
+            page=int(page),
+            first=tuple(first) if first else None,
+            last=tuple(last) if last else None,
+            issued_at=int(issued_at),
+        )
+
+
+def _sort_key(key: Key) -> Tuple[float, int]:
+    return -key[0], key[1]
+
+
+def slice_sorted(keys: List[Key], anchor: Optional[Key], direction: str, limit: int = PAGE_SIZE) -> List[Key]:
+    """صفحه‌بندی keyset روی لیست مرتب درون حافظه"""
+    if anchor is None:
+        return keys[:limit]
+
+    anchor = _sort_key(anchor)
+    if direction == NEXT:
+        start = bisect_right(keys, anchor, key=_sort_key)
+        return keys[start:start + limit]
+    if direction == PREVIOUS:
+        end = bisect_left(keys, anchor, key=_sort_key)
+        return keys[max(end - limit, 0):end]
+    start = bisect_left(keys, anchor, key=_sort_key)
+    return keys[start:start + limit]
+
+
+def keyset_clause(rank_expr, id_column, anchor: Optional[Key], direction: str):
+    """شرط WHERE و ترتیب ORDER BY برای صفحه‌بندی keyset در SQL
+
+    خروجی PREVIOUS به ترتیب معکوس است و باید پس از دریافت برعکس شود.
+    """
+    if direction == PREVIOUS:
+        order_by = [rank_expr.asc(), id_column.desc()] if rank_expr is not None else [id_column.desc()]
+    else:
+        order_by = [rank_expr.desc(), id_column.asc()] if rank_expr is not None else [id_column.asc()]
+
+    if anchor is None:
+        return None, order_by
+
+    rank, supplier_id = anchor
+    if direction == NEXT:
+        id_clause = id_column > supplier_id
+    elif direction == PREVIOUS:
+        id_clause = id_column < supplier_id
+    else:
+        id_clause = id_column >= supplier_id
+
+    if rank_expr is None:
+        return id_clause, order_by
+
+    rank_clause = rank_expr > rank if direction == PREVIOUS else rank_expr < rank
+    return or_(rank_clause, and_(rank_expr == rank, id_clause)), order_by
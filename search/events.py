@@ -0,0 +1,42 @@
+import logging
+from typing import Optional
+
+from database.connection import AsyncSessionLocal
+from search.cache import search_cache
+from search.index import SupplierDocument, supplier_index
+from utils.invalidation import SUPPLIER, invalidation_bus
+
+logger = logging.getLogger(__name__)
+
+
+async def notify_supplier_changed(before: Optional[SupplierDocument], after: Optional[SupplierDocument]):
+    """اعلام تغییر یک تأمین‌کننده به ایندکس و کش جستجو
+
+    before: وضعیت قبل از تغییر (None برای تأمین‌کننده جدید)
+    after: وضعیت بعد از تغییر (None برای حذف یا غیرفعال شدن)
+    """
+    if supplier_index.ready:
+        if after is not None:
+            supplier_index.upsert(after)
+        elif before is not None:
+            supplier_index.remove(before.id)
+
+    await search_cache.invalidate(before, after)
+    if after is not None or before is not None:
+        await invalidation_bus.publish(SUPPLIER, (after or before).id)
+
+
+async def reload_supplier(supplier_id: int):
+    """اعمال تغییر تأمین‌کننده‌ای که worker دیگری ثبت کرده (کش جستجو در Redis مشترک است)"""
+    if supplier_index.ready:
+        async with AsyncSessionLocal() as session:
+            await supplier_index.reload(session, supplier_id)
+
+
+async def reload_supplier_index():
+    if supplier_index.ready:
+        async with AsyncSessionLocal() as session:
+            await supplier_index.load(session)
+
+
+invalidation_bus.register(SUPPLIER, reload_supplier, resync=reload_supplier_index)
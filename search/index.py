@@ -0,0 +1,288 @@
+import bisect
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import Supplier
+from utils.normalize import normalize_place, normalize_text, trigram_similarity
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class SupplierDocument:
+    """نسخه فشرده فیلدهای قابل جستجوی یک تأمین‌کننده"""
+    id: int
+    city: str
+    gender: Optional[str]
+    age: Optional[int]
+    price_min: Optional[float]
+    price_max: Optional[float]
+    work_styles: frozenset
+    cooperation_types: frozenset
+    features: str
+
+    @classmethod
+    def from_supplier(cls, supplier) -> "SupplierDocument":
+        """ساخت سند از یک Supplier یا ردیف select با همان نام ستون‌ها"""
+        return cls(
+            id=supplier.id,
+            city=normalize_place(supplier.city),
+            gender=supplier.gender,
+            age=supplier.age,
+            price_min=supplier.price_range_min,
+            price_max=supplier.price_range_max,
+            work_styles=frozenset(supplier.work_styles or []),
+            cooperation_types=frozenset(supplier.cooperation_types or []),
+            features=normalize_text(" ".join(
+                value or "" for value in (supplier.special_features, supplier.hair_color, supplier.eye_color)
+            )),
+        )
+
+
+def matches_criteria(doc: SupplierDocument, search_criteria: dict) -> bool:
+    """بررسی تطابق یک سند با فیلترهای جستجو (همان منطق search_suppliers)"""
+    if city := search_criteria.get('search_city'):
+        if not doc.city.startswith(normalize_place(city)):
+            return False
+
+    if gender := search_criteria.get('search_gender'):
+        if doc.gender != gender:
+            return False
+
+    if age_range := search_criteria.get('search_age_range'):
+        if doc.age is None or not age_range[0] <= doc.age <= age_range[1]:
+            return False
+
+    if price_range := search_criteria.get('search_price_range'):
+        min_price, max_price = price_range
+        if doc.price_min is None or doc.price_max is None:
+            return False
+        if not (doc.price_min <= max_price and doc.price_max >= min_price):
+            return False
+
+    if styles := search_criteria.get('search_work_styles'):
+        if doc.work_styles.isdisjoint(styles):
+            return False
+
+    if features := search_criteria.get('search_special_features'):
+        if normalize_text(features) not in doc.features:
+            return False
+
+    return True
+
+
+def _bits_to_slots(bits: int) -> List[int]:
+    """تبدیل bitset به لیست شماره خانه‌ها"""
+    slots = []
+    digits = bin(bits)[:1:-1]
+    position = digits.find('1')
+    while position != -1:
+        slots.append(position)
+        position = digits.find('1', position + 1)
+    return slots
+
+
+def _slots_to_bits(slots: Iterable[int]) -> int:
+    """تبدیل لیست شماره خانه‌ها به bitset"""
+    bits = 0
+    for slot in slots:
+        bits |= 1 << slot
+    return bits
+
+
+class SupplierIndex:
+    """ایندکس معکوس درون‌حافظه‌ای از تأمین‌کنندگان فعال
+
+    هر تأمین‌کننده یک خانه (slot) دارد. فیلترهای گسسته (جنسیت، سبک کاری،
+    نوع همکاری، شهر) به صورت bitset و فیلترهای بازه‌ای (سن، قیمت) به صورت
+    آرایه مرتب نگهداری می‌شوند.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self._reset()
+
+    def _reset(self):
+        self._docs: List[Optional[SupplierDocument]] = []
+        self._slot_of: Dict[int, int] = {}
+        self._free_slots: List[int] = []
+        self._all = 0
+        self._by_gender: Dict[str, int] = {}
+        self._by_style: Dict[str, int] = {}
+        self._by_cooperation: Dict[str, int] = {}
+        self._by_city: Dict[str, int] = {}
+        self._ages: List[Tuple[int, int]] = []
+        self._price_mins: List[Tuple[float, int]] = []
+        self._price_maxes: List[Tuple[float, int]] = []
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    @staticmethod
+    def _documents_query():
+        """ستون‌های لازم تأمین‌کنندگان فعال"""
+        return (
+            select(
+                Supplier.id, Supplier.city, Supplier.gender, Supplier.age,
+                Supplier.price_range_min, Supplier.price_range_max,
+                Supplier.work_styles, Supplier.cooperation_types,
+                Supplier.special_features, Supplier.hair_color, Supplier.eye_color,
+            )
+            .where(Supplier.is_active == true())
+        )
+
+    async def load(self, session: AsyncSession):
+        """بارگذاری کامل ایندکس از دیتابیس (فقط ستون‌های لازم)"""
+        result = await session.execute(self._documents_query())
+
+        self._reset()
+        for row in result:
+            self._add(SupplierDocument.from_supplier(row))
+        self.ready = True
+        logger.info(f"Supplier index loaded with {len(self)} suppliers")
+
+    async def reload(self, session: AsyncSession, supplier_id: int):
+        """خواندن دوباره یک تأمین‌کننده پس از تغییر در پروسه دیگر (غیرفعال یا حذف‌شده بیرون می‌رود)"""
+        row = (await session.execute(self._documents_query().where(Supplier.id == supplier_id))).first()
+        if row is None:
+            self.remove(supplier_id)
+        else:
+            self.upsert(row)
+
+    def upsert(self, supplier):
+        """افزودن یا به‌روزرسانی یک تأمین‌کننده پس از ثبت‌نام/ویرایش"""
+        doc = supplier if isinstance(supplier, SupplierDocument) else SupplierDocument.from_supplier(supplier)
+        self.remove(doc.id)
+        self._add(doc)
+
+    def remove(self, supplier_id: int):
+        """حذف یک تأمین‌کننده (مثلاً هنگام غیرفعال شدن)"""
+        slot = self._slot_of.pop(supplier_id, None)
+        if slot is None:
+            return
+
+        doc = self._docs[slot]
+        mask = ~(1 << slot)
+        self._all &= mask
+        for buckets, keys in self._bucket_keys(doc):
+            for key in keys:
+                buckets[key] &= mask
+                if not buckets[key]:
+                    del buckets[key]
+        for values, value in self._range_keys(doc):
+            if value is not None:
+                del values[bisect.bisect_left(values, (value, slot))]
+
+        self._docs[slot] = None
+        self._free_slots.append(slot)
+
+    def get(self, supplier_id: int) -> Optional[SupplierDocument]:
+        slot = self._slot_of.get(supplier_id)
+        return None if slot is None else self._docs[slot]
+
+    def search(self, search_criteria: dict) -> List[int]:
+        """شناسه تأمین‌کنندگان منطبق با فیلترها به ترتیب رتبه"""
+        return [supplier_id for _, supplier_id in self.search_ranked(search_criteria)]
+
+    def search_ranked(self, search_criteria: dict) -> List[Tuple[float, int]]:
+        """کلیدهای (rank, id) منطبق، مرتب بر اساس rank نزولی و سپس id صعودی"""
+        bits = self._all
+
+        if city := search_criteria.get('search_city'):
+            prefix = normalize_place(city)
+            bits &= self._union(bucket for key, bucket in self._by_city.items() if key.startswith(prefix))
+
+        if gender := search_criteria.get('search_gender'):
+            bits &= self._by_gender.get(gender, 0)
+
+        if styles := search_criteria.get('search_work_styles'):
+            bits &= self._union(self._by_style.get(style, 0) for style in styles)
+
+        if bits and (age_range := search_criteria.get('search_age_range')):
+            min_age, max_age = age_range
+            bits = self._intersect_range(
+                bits, self._ages,
+                bisect.bisect_left(self._ages, (min_age, -1)),
+                bisect.bisect_right(self._ages, (max_age, float('inf'))),
+                lambda doc: doc.age is not None and min_age <= doc.age <= max_age,
+            )
+
+        if bits and (price_range := search_criteria.get('search_price_range')):
+            min_price, max_price = price_range
+            bits = self._intersect_range(
+                bits, self._price_mins,
+                0, bisect.bisect_right(self._price_mins, (max_price, float('inf'))),
+                lambda doc: doc.price_min is not None and doc.price_min <= max_price,
+            )
+            bits = self._intersect_range(
+                bits, self._price_maxes,
+                bisect.bisect_left(self._price_maxes, (min_price, -1)), len(self._price_maxes),
+                lambda doc: doc.price_max is not None and doc.price_max >= min_price,
+            )
+
+        docs = [self._docs[slot] for slot in _bits_to_slots(bits)]
+        if features := search_criteria.get('search_special_features'):
+            # متن آزاد روی تعداد کم نامزدهای باقی‌مانده بررسی و بر اساس شباهت رتبه‌بندی می‌شود
+            needle = normalize_text(features)
+            keys = [
+                (trigram_similarity(needle, doc.features), doc.id)
+                for doc in docs if needle in doc.features
+            ]
+            return sorted(keys, key=lambda key: (-key[0], key[1]))
+
+        return sorted((0, doc.id) for doc in docs)
+
+    # ---------- داخلی ----------
+
+    def _add(self, doc: SupplierDocument):
+        slot = self._free_slots.pop() if self._free_slots else len(self._docs)
+        if slot == len(self._docs):
+            self._docs.append(doc)
+        else:
+            self._docs[slot] = doc
+        self._slot_of[doc.id] = slot
+
+        bit = 1 << slot
+        self._all |= bit
+        for buckets, keys in self._bucket_keys(doc):
+            for key in keys:
+                buckets[key] = buckets.get(key, 0) | bit
+        for values, value in self._range_keys(doc):
+            if value is not None:
+                bisect.insort(values, (value, slot))
+
+    def _bucket_keys(self, doc: SupplierDocument):
+        return (
+            (self._by_gender, [doc.gender] if doc.gender else []),
+            (self._by_style, doc.work_styles),
+            (self._by_cooperation, doc.cooperation_types),
+            (self._by_city, [doc.city]),
+        )
+
+    def _range_keys(self, doc: SupplierDocument):
+        has_price = doc.price_min is not None and doc.price_max is not None
+        return (
+            (self._ages, doc.age),
+            (self._price_mins, doc.price_min if has_price else None),
+            (self._price_maxes, doc.price_max if has_price else None),
+        )
+
+    @staticmethod
+    def _union(buckets: Iterable[int]) -> int:
+        bits = 0
+        for bucket in buckets:
+            bits |= bucket
+        return bits
+
+    def _intersect_range(self, bits: int, values: list, lo: int, hi: int, predicate) -> int:
+        """اشتراک bitset با بازه [lo, hi) از آرایه مرتب؛ هر کدام کوچک‌تر باشد پیمایش می‌شود"""
+        if bits.bit_count() < hi - lo:
+            return _slots_to_bits(slot for slot in _bits_to_slots(bits) if predicate(self._docs[slot]))
+        return bits & _slots_to_bits(values[i][1] for i in range(lo, hi))
+
+
+supplier_index = SupplierIndex()
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import multiprocessing
+import signal
+import socket
+from multiprocessing.connection import wait
+from typing import Awaitable, Callable, Dict
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+from sqlalchemy import text
+
+from config.settings import settings
+from database.connection import engine
+from database.redis_client import get_redis
+from middlewares.database import session_stats
+from search.cache import search_cache
+from utils.dataloader import get_loader_stats
+from utils.identity import identity_cache
+from utils.notifications import notification_dispatcher
+from utils.broadcast import broadcast_manager
+from utils.invalidation import invalidation_bus
+from utils.send_scheduler import send_scheduler
+
+logger = logging.getLogger(__name__)
+
+HEALTH_PATH = "/healthz"
+READY_PATH = "/readyz"
+METRICS_PATH = "/metrics"
+READINESS_TIMEOUT = 2.0
+
+# پس از شروع برنامه فقط set/clear می‌شود (تغییر خود app پس از start منسوخ است)
+READY = web.AppKey("ready", asyncio.Event)
+
+
+async def check_readiness() -> Dict[str, bool]:
+    """اتصال به PostgreSQL و (در صورت تنظیم) Redis"""
+    checks = {}
+    try:
+        async with asyncio.timeout(READINESS_TIMEOUT):
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        checks["database"] = True
+    except Exception as e:
+        logger.warning(f"Readiness: database check failed: {e}")
+        checks["database"] = False
+
+    redis = get_redis()
+    if redis is not None:
+        try:
+            async with asyncio.timeout(READINESS_TIMEOUT):
+                await redis.ping()
+            checks["redis"] = True
+        except Exception as e:
+            logger.warning(f"Readiness: redis check failed: {e}")
+            checks["redis"] = False
+    return checks
+
+
+def create_app(
+    dp: Dispatcher,
+    bot: Bot,
+    path: str = settings.webhook_path,
+    secret_token: str = settings.webhook_secret,
+    readiness: Callable[[], Awaitable[Dict[str, bool]]] = check_readiness,
+) -> web.Application:
+    """برنامه aiohttp با مسیر webhook، endpointهای سلامت و /metrics (آمار صف‌ها، کش‌ها و session این worker)
+
+    /healthz فقط زنده بودن پروسه را نشان می‌دهد. /readyz تا پایان startup
+    دیسپچر (بررسی schema و بارگذاری ایندکس‌ها) و هنگام خاموش شدن 503
+    برمی‌گرداند و در غیر این صورت اتصال دیتابیس و Redis را بررسی می‌کند.
+    """
+    app = web.Application()
+    app[READY] = asyncio.Event()
+
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=secret_token or None).register(app, path=path)
+    setup_application(app, dp, bot=bot)
+
+    async def mark_ready(app: web.Application):
+        app[READY].set()
+
+    async def mark_not_ready(app: web.Application):
+        app[READY].clear()
+
+    # بعد از startup دیسپچر و قبل از shutdown آن
+    app.on_startup.append(mark_ready)
+    app.on_shutdown.insert(0, mark_not_ready)
+
+    async def health(request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok"})
+
+    async def ready(request: web.Request) -> web.Response:
+        if not request.app[READY].is_set():
+            return web.json_response({"status": "starting"}, status=503)
+        checks = await readiness()
+        ok = all(checks.values())
+        return web.json_response({"status": "ok" if ok else "unavailable", **checks}, status=200 if ok else 503)
+
+    async def metrics(request: web.Request) -> web.Response:
+        return web.json_response({
+            "send_scheduler": send_scheduler.get_stats(),
+            "notifications": notification_dispatcher.get_stats(),
+            "broadcasts": broadcast_manager.get_stats(),
+            "invalidation": invalidation_bus.get_stats(),
+            "sessions": session_stats.snapshot(),
+            "identity_cache": identity_cache.get_stats(),
+            "search_cache": await search_cache.get_stats(),
+            "dataloaders": get_loader_stats(),
+        })
+
+    app.router.add_get(HEALTH_PATH, health)
+    app.router.add_get(READY_PATH, ready)
+    app.router.add_get(METRICS_PATH, metrics)
+    return app
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """سوکت گوش‌دهنده مشترک که قبل از fork ساخته می‌شود تا همه workerها روی یک پورت باشند"""
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    sock.setblocking(False)
+    return sock
+
+
+def serve(app_factory: Callable[[], Awaitable[web.Application]], sock: socket.socket):
+    """اجرای برنامه روی سوکت داده‌شده تا SIGINT/SIGTERM"""
+    web.run_app(app_factory(), sock=sock, print=None, access_log=None)
+
+
+def run_workers(app_factory: Callable[[], Awaitable[web.Application]], sock: socket.socket, workers: int):
+    """اجرای چند پروسه worker روی یک سوکت (pre-fork)
+
+    هر worker دیسپچر، اتصال‌های دیتابیس و ایندکس‌های درون‌حافظه‌ای خودش را
+    پس از fork می‌سازد و وضعیت FSM از RedisStorage مشترک خوانده می‌شود.
+    ایندکس تأمین‌کنندگان، جستجوهای ذخیره‌شده و سطح اول کش هویت در هر worker
+    جداست؛ تغییرات با invalidation_bus (Redis pub/sub) به بقیه می‌رسد و تا
+    رسیدن پیام (معمولاً چند میلی‌ثانیه) worker دیگر نسخه قدیمی را می‌بیند. اگر
+    یک worker از کار بیفتد بقیه هم متوقف می‌شوند تا supervisor (Docker)
+    کل سرویس را دوباره راه‌اندازی کند.
+    """
+    if workers <= 1:
+        serve(app_factory, sock)
+        return
+
+    context = multiprocessing.get_context("fork")
+    processes = [
+        context.Process(target=serve, args=(app_factory, sock), name=f"webhook-worker-{number}")
+        for number in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    logger.info(f"Started {workers} webhook workers on {sock.getsockname()}")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    exit_code = 0
+    alive = list(processes)
+    while alive:
+        wait([process.sentinel for process in alive])
+        for process in [process for process in alive if not process.is_alive()]:
+            alive.remove(process)
+            if process.exitcode and not stopping:
+                logger.error(f"{process.name} exited with code {process.exitcode}; stopping the other workers")
+                exit_code = process.exitcode if process.exitcode > 0 else 1
+                stop(None, None)
+    sock.close()
+    if exit_code:
+        raise SystemExit(exit_code)
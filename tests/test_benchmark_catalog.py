@@ -0,0 +1,54 @@
+from benchmarks.catalog import generate_criteria, generate_requests, generate_suppliers
+from benchmarks.run import percentile
+from benchmarks.telegram_id import generate_telegram_ids
+from database.models import RequestStatus
+from search.cache import canonical_criteria
+
+
+class TestBenchmarkCatalog:
+    """تست‌های تولیدکننده داده بنچمارک"""
+
+    def test_generators_are_deterministic(self):
+        """تست یکسان بودن داده برای seed یکسان"""
+        assert list(generate_suppliers(50, seed=1)) == list(generate_suppliers(50, seed=1))
+        assert list(generate_suppliers(50, seed=1)) != list(generate_suppliers(50, seed=2))
+        assert generate_criteria(20, seed=3) == generate_criteria(20, seed=3)
+
+    def test_criteria_prefix_is_stable(self):
+        """تست اینکه تعداد بیشتر جستجو همان جستجوهای اول را تکرار کند"""
+        assert generate_criteria(100, seed=3)[:10] == generate_criteria(10, seed=3)
+
+    def test_supplier_rows(self):
+        """تست معتبر بودن ردیف‌های تولیدشده"""
+        for row in generate_suppliers(200, seed=5):
+            assert row["work_styles"]
+            assert (row["price_range_min"] is None) == (row["price_range_max"] is None)
+            if row["price_range_min"] is not None:
+                assert row["price_range_min"] <= row["price_range_max"]
+
+    def test_criteria_are_canonicalizable(self):
+        """تست سازگاری فیلترها با شکل ذخیره‌شده در state"""
+        for criteria in generate_criteria(50, seed=9):
+            assert canonical_criteria(criteria)['search_city']
+
+    def test_percentile(self):
+        """تست صدک nearest-rank"""
+        values = list(range(1, 101))
+        assert percentile(values, 50) == 50
+        assert percentile(values, 99) == 99
+        assert percentile([3.0], 95) == 3.0
+
+    def test_telegram_ids(self):
+        """تست یکتا و قطعی بودن شناسه‌های تلگرام بنچمارک"""
+        telegram_ids = generate_telegram_ids(1000, seed=4)
+        assert len(set(telegram_ids)) == 1000
+        assert telegram_ids == generate_telegram_ids(1000, seed=4)
+        assert all(100_000_000 <= telegram_id < 7_000_000_000 for telegram_id in telegram_ids)
+
+    def test_requests(self):
+        """تست قطعی بودن درخواست‌ها و یکتایی درخواست در انتظار برای هر جفت"""
+        requests = list(generate_requests(2000, suppliers=100, demanders=20, seed=6))
+        assert requests == list(generate_requests(2000, suppliers=100, demanders=20, seed=6))
+        pending = [(row["demander_id"], row["supplier_id"]) for row in requests if row["status"] is RequestStatus.PENDING]
+        assert pending and len(pending) == len(set(pending))
+        assert all(1 <= row["supplier_id"] <= 100 and 1 <= row["demander_id"] <= 20 for row in requests)
@@ -0,0 +1,172 @@
+from types import SimpleNamespace
+
+import pytest
+from aiogram.exceptions import TelegramForbiddenError, TelegramServerError
+from aiogram.methods import CopyMessage
+from sqlalchemy.dialects import postgresql
+
+from database.models import UserRole
+from utils.broadcast import (
+    CANCELLED, COMPLETED, RUNNING, BroadcastFilters, BroadcastManager, BroadcastRunner, _Chunk, format_progress,
+    parse_filters, recipients_query,
+)
+from utils.outbox import to_payload
+
+
+def sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+class FakeStreamResult:
+    def __init__(self, rows, size):
+        self.rows = rows
+        self.size = size
+
+    async def partitions(self):
+        for start in range(0, len(self.rows), self.size):
+            yield self.rows[start:start + self.size]
+
+
+class FakeDatabase:
+    """users و broadcasts درون حافظه؛ دستورهای UPDATE برای بررسی نگه داشته می‌شوند"""
+
+    def __init__(self, fake_session, user_ids, status=RUNNING):
+        self.fake_session = fake_session
+        self.users = [SimpleNamespace(id=user_id, telegram_id=user_id * 10) for user_id in user_ids]
+        self.status = status
+        self.streams = []
+        self.updates = []
+
+    def __call__(self):
+        return self.fake_session(respond=self.execute, stream=self.stream)
+
+    def stream(self, stmt):
+        params = stmt.compile().params
+        self.streams.append(params)
+        after, limit = params["id_1"], params["param_1"]
+        rows = [user for user in self.users if user.id > after][:limit]
+        return FakeStreamResult(rows, stmt.get_execution_options()["yield_per"])
+
+    def execute(self, stmt, params):
+        query = sql(stmt)
+        self.updates.append((query, stmt.compile().params))
+        if "CASE WHEN" in query and self.status == RUNNING:
+            self.status = COMPLETED
+        return [self.status] if query.startswith("UPDATE broadcasts") else []
+
+
+class FakeBot:
+    def __init__(self, blocked=(), failing=()):
+        self.blocked = set(blocked)
+        self.failing = set(failing)
+        self.copied = []
+        self.edits = []
+
+    async def copy_message(self, chat_id, from_chat_id, message_id):
+        method = CopyMessage(chat_id=chat_id, from_chat_id=from_chat_id, message_id=message_id)
+        if chat_id in self.blocked:
+            raise TelegramForbiddenError(method, "bot was blocked by the user")
+        if chat_id in self.failing:
+            raise TelegramServerError(method, "Bad Gateway")
+        self.copied.append(chat_id)
+
+    async def edit_message_text(self, text, **kwargs):
+        self.edits.append((text, kwargs))
+
+
+def make_broadcast(last_user_id=0, total=10, filters=BroadcastFilters()):
+    return SimpleNamespace(
+        id=1, created_by=99, source_chat_id=99, source_message_id=5, progress_message_id=7,
+        filters=to_payload(filters), total=total, last_user_id=last_user_id, sent=0, failed=0, blocked=0,
+    )
+
+
+class TestBroadcast:
+    """تست‌های ارسال پیام همگانی"""
+
+    def test_parse_filters(self):
+        """تست خواندن فیلترها از آرگومان‌های دستور"""
+        assert parse_filters(None) == BroadcastFilters()
+        assert parse_filters('role=supplier city="بندر عباس" all') == BroadcastFilters(UserRole.SUPPLIER, "بندر عباس", False)
+        for args in ("role=admin", "city=", "foo", 'city="تهران'):
+            with pytest.raises(ValueError):
+                parse_filters(args)
+
+    def test_recipients_query(self):
+        """تست keyset روی users.id و فیلتر نقش، شهر و وضعیت فعال"""
+        query = sql(recipients_query(BroadcastFilters(UserRole.SUPPLIER, "طهران"), 500))
+        assert "users.id > " in query and query.rstrip().endswith("ORDER BY users.id")
+        assert "users.is_active IS NOT false" in query and "suppliers.city_norm = " in query
+        assert "is_active" not in sql(recipients_query(BroadcastFilters(active_only=False)))
+
+    def test_role_filter_uses_enum_labels(self):
+        """تست مقایسه نقش با برچسب‌های نوع userrole در migration 001 ('supplier')، نه نام عضو enum"""
+        query = recipients_query(BroadcastFilters(UserRole.SUPPLIER))
+        compiled = str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+        assert "users.role = 'supplier'" in compiled
+
+    @pytest.mark.asyncio
+    async def test_run_sends_and_deactivates_blocked(self, fake_session):
+        """تست ارسال به همه گیرندگان، شمارش نتایج، غیرفعال کردن کاربران مسدودکننده و checkpoint نهایی"""
+        db = FakeDatabase(fake_session, range(1, 11))
+        bot = FakeBot(blocked={30}, failing={70})
+        runner = BroadcastRunner(make_broadcast(), bot, session_factory=db, workers=3, chunk_size=4, progress_interval=5)
+
+        assert await runner.run() == COMPLETED
+        assert len(bot.copied) == 8
+        stats = runner.get_stats()
+        assert (stats["sent"], stats["failed"], stats["blocked"], stats["checkpoint"]) == (8, 1, 1, 10)
+
+        deactivate = [params for query, params in db.updates if query.startswith("UPDATE users")]
+        assert deactivate and deactivate[0]["id_1"] == [3]
+        final_query, final_params = db.updates[-1]
+        assert final_query.startswith("UPDATE broadcasts") and final_params["last_user_id"] == 10
+        assert "✅ پایان یافت" in bot.edits[-1][0] and bot.edits[-1][1]["reply_markup"] is None
+
+    @pytest.mark.asyncio
+    async def test_resume_from_checkpoint(self, fake_session):
+        """تست ادامه پخش از آخرین users.id ذخیره‌شده با cursorهای پنجره‌ای"""
+        db = FakeDatabase(fake_session, range(1, 101))
+        bot = FakeBot()
+        runner = BroadcastRunner(make_broadcast(last_user_id=60, total=100), bot, session_factory=db, workers=2, chunk_size=2)
+
+        assert await runner.run() == COMPLETED
+        assert bot.copied == [user_id * 10 for user_id in range(61, 101)]
+        # هر cursor حداکثر ۱۰ دسته می‌خواند و سپس از آخرین id دوباره باز می‌شود
+        assert [params["id_1"] for params in db.streams] == [60, 80, 100]
+
+    @pytest.mark.asyncio
+    async def test_cancelled_broadcast_stops(self, fake_session):
+        """تست توقف پخشی که ادمین لغو کرده است"""
+        db = FakeDatabase(fake_session, range(1, 11), status=CANCELLED)
+        runner = BroadcastRunner(make_broadcast(), FakeBot(), session_factory=db, workers=1, chunk_size=5, progress_interval=5)
+        assert await runner.run() == CANCELLED
+
+    @pytest.mark.asyncio
+    async def test_claim_skips_own_runners(self, fake_session):
+        """تست اینکه پخش‌های در حال اجرای همین پروسه دوباره برداشته نشوند"""
+        session = fake_session()
+        manager = BroadcastManager(session_factory=lambda: session, lease_seconds=60)
+        manager._runners[7] = None
+
+        assert await manager._claim() == []
+        claim = session.statements[0]
+        assert "broadcasts.id NOT IN" in sql(claim)
+        assert claim.compile().params["id_1"] == [7]
+
+    def test_checkpoint_waits_for_earlier_chunks(self, fake_session):
+        """تست اینکه checkpoint از دسته نیمه‌تمام جلوتر نرود"""
+        runner = BroadcastRunner(make_broadcast(), FakeBot(), session_factory=FakeDatabase(fake_session, []))
+        first, second = _Chunk(4, 4, done=3, sent=3), _Chunk(8, 4, done=4, sent=3, blocked=[(6, 60)])
+        runner._chunks.extend([first, second])
+
+        assert runner._advance() == [] and runner.last_user_id == 0
+        first.done, first.sent = 4, 4
+        assert runner._advance() == [(6, 60)] and runner.last_user_id == 8
+        assert runner.counts == {"sent": 7, "failed": 0, "blocked": 1}
+
+    def test_format_progress(self):
+        """تست متن وضعیت با سرعت و زمان باقی‌مانده"""
+        stats = {"total": 1000, "sent": 290, "failed": 5, "blocked": 5, "rate": 28.5, "eta_seconds": 3725}
+        text = format_progress(3, stats, RUNNING)
+        assert "300 از 1000" in text and "28.5" in text and "01:02:05" in text
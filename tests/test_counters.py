@@ -0,0 +1,153 @@
+import pytest
+
+from utils import counters as counters_module
+from utils.counters import FLUSHING_KEY, LIVE_KEY, LOCK_KEY, VIEW_LOGS_KEY, SupplierCounters, parse_deltas
+
+
+class RecordingCounters(SupplierCounters):
+    """نسخه‌ای از شمارنده‌ها که به جای دیتابیس تغییرات را نگه می‌دارد"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.applied = []
+        self.logged = []
+        self.fail = False
+        self.during_apply = None
+
+    async def _apply_deltas(self, deltas):
+        if self.during_apply is not None:
+            await self.during_apply()
+        if self.fail:
+            raise RuntimeError("database unavailable")
+        self.applied.append(deltas)
+
+    async def _insert_view_logs(self, samples):
+        self.logged.extend(samples)
+
+
+class TestSupplierCounters:
+    """تست‌های شمارنده‌های بازدید و درخواست"""
+
+    def test_parse_deltas(self):
+        """تست تجمیع فیلدهای hash به ازای هر تأمین‌کننده"""
+        deltas = parse_deltas({b"7:views": b"3", b"7:requests": b"1", "9:views": "2"})
+        assert deltas == {7: {'views': 3, 'requests': 1}, 9: {'views': 2, 'requests': 0}}
+
+    @pytest.mark.asyncio
+    async def test_flush_aggregates_in_one_batch(self):
+        """تست اعمال همه بازدیدها و درخواست‌ها در یک دسته"""
+        counters = RecordingCounters(flush_interval=60, sample_rate=0)
+        await counters.record_views([1, 2, 3], 100, 'list')
+        await counters.record_views([2], 100, 'detail')
+        await counters.record_request(3)
+        await counters.flush()
+
+        assert counters.applied == [{
+            1: {'views': 1, 'requests': 0},
+            2: {'views': 2, 'requests': 0},
+            3: {'views': 1, 'requests': 1},
+        }]
+        assert counters.logged == []
+
+        await counters.flush()
+        assert len(counters.applied) == 1
+
+    @pytest.mark.asyncio
+    async def test_samples_view_logs(self):
+        """تست نمونه‌برداری بازدیدها برای view_logs"""
+        counters = RecordingCounters(flush_interval=60, sample_rate=1)
+        await counters.record_views([5], 100, 'detail')
+        await counters.flush()
+
+        assert [sample[:3] for sample in counters.logged] == [[5, 100, 'detail']]
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_deltas(self):
+        """تست حفظ تغییرات هنگام خطای دیتابیس"""
+        counters = RecordingCounters(flush_interval=60, sample_rate=0)
+        await counters.record_views([1], 100, 'list')
+        counters.fail = True
+        with pytest.raises(RuntimeError):
+            await counters.flush()
+
+        counters.fail = False
+        await counters.record_views([1], 100, 'list')
+        await counters.flush()
+        assert counters.applied == [{1: {'views': 2, 'requests': 0}}]
+
+
+class TestSupplierCountersRedis:
+    """تست‌های مسیر Redis شمارنده‌ها (RENAME، flush و view_logs) روی Redis جعلی"""
+
+    @pytest.mark.asyncio
+    async def test_flush_renames_live_hash(self, fake_redis):
+        """تست کنار گذاشتن hash با RENAME، اعمال و حذف آن و آزاد شدن قفل"""
+        counters = RecordingCounters(flush_interval=60, sample_rate=0)
+        await counters.record_views([1, 2], 100, 'list')
+        await counters.record_request(2)
+        await counters.flush()
+
+        assert counters.applied == [{1: {'views': 1, 'requests': 0}, 2: {'views': 1, 'requests': 1}}]
+        assert not await fake_redis.exists(LIVE_KEY, FLUSHING_KEY, LOCK_KEY)
+
+        await counters.flush()
+        assert len(counters.applied) == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_is_retried_from_flushing_hash(self, fake_redis):
+        """تست اعمال دوباره hash کنارگذاشته پس از خطا، جدا از افزایش‌های جدید"""
+        counters = RecordingCounters(flush_interval=60, sample_rate=0)
+        await counters.record_views([1], 100, 'list')
+        counters.fail = True
+        with pytest.raises(RuntimeError):
+            await counters.flush()
+        assert await fake_redis.exists(FLUSHING_KEY)
+        assert not await fake_redis.exists(LOCK_KEY)
+
+        counters.fail = False
+        await counters.record_views([1, 3], 100, 'list')
+        await counters.flush()
+        assert counters.applied == [{1: {'views': 1, 'requests': 0}}]
+
+        await counters.flush()
+        assert counters.applied[1] == {1: {'views': 1, 'requests': 0}, 3: {'views': 1, 'requests': 0}}
+
+    @pytest.mark.asyncio
+    async def test_view_logs_are_drained_in_batches(self, fake_redis, monkeypatch):
+        """تست برداشتن نمونه‌های بازدید به اندازه SAMPLES_PER_FLUSH در هر flush"""
+        monkeypatch.setattr(counters_module, "SAMPLES_PER_FLUSH", 2)
+        counters = RecordingCounters(flush_interval=60, sample_rate=1)
+        await counters.record_views([1, 2, 3], 100, 'list')
+
+        await counters.flush()
+        assert [sample[0] for sample in counters.logged] == [1, 2]
+        assert await fake_redis.llen(VIEW_LOGS_KEY) == 1
+
+        await counters.flush()
+        assert [sample[0] for sample in counters.logged] == [1, 2, 3]
+        assert not await fake_redis.exists(VIEW_LOGS_KEY)
+
+    @pytest.mark.asyncio
+    async def test_lock_held_by_other_process(self, fake_redis):
+        """تست رد شدن flush وقتی پروسه دیگری قفل را دارد"""
+        counters = RecordingCounters(flush_interval=60, sample_rate=0)
+        await counters.record_views([1], 100, 'list')
+        await fake_redis.set(LOCK_KEY, "other")
+
+        await counters.flush()
+        assert counters.applied == []
+        assert await fake_redis.get(LOCK_KEY) == b"other"
+
+    @pytest.mark.asyncio
+    async def test_expired_lock_of_other_process_is_kept(self, fake_redis):
+        """تست حذف نشدن قفلی که پس از انقضا به پروسه دیگری رسیده"""
+        counters = RecordingCounters(flush_interval=60, sample_rate=0)
+        await counters.record_views([1], 100, 'list')
+
+        async def lock_taken_over():
+            await fake_redis.set(LOCK_KEY, "other")
+        counters.during_apply = lock_taken_over
+
+        await counters.flush()
+        assert len(counters.applied) == 1
+        assert await fake_redis.get(LOCK_KEY) == b"other"
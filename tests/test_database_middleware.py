@@ -0,0 +1,107 @@
+from types import SimpleNamespace
+
+import pytest
+
+from middlewares.database import READ_ONLY, DatabaseMiddleware, ReadYourWrites, SessionStats
+
+
+class SessionFactory:
+    """factory که sessionهای جعلی ساخته‌شده را برای بررسی ساخته شدن و بسته شدن نگه می‌دارد"""
+
+    def __init__(self, fake_session):
+        self.fake_session = fake_session
+        self.created = []
+
+    def __call__(self):
+        self.created.append(self.fake_session())
+        return self.created[-1]
+
+
+def handler_data(callback, flags=None, user_id=None):
+    data = {"handler": SimpleNamespace(callback=callback, flags=flags or {})}
+    if user_id is not None:
+        data["event_from_user"] = SimpleNamespace(id=user_id)
+    return data
+
+
+class TestDatabaseMiddleware:
+    """تست‌های middleware دیتابیس با session تنبل"""
+
+    @pytest.mark.asyncio
+    async def test_session_not_created_when_unused(self, fake_session):
+        """تست عدم ساخت session برای هندلری که به دیتابیس کاری ندارد"""
+        primary = SessionFactory(fake_session)
+        stats = SessionStats()
+        middleware = DatabaseMiddleware(session_factory=primary, stats=stats)
+
+        async def process_search_gender(event, data):
+            return "ok"
+
+        assert await middleware(process_search_gender, object(), handler_data(process_search_gender)) == "ok"
+        assert primary.created == []
+        assert stats.snapshot() == {"process_search_gender": {"updates": 1, "session_used": 0}}
+
+    @pytest.mark.asyncio
+    async def test_session_created_on_first_use_and_closed(self, fake_session):
+        """تست ساخت session در اولین استفاده و بسته شدن آن پس از هندلر"""
+        primary = SessionFactory(fake_session)
+        stats = SessionStats()
+        middleware = DatabaseMiddleware(session_factory=primary, stats=stats)
+        sessions = []
+
+        async def cmd_profile(event, data):
+            await data["session"].execute("SELECT 1")
+            await data["session"].execute("SELECT 2")
+            sessions.append(data["session"]._session)
+
+        await middleware(cmd_profile, object(), handler_data(cmd_profile))
+
+        assert primary.created == sessions
+        assert sessions[0].statements == ["SELECT 1", "SELECT 2"]
+        assert sessions[0].closed
+        assert stats.snapshot() == {"cmd_profile": {"updates": 1, "session_used": 1}}
+
+    @pytest.mark.asyncio
+    async def test_read_only_handlers_use_replica(self, fake_session):
+        """تست فرستادن هندلرهای فقط‌خواندنی به replica و بقیه به دیتابیس اصلی"""
+        primary, replica = SessionFactory(fake_session), SessionFactory(fake_session)
+        middleware = DatabaseMiddleware(
+            session_factory=primary, stats=SessionStats(),
+            replica_factory=lambda: replica, sticky=ReadYourWrites(ttl=60),
+        )
+        used = []
+
+        async def handler(event, data):
+            await data["session"].execute("SELECT 1")
+            used.append(data["session"]._session)
+
+        await middleware(handler, object(), handler_data(handler, READ_ONLY, user_id=1))
+        await middleware(handler, object(), handler_data(handler, user_id=1))
+        assert used == [replica.created[0], primary.created[0]]
+
+        no_replica = DatabaseMiddleware(session_factory=primary, stats=SessionStats(), replica_factory=lambda: None)
+        await no_replica(handler, object(), handler_data(handler, READ_ONLY, user_id=1))
+        assert used[-1] is primary.created[-1]
+
+    @pytest.mark.asyncio
+    async def test_reads_stick_to_primary_after_own_commit(self, fake_session):
+        """تست اینکه کاربر پس از commit خودش تا پایان TTL از دیتابیس اصلی بخواند"""
+        primary, replica = SessionFactory(fake_session), SessionFactory(fake_session)
+        middleware = DatabaseMiddleware(
+            session_factory=primary, stats=SessionStats(),
+            replica_factory=lambda: replica, sticky=ReadYourWrites(ttl=60),
+        )
+        used = []
+
+        async def process_confirmation(event, data):
+            await data["session"].execute("INSERT")
+            await data["session"].commit()
+
+        async def view_profile(event, data):
+            await data["session"].execute("SELECT 1")
+            used.append(data["session"]._session)
+
+        await middleware(process_confirmation, object(), handler_data(process_confirmation, user_id=1))
+        await middleware(view_profile, object(), handler_data(view_profile, READ_ONLY, user_id=1))
+        await middleware(view_profile, object(), handler_data(view_profile, READ_ONLY, user_id=2))
+        assert used == [primary.created[1], replica.created[0]]
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from database.models import UserRole
+from utils import dataloader
+from utils.dataloader import DataLoader, SessionLoaders, get_loader_stats, get_supplier
+from utils.identity import Identity, IdentityCache, load_identities
+
+
+class RecordingBatch:
+    """تابع دسته‌ای ساده که کلیدهای هر فراخوانی را ثبت می‌کند"""
+
+    def __init__(self, values):
+        self.values = values
+        self.calls = []
+
+    async def __call__(self, keys):
+        self.calls.append(sorted(keys))
+        return {key: self.values[key] for key in keys if key in self.values}
+
+
+class TestDataLoader:
+    """تست‌های ادغام جستجوهای هم‌زمان"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_loads_share_one_batch(self):
+        """تست اینکه جستجوهای یک دور event loop فقط یک کوئری بزنند"""
+        batch = RecordingBatch({1: "a", 2: "b", 3: "c"})
+        loader = DataLoader(batch)
+
+        results = await asyncio.gather(*(loader.load(key) for key in [1, 2, 2, 3, 9]))
+
+        assert results == ["a", "b", "b", "c", None]
+        assert batch.calls == [[1, 2, 3, 9]]
+        assert loader.get_stats() == {"loads": 5, "batches": 1, "batch_factor": 5.0}
+
+        # دور بعدی دوباره خوانده می‌شود
+        assert await loader.load(1) == "a"
+        assert batch.calls[-1] == [1]
+
+    @pytest.mark.asyncio
+    async def test_max_batch_size_and_errors(self):
+        """تست تقسیم دسته‌های بزرگ و رساندن خطا به همه منتظرها"""
+        batch = RecordingBatch({key: key for key in range(5)})
+        loader = DataLoader(batch, max_batch_size=2)
+        assert await loader.load_many(range(5)) == [0, 1, 2, 3, 4]
+        assert batch.calls == [[0, 1], [2, 3], [4]]
+
+        async def failing(keys):
+            raise RuntimeError("db down")
+
+        failing_loader = DataLoader(failing)
+        results = await asyncio.gather(failing_loader.load(1), failing_loader.load(2), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    @pytest.mark.asyncio
+    async def test_loader_stats_sum_session_factories(self, monkeypatch):
+        """تست جمع آمار یک تابع دسته‌ای روی همه session factoryها (primary و replica)"""
+        async def load_items(session_factory, keys):
+            return {key: key for key in keys}
+
+        monkeypatch.setattr(dataloader, "_session_loaders", {})
+        for factory in ("primary", "replica"):
+            await dataloader.get_session_loaders(factory).get(load_items).load_many([1, 2])
+
+        assert get_loader_stats() == {"load_items": {"loads": 4, "batches": 2, "batch_factor": 2.0}}
+
+    @pytest.mark.asyncio
+    async def test_identity_cache_uses_session_loaders(self, fake_session):
+        """تست ادغام جستجوی هویت کاربران هم‌زمان از طریق session.loaders"""
+        rows = {
+            10: (1, UserRole.SUPPLIER, True, 5, None, 10),
+            20: (2, UserRole.DEMANDER, True, None, 7, 20),
+        }
+        sessions = []
+
+        def session_factory():
+            sessions.append(fake_session(
+                respond=lambda stmt, params: [rows[key] for key in params["telegram_ids"] if key in rows]
+            ))
+            return sessions[-1]
+        loaders = SessionLoaders(session_factory)
+
+        class Session:
+            pass
+
+        session = Session()
+        session.loaders = loaders
+        cache = IdentityCache(max_size=10, local_ttl=60, ttl=60)
+
+        first, second, missing = await asyncio.gather(
+            cache.get(session, 10), cache.get(session, 20), cache.get(session, 30)
+        )
+
+        assert first == Identity(1, UserRole.SUPPLIER, True, 5, None)
+        assert second.demander_id == 7 and missing is None
+        assert [params for opened in sessions for params in opened.params] == [{"telegram_ids": [10, 20, 30]}]
+        assert loaders.get_stats()[load_identities.__name__]["batches"] == 1
+
+    @pytest.mark.asyncio
+    async def test_get_supplier_without_loaders(self):
+        """تست استفاده مستقیم از session وقتی DataLoader در دسترس نیست"""
+
+        class Session:
+            async def get(self, model, key):
+                return ("direct", key)
+
+        assert await get_supplier(Session(), 3) == ("direct", 3)
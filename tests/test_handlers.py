@@ -11,6 +11,7 @@ async def test_cmd_start_new_user():
     """تست دستور start برای کاربر جدید"""
     # Mock objects
     message = AsyncMock(spec=Message)
+    message.answer = AsyncMock()
     message.from_user = MagicMock(spec=TelegramUser)
     message.from_user.id = 123456789
     message.from_user.full_name = "Test User"
@@ -18,8 +19,9 @@ async def test_cmd_start_new_user():
     state = AsyncMock(spec=FSMContext)
     session = AsyncMock()
     
-    # Mock database query
-    session.execute.return_value.scalar_one_or_none.return_value = None
+    # Mock database query (جستجوی هویت در utils.identity)
+    session.execute.return_value = MagicMock()
+    session.execute.return_value.first.return_value = None
     
     # Call handler
     await cmd_start(message, state, session)
@@ -34,6 +36,7 @@ async def test_select_supplier_role_new():
     """تست انتخاب نقش تأمین‌کننده برای کاربر جدید"""
     # Mock objects
     message = AsyncMock(spec=Message)
+    message.answer = AsyncMock()
     message.from_user = MagicMock(spec=TelegramUser)
     message.from_user.id = 123456789
     message.text = "🎭 تأمین‌کننده"
@@ -41,8 +44,9 @@ async def test_select_supplier_role_new():
     state = AsyncMock(spec=FSMContext)
     session = AsyncMock()
     
-    # Mock database query
-    session.execute.return_value.scalar_one_or_none.return_value = None
+    # Mock database query (جستجوی هویت در utils.identity)
+    session.execute.return_value = MagicMock()
+    session.execute.return_value.first.return_value = None
     
     # Call handler
     await select_supplier_role(message, state, session)
@@ -51,3 +55,43 @@ async def test_select_supplier_role_new():
     message.answer.assert_called_once()
     assert "نام و نام خانوادگی" in message.answer.call_args[0][0]
     state.set_state.assert_called_with(SupplierRegistration.full_name)
+
+@pytest.mark.asyncio
+async def test_confirmation_keeps_inactive_supplier_out_of_search(monkeypatch):
+    """تست ویرایش ثبت‌نام تأمین‌کننده غیرفعال: حذف از ایندکس و بدون اعلان جستجوهای ذخیره‌شده"""
+    from database.models import Supplier
+    from handlers import supplier as supplier_handlers
+
+    message = AsyncMock(spec=Message)
+    message.answer = AsyncMock()
+    message.from_user = MagicMock(spec=TelegramUser)
+    message.from_user.id = 123456789
+    message.text = "✅ تأیید نهایی"
+
+    state = AsyncMock(spec=FSMContext)
+    state.get_data.return_value = {
+        'full_name': "Test User", 'gender': "female", 'age': 25, 'phone_number': "09120000000",
+        'height': 170, 'weight': 60, 'hair_color': "مشکی", 'eye_color': "قهوه‌ای", 'skin_color': "روشن",
+        'top_size': "M", 'bottom_size': "38", 'price_range': "500 تا 800 روزی", 'city': "تهران", 'area': "ونک",
+    }
+    existing = Supplier(id=5, user_id=1, city="شیراز", gender="female", age=25, is_active=False)
+    session = AsyncMock()
+    session.add = MagicMock()
+    session.execute.return_value = MagicMock()
+    session.execute.return_value.scalar_one_or_none.return_value = existing
+
+    notify = AsyncMock()
+    dispatch = MagicMock()
+    monkeypatch.setattr(supplier_handlers, "get_or_create_user", AsyncMock(return_value=MagicMock(id=1)))
+    monkeypatch.setattr(supplier_handlers.identity_cache, "invalidate", AsyncMock())
+    monkeypatch.setattr(supplier_handlers, "notify_supplier_changed", notify)
+    monkeypatch.setattr(supplier_handlers, "dispatch_search_alerts", dispatch)
+
+    await supplier_handlers.process_confirmation(message, state, session)
+
+    session.commit.assert_awaited_once()
+    before, after = notify.await_args.args
+    assert before.id == 5
+    assert after is None
+    dispatch.assert_not_called()
+    assert existing.city == "تهران"
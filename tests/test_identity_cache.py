@@ -0,0 +1,79 @@
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from database.models import UserRole
+from utils.identity import Identity, IdentityCache, identity_query
+
+
+def identities(rows):
+    """پاسخ session جعلی: ردیف هویت telegram_id درخواستی"""
+    def respond(stmt, params):
+        telegram_id = stmt.compile().params["telegram_id_1"]
+        return [rows[telegram_id]] if telegram_id in rows else []
+    return respond
+
+
+class TestIdentityCache:
+    """تست‌های کش هویت کاربران"""
+
+    @pytest.mark.asyncio
+    async def test_lookup_is_cached(self, fake_session):
+        """تست خواندن از دیتابیس فقط در اولین جستجو"""
+        session = fake_session(respond=identities({100: (1, UserRole.DEMANDER, True, None, 7)}))
+        cache = IdentityCache(max_size=10, local_ttl=60, ttl=60)
+
+        first = await cache.get(session, 100)
+        second = await cache.get(session, "100")
+
+        assert first == second == Identity(1, UserRole.DEMANDER, True, None, 7)
+        assert first.is_demander and not first.is_supplier
+        assert len(session.statements) == 1
+
+    @pytest.mark.asyncio
+    async def test_unknown_user_is_not_cached(self, fake_session):
+        """تست عدم کش کاربر ثبت‌نام‌نکرده تا ثبت‌نام بعدی دیده شود"""
+        rows = {}
+        session = fake_session(respond=identities(rows))
+        cache = IdentityCache(max_size=10, local_ttl=60, ttl=60)
+
+        assert await cache.get(session, 5) is None
+        rows[5] = (2, UserRole.SUPPLIER, True, 3, None)
+        assert (await cache.get(session, 5)).supplier_id == 3
+
+    @pytest.mark.asyncio
+    async def test_invalidate_ttl_and_eviction(self, fake_session):
+        """تست invalidate، انقضای TTL و حذف قدیمی‌ترین ورودی LRU"""
+        rows = {
+            1: (1, UserRole.SUPPLIER, True, 1, None),
+            2: (2, UserRole.SUPPLIER, True, 2, None),
+            3: (3, UserRole.SUPPLIER, True, 3, None),
+        }
+        session = fake_session(respond=identities(rows))
+        cache = IdentityCache(max_size=2, local_ttl=60, ttl=60)
+
+        for telegram_id in (1, 2, 1, 3):
+            await cache.get(session, telegram_id)
+        assert len(session.statements) == 3
+        await cache.get(session, 2)  # حذف‌شده به عنوان قدیمی‌ترین
+        assert len(session.statements) == 4
+
+        rows[1] = (1, UserRole.SUPPLIER, False, 1, None)
+        await cache.invalidate(1)
+        assert (await cache.get(session, 1)).is_active is False
+
+        expired = IdentityCache(max_size=10, local_ttl=0, ttl=60)
+        await expired.get(session, 3)
+        await expired.get(session, 3)
+        assert expired.get_stats()["misses"] == 2
+
+    def test_role_column_reads_enum_labels(self):
+        """تست خواندن نقش identity_query از برچسب‌های دیتابیس ('demander') به UserRole"""
+        role = identity_query().selected_columns[1]
+        to_role = role.type.result_processor(postgresql.dialect(), None)
+        assert to_role("demander") is UserRole.DEMANDER
+        assert role.type.enums == ["supplier", "demander"]
+
+    def test_json_round_trip(self):
+        """تست ذخیره و بازیابی Identity در Redis"""
+        identity = Identity(1, UserRole.SUPPLIER, True, 4, None)
+        assert Identity.from_json(identity.to_json()) == identity
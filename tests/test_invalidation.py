@@ -0,0 +1,190 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock
+
+import pytest
+
+from redis.exceptions import ConnectionError
+
+from database.models import UserRole
+from search.events import notify_supplier_changed
+from search.index import SupplierDocument, SupplierIndex
+from utils.identity import Identity, IdentityCache
+from utils import invalidation
+from utils.invalidation import CHANNEL, IDENTITY, SUPPLIER, InvalidationBus
+
+
+def make_document(supplier_id: int, city: str = "تهران") -> SupplierDocument:
+    return SupplierDocument(supplier_id, city, "female", 25, 100.0, 200.0, frozenset(), frozenset(), "")
+
+
+class Worker:
+    """یک worker با ایندکس و کش هویت جدا که به Redis مشترک وصل است"""
+
+    def __init__(self, database: dict):
+        self.database = database
+        self.index = SupplierIndex()
+        self.index.ready = True
+        self.identities = IdentityCache(max_size=10, local_ttl=60, ttl=60)
+        self.bus = InvalidationBus(channel="test:invalidation")
+        self.bus.register(SUPPLIER, self.reload_supplier)
+        self.bus.register(IDENTITY, self.identities.forget_local)
+
+    async def reload_supplier(self, supplier_id: int):
+        if not self.index.ready:
+            return
+        document = self.database.get(supplier_id)
+        if document is None:
+            self.index.remove(supplier_id)
+        else:
+            self.index.upsert(document)
+
+    async def change_supplier(self, document: SupplierDocument):
+        """تغییر در همین worker و اعلام آن به بقیه"""
+        self.database[document.id] = document
+        self.index.upsert(document)
+        await self.bus.publish(SUPPLIER, document.id)
+
+
+async def eventually(predicate, timeout: float = 2):
+    async def poll():
+        while not predicate():
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(poll(), timeout)
+
+
+class TestInvalidationBus:
+    """تست همگام‌سازی حافظه workerها با Redis pub/sub"""
+
+    @pytest.mark.asyncio
+    async def test_change_reaches_other_worker(self, fake_redis):
+        """تست رسیدن تغییر تأمین‌کننده و invalidate هویت از یک worker به worker دیگر"""
+        database = {1: make_document(1)}
+        first, second = Worker(database), Worker(database)
+        for worker in (first, second):
+            worker.index.upsert(database[1])
+            worker.identities._put_local(100, Identity(1, UserRole.SUPPLIER, True, 1))
+            worker.bus.start()
+            await asyncio.wait_for(worker.bus.subscribed.wait(), 2)
+
+        try:
+            await first.change_supplier(make_document(1, city="شیراز"))
+            await eventually(lambda: second.index.get(1).city == "شیراز")
+
+            del database[1]
+            await second.bus.publish(SUPPLIER, 1)
+            await eventually(lambda: first.index.get(1) is None)
+
+            await first.bus.publish(IDENTITY, 100)
+            await eventually(lambda: 100 not in second.identities._local)
+        finally:
+            await first.bus.stop()
+            await second.bus.stop()
+
+        # هر worker پیام خودش را نادیده می‌گیرد
+        assert first.bus.stats["received"] == 1
+        assert second.bus.stats["received"] == 2
+        assert 100 in first.identities._local
+
+    @pytest.mark.asyncio
+    async def test_resync_after_reconnect(self, fake_redis, monkeypatch):
+        """تست بارگذاری کامل پس از اتصال دوباره (پیام‌های از دست رفته)"""
+        monkeypatch.setattr(invalidation, "RECONNECT_DELAY", 0)
+        pubsub = fake_redis.pubsub
+        failures = [ConnectionError("connection lost")]
+
+        def flaky_pubsub():
+            channel = pubsub()
+            if failures:
+                channel.subscribe = AsyncMock(side_effect=failures.pop())
+            return channel
+        monkeypatch.setattr(fake_redis, "pubsub", flaky_pubsub)
+
+        bus = InvalidationBus(channel="test:invalidation")
+        resyncs = []
+
+        async def resync():
+            resyncs.append(True)
+        bus.register(SUPPLIER, AsyncMock(), resync=resync)
+
+        bus.start()
+        try:
+            await asyncio.wait_for(bus.subscribed.wait(), 2)
+            await eventually(lambda: resyncs == [True])
+        finally:
+            await bus.stop()
+        assert bus.stats["resyncs"] == 1
+
+    @pytest.mark.asyncio
+    async def test_changes_during_load_are_replayed(self, fake_redis):
+        """تست نگه داشتن تغییرات رسیده در حین بارگذاری اولیه و اعمال آن‌ها پس از آن"""
+        database = {1: make_document(1)}
+        loader, writer = Worker(database), Worker(database)
+        loader.index.ready = False
+        for worker in (loader, writer):
+            worker.bus.start()
+            await worker.bus.wait_subscribed()
+
+        try:
+            async with loader.bus.loading(SUPPLIER):
+                # کوئری بارگذاری پیش از این تغییر اجرا شده است
+                snapshot = dict(database)
+                await writer.change_supplier(make_document(2))
+                await eventually(lambda: loader.bus.stats["received"] == 1)
+                assert loader.index.get(2) is None
+                for document in snapshot.values():
+                    loader.index.upsert(document)
+                loader.index.ready = True
+            assert loader.index.get(2) is not None
+
+            await writer.change_supplier(make_document(3))
+            await eventually(lambda: loader.index.get(3) is not None)
+        finally:
+            await loader.bus.stop()
+            await writer.bus.stop()
+
+    @pytest.mark.asyncio
+    async def test_wait_subscribed_without_redis(self):
+        """تست اینکه بدون Redis (یک پروسه) startup منتظر subscribe نماند"""
+        bus = InvalidationBus(channel="test:invalidation")
+        bus.start()
+        await bus.wait_subscribed(timeout=0.1)
+        assert not bus.subscribed.is_set()
+
+    @pytest.mark.asyncio
+    async def test_supplier_change_is_published(self, fake_redis):
+        """تست انتشار شناسه تأمین‌کننده تغییرکرده برای workerهای دیگر"""
+        pubsub = fake_redis.pubsub()
+        await pubsub.subscribe(CHANNEL)
+        await pubsub.get_message(timeout=1)
+
+        await notify_supplier_changed(make_document(7), None)
+
+        message = await pubsub.get_message(timeout=1)
+        payload = json.loads(message["data"])
+        assert payload["kind"] == SUPPLIER
+        assert payload["id"] == 7
+        await pubsub.aclose()
+
+    @pytest.mark.asyncio
+    async def test_index_reload(self, fake_session):
+        """تست reload یک تأمین‌کننده: به‌روزرسانی در صورت وجود و حذف برای غیرفعال/حذف‌شده"""
+        index = SupplierIndex()
+        index.upsert(make_document(3))
+
+        class Row:
+            id = 3
+            city = "اصفهان"
+            gender = "male"
+            age = 30
+            price_range_min = price_range_max = None
+            work_styles = cooperation_types = []
+            special_features = hair_color = eye_color = None
+
+        session = fake_session([Row()])
+        await index.reload(session, 3)
+        assert index.get(3).city == "اصفهان"
+        assert "suppliers.is_active = true" in session.sql[0]
+
+        await index.reload(fake_session(), 3)
+        assert index.get(3) is None
@@ -0,0 +1,156 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from aiogram.exceptions import TelegramForbiddenError, TelegramServerError
+from aiogram.methods import SendMessage
+from sqlalchemy.dialects import postgresql
+
+from database.models import NotificationMode, RequestStatus
+from utils.notifications import (
+    NEW_REQUEST, NEW_REQUEST_DIGEST, REQUEST_REJECTED, deliver_notification, queue_request_response,
+    queue_supplier_new_request,
+)
+from utils.outbox import DEAD, SENT, OutboxDispatcher, from_payload, retry_delay, to_payload
+from utils.requests import CreatedRequest, RequestTransition
+
+CREATED = CreatedRequest(7, datetime(2024, 3, 1, 10, 30), "سلام", 100, "سارا", None, "0912")
+DIGEST_CREATED = CreatedRequest(8, datetime(2024, 3, 1, 10, 45), "برای تبلیغ", 100, "نگار", "استودیو", None, NotificationMode.DIGEST)
+TRANSITION = RequestTransition(7, RequestStatus.REJECTED, "وقت ندارم", 200, "مینا", None, "تهران", "شمال", None)
+
+
+def claim_rows(rows):
+    """پاسخ session جعلی: ردیف‌های داده‌شده فقط برای UPDATE ... RETURNING"""
+    return lambda stmt, params: rows if "RETURNING" in str(stmt.compile(dialect=postgresql.dialect())) else []
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, **kwargs):
+        self.sent.append(kwargs)
+
+
+class TestNotificationOutbox:
+    """تست‌های صف پایدار اعلان‌ها"""
+
+    def test_payload_round_trip(self):
+        """تست ذخیره و بازسازی datetime و enum در payload"""
+        assert to_payload(CREATED)["created_at"] == "2024-03-01T10:30:00"
+        assert to_payload(TRANSITION)["status"] == "rejected"
+        assert from_payload(CreatedRequest, to_payload(CREATED)) == CREATED
+        assert from_payload(RequestTransition, to_payload(TRANSITION)) == TRANSITION
+
+    @pytest.mark.asyncio
+    async def test_enqueue_in_caller_transaction(self, fake_session):
+        """تست اینکه ثبت اعلان فقط یک INSERT در session فراخوانی‌کننده باشد و commit نکند"""
+        session = fake_session()
+        await queue_supplier_new_request(session, CREATED)
+        await queue_request_response(session, TRANSITION)
+
+        assert session.commits == 0
+        params = [stmt.compile().params for stmt in session.statements]
+        assert [(p["kind"], p["chat_id"]) for p in params] == [(NEW_REQUEST, 100), (REQUEST_REJECTED, 200)]
+        assert all(sql.startswith("INSERT INTO notification_outbox") for sql in session.sql)
+
+    @pytest.mark.asyncio
+    async def test_deliver_renders_message(self):
+        """تست ساخت متن و کیبورد از payload"""
+        bot = FakeBot()
+        await deliver_notification(bot, NEW_REQUEST, 100, to_payload(CREATED))
+        assert bot.sent[0]["chat_id"] == 100
+        assert "سارا" in bot.sent[0]["text"] and "2024/03/01 10:30" in bot.sent[0]["text"]
+        assert bot.sent[0]["reply_markup"] is not None
+
+    @pytest.mark.asyncio
+    async def test_dispatcher_ack_retry_and_dead_letter(self, fake_session):
+        """تست ack ارسال موفق، تلاش مجدد خطای موقت و dead-letter خطای دائمی یا تلاش آخر"""
+        method = SendMessage(chat_id=1, text="x")
+        outcomes = {
+            1: None,
+            2: TelegramServerError(method, "Bad Gateway"),
+            3: TelegramForbiddenError(method, "bot was blocked by the user"),
+            4: TelegramServerError(method, "Bad Gateway"),
+        }
+        rows = [
+            SimpleNamespace(id=row_id, kind=NEW_REQUEST, chat_id=row_id, payload={}, attempts=8 if row_id == 4 else 1)
+            for row_id in outcomes
+        ]
+        session = fake_session(respond=claim_rows(rows))
+
+        async def deliver(bot, kind, chat_id, payload):
+            if outcomes[chat_id] is not None:
+                raise outcomes[chat_id]
+
+        dispatcher = OutboxDispatcher(deliver, session_factory=lambda: session, batch_size=10, max_attempts=8)
+        assert await dispatcher.run_once(None) == 4
+
+        claim, *updates = session.sql
+        assert "FOR UPDATE SKIP LOCKED" in claim and "RETURNING" in claim
+        assert "attempts=(notification_outbox.attempts + " in claim
+        assert session.commits == 2
+
+        values = [stmt.compile().params for stmt in session.statements[1:]]
+        assert values[0]["status"] == SENT
+        assert "status" not in values[1] and "TelegramServerError" in values[1]["last_error"]
+        assert values[2]["status"] == DEAD and values[3]["status"] == DEAD
+        assert dispatcher.get_stats() == {"claimed": 4, "sent": 1, "retried": 1, "dead": 2}
+
+    def test_retry_delay(self):
+        """تست تأخیر نمایی با سقف"""
+        assert [retry_delay(attempts) for attempts in (1, 2, 3)] == [5, 10, 20]
+        assert retry_delay(30) == 3600
+
+    def test_payload_missing_field_uses_default(self):
+        """تست اینکه payload ثبت‌شده پیش از افزودن یک فیلد مقدار پیش‌فرض آن را بگیرد"""
+        payload = to_payload(CREATED)
+        del payload["supplier_notification_mode"]
+        assert from_payload(CreatedRequest, payload).supplier_notification_mode == NotificationMode.IMMEDIATE
+
+    @pytest.mark.asyncio
+    async def test_digest_joins_open_batch(self, fake_session):
+        """تست اینکه اعلان حالت خلاصه زمان خلاصه باز همان چت یا پایان پنجره را بگیرد"""
+        session = fake_session()
+        await queue_supplier_new_request(session, DIGEST_CREATED)
+
+        query = session.sql[0]
+        assert session.statements[0].compile().params["kind"] == NEW_REQUEST_DIGEST
+        assert "coalesce((SELECT min(notification_outbox.available_at)" in query
+        assert "notification_outbox.status = 'pending'" in query and "notification_outbox.attempts = " in query
+
+    @pytest.mark.asyncio
+    async def test_dispatcher_merges_batch_kinds(self, fake_session):
+        """تست ارسال یک پیام برای ردیف‌های خلاصه یک چت و ارسال جداگانه بقیه"""
+        rows = [
+            SimpleNamespace(id=1, kind=NEW_REQUEST_DIGEST, chat_id=100, payload={"n": 1}, attempts=1),
+            SimpleNamespace(id=2, kind=NEW_REQUEST, chat_id=100, payload={"n": 2}, attempts=1),
+            SimpleNamespace(id=3, kind=NEW_REQUEST_DIGEST, chat_id=100, payload={"n": 3}, attempts=1),
+            SimpleNamespace(id=4, kind=NEW_REQUEST_DIGEST, chat_id=200, payload={"n": 4}, attempts=1),
+        ]
+        session = fake_session(respond=claim_rows(rows))
+        calls = []
+
+        async def deliver(bot, kind, chat_id, payload):
+            calls.append((kind, chat_id, payload))
+
+        dispatcher = OutboxDispatcher(deliver, session_factory=lambda: session, batch_kinds={NEW_REQUEST_DIGEST})
+        assert await dispatcher.run_once(None) == 4
+        assert calls == [
+            (NEW_REQUEST_DIGEST, 100, [{"n": 1}, {"n": 3}]),
+            (NEW_REQUEST, 100, {"n": 2}),
+            (NEW_REQUEST_DIGEST, 200, [{"n": 4}]),
+        ]
+        assert dispatcher.get_stats()["sent"] == 4
+
+    @pytest.mark.asyncio
+    async def test_deliver_digest(self):
+        """تست یک پیام خلاصه با دکمه درخواست‌های دریافتی و اعلان عادی برای یک درخواست"""
+        bot = FakeBot()
+        await deliver_notification(bot, NEW_REQUEST_DIGEST, 100, [to_payload(CREATED), to_payload(DIGEST_CREATED)])
+        await deliver_notification(bot, NEW_REQUEST_DIGEST, 100, [to_payload(DIGEST_CREATED)])
+
+        digest, single = bot.sent
+        assert "2 درخواست جدید" in digest["text"] and "نگار (استودیو)" in digest["text"]
+        assert digest["reply_markup"].inline_keyboard[0][0].callback_data == "inbox:page:1"
+        assert single["reply_markup"].inline_keyboard[0][0].callback_data == "accept_request:8"
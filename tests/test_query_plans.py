@@ -0,0 +1,70 @@
+import os
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from benchmarks.plans import PlanCase, check_case, hot_queries, main, summarize_plan
+
+# خروجی EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) برای inbox بدون ایندکس ترکیبی
+INBOX_WITHOUT_COMPOSITE = [{
+    "Plan": {
+        "Node Type": "Limit", "Actual Rows": 10, "Shared Hit Blocks": 120, "Shared Read Blocks": 30,
+        "Plans": [{
+            "Node Type": "Sort", "Sort Key": ["requests.created_at DESC", "requests.id DESC"], "Actual Rows": 10,
+            "Plans": [{
+                "Node Type": "Index Scan", "Index Name": "ix_requests_status", "Relation Name": "requests",
+                "Filter": "(supplier_id = 1)", "Rows Removed by Filter": 5000, "Actual Rows": 40,
+            }, {
+                "Node Type": "Seq Scan", "Relation Name": "demanders", "Filter": "(full_name IS NOT NULL)",
+            }],
+        }],
+    },
+    "Planning Time": 0.2,
+    "Execution Time": 4.5,
+}]
+
+
+class TestQueryPlans:
+    """تست‌های تحلیل پلن کوئری‌های پرتکرار"""
+
+    def test_summarize_plan(self):
+        """تست استخراج ایندکس‌ها، Seq Scanها، بافرها و زمان‌ها"""
+        summary = summarize_plan(INBOX_WITHOUT_COMPOSITE)
+        assert summary["indexes"] == ["ix_requests_status"]
+        assert summary["seq_scans"] == ["demanders"]
+        assert (summary["shared_hit"], summary["shared_read"]) == (120, 30)
+        assert (summary["planning_ms"], summary["execution_ms"]) == (0.2, 4.5)
+
+    def test_missing_composite_index_hints(self):
+        """تست گزارش Sort و فیلتر پرهزینه پس از ایندکس"""
+        hints = summarize_plan(INBOX_WITHOUT_COMPOSITE)["hints"]
+        assert any(hint.startswith("sort on (requests.created_at DESC, requests.id DESC) over requests") for hint in hints)
+        assert any("ix_requests_status" in hint and "supplier_id = 1" in hint for hint in hints)
+        assert any(hint.startswith("seq scan on demanders") for hint in hints)
+
+    def test_check_case(self):
+        """تست خطای ایندکس استفاده‌نشده، Seq Scan ممنوع و کندتر شدن نسبت به baseline"""
+        summary = summarize_plan(INBOX_WITHOUT_COMPOSITE)
+        case = PlanCase("inbox", lambda size: None, ("ix_requests_supplier_status_created",), ("demanders",))
+        failures = check_case(case, summary)
+        assert len(failures) == 2
+        assert "ix_requests_supplier_status_created" in failures[0]
+
+        baseline = {**summary, "execution_ms": 1.0, "shared_hit": 20, "shared_read": 0, "indexes": ["ix_requests_status"]}
+        failures = check_case(PlanCase("inbox", lambda size: None), summary, baseline)
+        assert [failure.split(":")[1].split()[0] for failure in failures] == ["execution", "150"]
+        assert check_case(PlanCase("inbox", lambda size: None), summary, summary) == []
+
+    def test_hot_queries_render(self):
+        """تست اینکه همه کوئری‌ها با مقادیر literal قابل EXPLAIN باشند"""
+        cases = hot_queries()
+        assert len({case.name for case in cases}) == len(cases)
+        for case in cases:
+            sql = str(case.build(1000).compile(dialect=postgresql.asyncpg.dialect(), compile_kwargs={"literal_binds": True}))
+            assert sql.startswith("SELECT")
+            assert "$" not in sql
+
+    @pytest.mark.skipif(not os.getenv("BENCH_DATABASE_URL"), reason="needs a throwaway PostgreSQL (BENCH_DATABASE_URL)")
+    def test_plans_against_database(self):
+        """اجرای کامل روی دیتابیس محلی (دیتابیس پاک می‌شود)"""
+        assert main(["--reuse"]) == 0
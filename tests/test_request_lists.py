@@ -0,0 +1,60 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from database.models import RequestStatus
+from utils.requests import MESSAGE_PREVIEW_LENGTH, list_demander_outbox, list_supplier_inbox
+
+
+def paged(rows, page_size=10):
+    """پاسخ session جعلی: ردیف‌های صفحه درخواستی (OFFSET) از میان ردیف‌های داده‌شده"""
+    def respond(stmt, params):
+        offset = stmt.compile().params["param_2"]
+        return rows[offset:offset + page_size]
+    return respond
+
+
+def make_row(request_id, message="سلام", name="سارا"):
+    return SimpleNamespace(
+        id=request_id, status=RequestStatus.PENDING, created_at=datetime(2024, 3, 1, 10, 0),
+        counterpart_name=name, message_preview=message[:MESSAGE_PREVIEW_LENGTH + 1],
+        response_preview=None, total=25,
+    )
+
+
+class TestRequestLists:
+    """تست‌های لیست درخواست‌های دریافتی و ارسالی"""
+
+    @pytest.mark.asyncio
+    async def test_single_joined_statement(self, fake_session):
+        """تست اینکه نام طرف مقابل و تعداد کل در همان یک کوئری خوانده شود"""
+        session = fake_session(respond=paged([make_row(i) for i in range(25)]))
+        page = await list_supplier_inbox(session, supplier_id=3, page=2)
+
+        assert len(session.statements) == 1
+        sql = str(session.statements[0])
+        assert "JOIN demanders" in sql and "count(*) OVER ()" in sql
+        # فقط ستون‌های لازم و پیش‌نمایش پیام، نه کل ردیف
+        assert sql.startswith("SELECT requests.id, requests.status, requests.created_at, demanders.full_name AS counterpart_name, left(")
+        assert [item.id for item in page.items] == list(range(10, 20))
+        assert (page.page, page.total, page.total_pages) == (2, 25, 3)
+
+    @pytest.mark.asyncio
+    async def test_stale_page_falls_back_to_first(self, fake_session):
+        """تست بازگشت به صفحه اول وقتی صفحه درخواستی دیگر وجود ندارد"""
+        session = fake_session(respond=paged([make_row(i) for i in range(3)]))
+        page = await list_demander_outbox(session, demander_id=1, page=4)
+
+        assert len(session.statements) == 2
+        assert "JOIN suppliers" in str(session.statements[0])
+        assert page.page == 1 and len(page.items) == 3
+
+    @pytest.mark.asyncio
+    async def test_message_preview_truncation(self, fake_session):
+        """تست علامت‌گذاری پیام‌های بلندتر از پیش‌نمایش"""
+        session = fake_session(respond=paged([make_row(1, "الف" * 300), make_row(2, "کوتاه")]))
+        items = (await list_supplier_inbox(session, supplier_id=3)).items
+
+        assert len(items[0].message_preview) == MESSAGE_PREVIEW_LENGTH and items[0].message_truncated
+        assert items[1].message_preview == "کوتاه" and not items[1].message_truncated
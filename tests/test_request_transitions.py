@@ -0,0 +1,106 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from database.models import RequestStatus
+from middlewares.idempotency import IDEMPOTENT, IdempotencyKeys, IdempotencyMiddleware
+from utils.requests import create_request, transition_request
+
+
+def callback(callback_id: str, user_id: int = 7, data: str = "accept_request:5"):
+    return SimpleNamespace(id=callback_id, from_user=SimpleNamespace(id=user_id), data=data, answer=AsyncMock())
+
+
+class TestRequestTransitions:
+    """تست‌های ثبت و تغییر وضعیت اتمیک درخواست‌ها"""
+
+    @pytest.mark.asyncio
+    async def test_create_is_single_insert_on_conflict(self, fake_session):
+        """تست ثبت درخواست با یک INSERT ... ON CONFLICT DO NOTHING روی ایندکس جزئی"""
+        session = fake_session()
+        assert await create_request(session, 1, 2, "سلام") is None
+
+        assert len(session.sql) == 1
+        sql = session.sql[0]
+        assert "ON CONFLICT (demander_id, supplier_id) WHERE status = 'pending' DO NOTHING" in sql
+        assert sql.startswith("WITH inserted AS")
+
+    @pytest.mark.asyncio
+    async def test_transition_only_from_pending(self, fake_session):
+        """تست اینکه پذیرش/رد فقط روی درخواست در انتظار همان تأمین‌کننده اعمال شود"""
+        session = fake_session([(5, RequestStatus.ACCEPTED, None, 100, "سارا", "0912", "تهران", "شمال", None)])
+        transition = await transition_request(session, 5, 2, RequestStatus.ACCEPTED)
+
+        sql = session.sql[0]
+        assert "UPDATE requests SET status=" in sql and "RETURNING" in sql
+        assert "requests.supplier_id = " in sql and "requests.status = " in sql
+        assert transition.demander_telegram_id == 100 and transition.status == RequestStatus.ACCEPTED
+
+        assert await transition_request(fake_session(), 5, 2, RequestStatus.REJECTED) is None
+
+    @pytest.mark.asyncio
+    async def test_duplicate_callbacks_are_dropped(self):
+        """تست نادیده گرفتن callback تکراری فقط برای هندلرهای IDEMPOTENT"""
+        middleware = IdempotencyMiddleware(IdempotencyKeys(ttl=60))
+        calls = []
+
+        async def handler(event, data):
+            calls.append(event.id)
+            return "ok"
+
+        flagged = {"handler": SimpleNamespace(flags=IDEMPOTENT)}
+        plain = {"handler": SimpleNamespace(flags={})}
+        event = callback("cb-1")
+
+        assert await middleware(handler, event, flagged) == "ok"
+        event.answer.assert_not_awaited()
+        assert await middleware(handler, event, flagged) is None
+        event.answer.assert_awaited_once_with()
+        assert await middleware(handler, event, plain) == "ok"
+        assert await middleware(handler, callback("cb-2", data="reject_request:5"), flagged) == "ok"
+        assert calls == ["cb-1", "cb-1", "cb-2"]
+
+    @pytest.mark.asyncio
+    async def test_double_tap_is_dropped(self):
+        """تست نادیده گرفتن دو بار زدن یک دکمه (callback جدید با همان کاربر و داده) در پنجره کوتاه"""
+        keys = IdempotencyKeys(ttl=60)
+        middleware = IdempotencyMiddleware(keys, tap_ttl=5)
+        flagged = {"handler": SimpleNamespace(flags=IDEMPOTENT)}
+
+        async def handler(event, data):
+            return "ok"
+
+        assert await middleware(handler, callback("cb-4"), flagged) == "ok"
+        second = callback("cb-5")
+        assert await middleware(handler, second, flagged) is None
+        second.answer.assert_awaited_once_with()
+        assert await middleware(handler, callback("cb-6", user_id=8), flagged) == "ok"
+
+        # پس از پنجره کوتاه همان دکمه دوباره پردازش می‌شود
+        keys._local["tap:7:accept_request:5"] = 0
+        assert await middleware(handler, callback("cb-7"), flagged) == "ok"
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("with_redis", [False, True])
+    async def test_failed_callback_can_be_retried(self, with_redis, request):
+        """تست آزاد شدن کلید وقتی هندلر خطا می‌دهد (در حافظه و در Redis)"""
+        redis = request.getfixturevalue("fake_redis") if with_redis else None
+        middleware = IdempotencyMiddleware(IdempotencyKeys(ttl=60))
+        flagged = {"handler": SimpleNamespace(flags=IDEMPOTENT)}
+        event = callback("cb-3")
+
+        async def failing(event, data):
+            raise RuntimeError("database unavailable")
+
+        async def handler(event, data):
+            return "ok"
+
+        with pytest.raises(RuntimeError):
+            await middleware(failing, event, flagged)
+        if redis is not None:
+            assert await redis.exists("idempotency:callback:cb-3", "idempotency:tap:7:accept_request:5") == 0
+
+        assert await middleware(handler, event, flagged) == "ok"
+        assert await middleware(handler, event, flagged) is None
+        event.answer.assert_awaited_once_with()
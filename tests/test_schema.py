@@ -0,0 +1,54 @@
+import pytest
+
+from database.schema import SchemaVersionError, check_schema_version, get_expected_heads
+
+
+class FakeConnection:
+    def __init__(self, revisions):
+        self.revisions = revisions
+
+    async def scalar(self, stmt):
+        return 'alembic_version' if self.revisions is not None else None
+
+    async def execute(self, stmt):
+        return [(revision,) for revision in self.revisions]
+
+
+class FakeEngine:
+    """engine ساده که فقط نسخه‌های alembic_version را برمی‌گرداند"""
+
+    def __init__(self, revisions):
+        self.revisions = revisions
+
+    def connect(self):
+        engine = self
+
+        class Context:
+            async def __aenter__(self):
+                return FakeConnection(engine.revisions)
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return Context()
+
+
+class TestSchemaVersion:
+    """تست‌های بررسی نسخه schema هنگام شروع"""
+
+    def test_single_head(self):
+        """تست خطی بودن زنجیره migrationها"""
+        assert len(get_expected_heads()) == 1
+
+    @pytest.mark.asyncio
+    async def test_matching_version(self):
+        """تست شروع عادی وقتی دیتابیس روی head است"""
+        await check_schema_version(FakeEngine(list(get_expected_heads())))
+
+    @pytest.mark.asyncio
+    async def test_outdated_or_missing_version(self):
+        """تست توقف شروع وقتی migration اعمال نشده است"""
+        with pytest.raises(SchemaVersionError, match="--migrate"):
+            await check_schema_version(FakeEngine(['001']))
+        with pytest.raises(SchemaVersionError, match="no revision"):
+            await check_schema_version(FakeEngine(None))
@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+from search.alerts import SavedSearchIndex, SavedQuery
+from search.index import SupplierDocument
+
+
+def make_doc(id, city="تهران", gender="زن", age=25, styles=("fashion",)):
+    return SupplierDocument.from_supplier(SimpleNamespace(
+        id=id, city=city, gender=gender, age=age,
+        price_range_min=500000, price_range_max=800000,
+        work_styles=list(styles), cooperation_types=["in_person"],
+        special_features=None, hair_color=None, eye_color=None,
+    ))
+
+
+def build_index(*queries):
+    index = SavedSearchIndex()
+    for query_id, demander_id, criteria in queries:
+        index.add(SavedQuery(query_id, demander_id, str(demander_id), criteria))
+    index.ready = True
+    return index
+
+
+class TestSavedSearchIndex:
+    """تست‌های ایندکس معکوس جستجوهای ذخیره‌شده"""
+
+    def test_match(self):
+        """تست تطبیق تأمین‌کننده با جستجوهای ذخیره‌شده"""
+        index = build_index(
+            (1, 10, {'search_city': 'تهران', 'search_gender': 'زن'}),
+            (2, 11, {'search_city': 'کرج'}),
+            (3, 12, {'search_work_styles': ['sports', 'fashion']}),
+            (4, 13, {'search_city': 'طهران', 'search_age_range': [30, 40]}),
+            (5, 14, {'search_price_range': [2000000, float('inf')]}),
+        )
+
+        assert [query.id for query in index.match(make_doc(1))] == [1, 3]
+        assert [query.id for query in index.match(make_doc(2, age=35, styles=("studio",)))] == [1, 4]
+        assert [query.id for query in index.match(make_doc(3, city="کرج", gender="مرد"))] == [2, 3]
+
+    def test_new_matches_only_on_transition(self):
+        """تست اعلان فقط برای جستجوهایی که تازه منطبق شده‌اند، یکی برای هر درخواست‌کننده"""
+        index = build_index(
+            (1, 10, {'search_city': 'تهران'}),
+            (2, 10, {'search_work_styles': ['studio']}),
+            (3, 11, {'search_city': 'تهران', 'search_work_styles': ['studio']}),
+        )
+        before = make_doc(1)
+        after = make_doc(1, styles=("fashion", "studio"))
+
+        assert [query.id for query in index.new_matches(None, after)] == [1, 3]
+        assert [query.id for query in index.new_matches(before, after)] == [2, 3]
+        assert index.new_matches(after, after) == []
+
+    def test_remove(self):
+        """تست حذف جستجوی ذخیره‌شده از ایندکس"""
+        index = build_index((1, 10, {'search_city': 'تهران'}), (2, 11, {}))
+        index.remove(1)
+
+        assert [query.id for query in index.match(make_doc(1))] == [2]
+        assert len(index) == 1
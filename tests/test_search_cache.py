@@ -0,0 +1,204 @@
+from types import SimpleNamespace
+
+import pytest
+
+from handlers.demander import count_search_results, fetch_search_page
+from search.cache import CITY_REGISTRY_KEY, SearchResultCache, canonical_criteria, criteria_hash
+from search.cursor import CURRENT, NEXT, PREVIOUS
+from search.index import SupplierDocument
+
+
+def make_document(supplier_id: int, city: str, gender: str = "female") -> SupplierDocument:
+    return SupplierDocument(supplier_id, city, gender, 25, 100.0, 200.0, frozenset(), frozenset(), "")
+
+
+class TestSearchCacheKeys:
+    """تست‌های کلید کش نتایج جستجو"""
+
+    def test_equivalent_criteria_share_key(self):
+        """تست یکسان بودن کلید برای فیلترهای معادل"""
+        first = {
+            'search_city': ' تهران ', 'search_gender': 'زن', 'search_age_range': (20, 30),
+            'search_work_styles': ['studio', 'fashion'], 'search_price_range': None,
+            'search_special_features': None, 'selected_search_styles': ['studio'],
+        }
+        second = {
+            'search_city': 'تهران', 'search_gender': 'زن', 'search_age_range': [20, 30],
+            'search_work_styles': ['fashion', 'studio'],
+        }
+        assert criteria_hash(canonical_criteria(first)) == criteria_hash(canonical_criteria(second))
+
+    def test_different_criteria_differ(self):
+        """تست متفاوت بودن کلید برای فیلترهای متفاوت"""
+        first = canonical_criteria({'search_city': 'تهران', 'search_price_range': [2000000, float('inf')]})
+        second = canonical_criteria({'search_city': 'تهران', 'search_price_range': [1000000, 2000000]})
+        assert criteria_hash(first) != criteria_hash(second)
+
+
+class TestSearchCacheConsistency:
+    """تست‌های هم‌زمانی store و invalidate روی Redis جعلی"""
+
+    @pytest.mark.asyncio
+    async def test_store_after_concurrent_invalidate_is_dropped(self, fake_redis):
+        """تست نوشته نشدن نتیجه‌ای که پیش از invalidate از دیتابیس خوانده شده"""
+        cache = SearchResultCache(ttl=60)
+        criteria = {'search_city': 'تهران'}
+
+        generation = await cache.generation(criteria)
+        await cache.invalidate(None, make_document(1, 'تهران'))
+        await cache.store(criteria, [(0.0, 2)], generation)
+        assert await cache.get_count(criteria) is None
+
+        await cache.store(criteria, [(0.0, 1), (0.0, 2)], await cache.generation(criteria))
+        assert await cache.get_count(criteria) == 2
+
+    @pytest.mark.asyncio
+    async def test_invalidate_of_other_city_keeps_store(self, fake_redis):
+        """تست اینکه تغییر در شهر دیگر نسل این شهر را عوض نمی‌کند"""
+        cache = SearchResultCache(ttl=60)
+        criteria = {'search_city': 'تهران'}
+
+        generation = await cache.generation(criteria)
+        await cache.invalidate(None, make_document(1, 'شیراز'))
+        await cache.store(criteria, [(0.0, 2)], generation)
+        assert await cache.get_count(criteria) == 1
+
+    @pytest.mark.asyncio
+    async def test_tags_expire(self, fake_redis):
+        """تست TTL برچسب‌های شهر و فهرست شهرها"""
+        cache = SearchResultCache(ttl=60)
+        await cache.store({'search_city': 'تهران'}, [(0.0, 1)], 0)
+
+        assert 0 < await fake_redis.ttl(CITY_REGISTRY_KEY) <= 60
+        assert 0 < await fake_redis.ttl(cache._tag_key('تهران')) <= 60
+
+
+class TestSearchResultCache:
+    """تست‌های رفتاری کش نتایج جستجو روی Redis جعلی"""
+
+    @pytest.mark.asyncio
+    async def test_store_and_read_pages(self, fake_redis):
+        """تست خواندن تعداد و صفحه‌ها با keyset از ورودی ذخیره‌شده"""
+        cache = SearchResultCache(ttl=60)
+        criteria = {'search_city': 'تهران', 'search_gender': 'female'}
+        keys = [(3.0, 7), (2.0, 4), (2.0, 9), (1.0, 1), (0.0, 5)]
+
+        assert await cache.get_count(criteria) is None
+        assert await cache.get_page(criteria, None, NEXT, 2) is None
+
+        await cache.store(criteria, keys, await cache.generation(criteria))
+        assert await cache.get_count(criteria) == 5
+        assert await cache.get_page(criteria, None, NEXT, 2) == keys[:2]
+        assert await cache.get_page(criteria, keys[1], NEXT, 2) == keys[2:4]
+        assert await cache.get_page(criteria, keys[3], PREVIOUS, 2) == keys[1:3]
+        assert await cache.get_page(criteria, keys[2], CURRENT, 2) == keys[2:4]
+        # anchorی که در لیست کش‌شده نیست (مثلاً پس از ابطال) به دیتابیس برمی‌گردد
+        assert await cache.get_page(criteria, (9.0, 99), NEXT, 2) is None
+
+        stats = await cache.get_stats()
+        # هم تعداد و هم صفحه‌ها در آمار hit/miss شمرده می‌شوند
+        assert (stats["hits"], stats["misses"]) == (5, 3)
+        assert (stats["local_hits"], stats["local_misses"]) == (5, 3)
+
+    @pytest.mark.asyncio
+    async def test_empty_result_is_cached(self, fake_redis):
+        """تست نتیجه خالی: تعداد از کش خوانده می‌شود و چون کلید ids ندارد صفحه از دیتابیس"""
+        cache = SearchResultCache(ttl=60)
+        criteria = {'search_city': 'یزد'}
+
+        await cache.store(criteria, [], 0)
+        assert await cache.get_count(criteria) == 0
+        assert await cache.get_page(criteria, None, NEXT, 5) is None
+
+    @pytest.mark.asyncio
+    async def test_invalidate_selects_tags_by_city_prefix(self, fake_redis):
+        """تست بررسی فقط برچسب‌های شهرهای منطبق (پیشوند) و جستجوهای بدون شهر"""
+        cache = SearchResultCache(ttl=60)
+        searches = {
+            'tehran': {'search_city': 'تهران'},
+            'prefix': {'search_city': 'ته'},
+            'anywhere': {'search_gender': 'female'},
+            'shiraz': {'search_city': 'شیراز'},
+        }
+        for criteria in searches.values():
+            await cache.store(criteria, [(0.0, 1)], 0)
+
+        await cache.invalidate(None, make_document(2, 'تهران'))
+
+        for name in ('tehran', 'prefix', 'anywhere'):
+            assert await cache.get_count(searches[name]) is None, name
+        assert await cache.get_count(searches['shiraz']) == 1
+        assert await fake_redis.smembers(cache._tag_key('تهران')) == set()
+
+    @pytest.mark.asyncio
+    async def test_invalidate_checks_before_and_after(self, fake_redis):
+        """تست ابطال ورودی‌هایی که تأمین‌کننده قبل یا بعد از تغییر در آن‌ها صدق می‌کند و حفظ بقیه"""
+        cache = SearchResultCache(ttl=60)
+        female = {'search_city': 'تهران', 'search_gender': 'female'}
+        male = {'search_city': 'تهران', 'search_gender': 'male'}
+        other = {'search_city': 'تهران', 'search_gender': 'other'}
+        for criteria in (female, male, other):
+            await cache.store(criteria, [(0.0, 1)], 0)
+
+        # تغییر جنسیت: female (قبل) و male (بعد) باطل می‌شوند
+        await cache.invalidate(make_document(3, 'تهران', 'female'), make_document(3, 'تهران', 'male'))
+
+        assert await cache.get_count(female) is None
+        assert await cache.get_count(male) is None
+        assert await cache.get_count(other) == 1
+        assert {member.decode() for member in await fake_redis.smembers(cache._tag_key('تهران'))} == {
+            criteria_hash(canonical_criteria(other))
+        }
+
+    @pytest.mark.asyncio
+    async def test_invalidate_clears_tags_of_expired_entries(self, fake_redis):
+        """تست پاک شدن برچسب ورودی‌هایی که meta آن‌ها منقضی شده"""
+        cache = SearchResultCache(ttl=60)
+        criteria = {'search_city': 'تهران', 'search_gender': 'male'}
+        await cache.store(criteria, [(0.0, 1)], 0)
+        digest = criteria_hash(canonical_criteria(criteria))
+        await fake_redis.delete(cache._meta_key(digest), cache._ids_key(digest))
+
+        await cache.invalidate(make_document(4, 'تهران', 'female'), None)
+
+        assert await fake_redis.smembers(cache._tag_key('تهران')) == set()
+
+    @pytest.mark.asyncio
+    async def test_without_redis_is_noop(self):
+        """تست بی‌اثر بودن کش بدون REDIS_URL"""
+        cache = SearchResultCache(ttl=60)
+        criteria = {'search_city': 'تهران'}
+        await cache.store(criteria, [(0.0, 1)], 0)
+        assert await cache.get_count(criteria) is None
+        assert await cache.get_page(criteria, None, NEXT, 5) is None
+        await cache.invalidate(None, make_document(1, 'تهران'))
+
+
+class TestSearchCachePath:
+    """تست مسیر جستجوی بدون ایندکس درون‌حافظه‌ای با کش Redis"""
+
+    @pytest.mark.asyncio
+    async def test_count_then_first_page_fills_cache(self, fake_redis, fake_session):
+        """تست شمارش با COUNT و ذخیره لیست رتبه‌بندی‌شده هنگام خواندن اولین صفحه"""
+        criteria = {'search_city': 'تهران'}
+
+        def respond(stmt, params):
+            query = fake_session.compile(stmt)
+            if query.startswith("SELECT count("):
+                return [3]
+            if "suppliers.user_id" in query:
+                return [SimpleNamespace(id=supplier_id) for supplier_id in (1, 2, 3)]
+            return [(supplier_id, 0) for supplier_id in (1, 2, 3)]
+
+        session = fake_session(respond=respond)
+        assert await count_search_results(session, criteria) == 3
+        assert len(session.statements) == 1
+
+        page = await fetch_search_page(session, criteria)
+        assert [supplier.id for _, supplier in page] == [1, 2, 3]
+        assert len(session.statements) == 3
+
+        # صفحه و تعداد بعدی از کش خوانده می‌شوند (فقط ردیف‌های صفحه از دیتابیس)
+        assert await count_search_results(session, criteria) == 3
+        await fetch_search_page(session, criteria)
+        assert len(session.statements) == 4
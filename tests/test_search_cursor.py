@@ -0,0 +1,59 @@
+from sqlalchemy.dialects import postgresql
+
+from database.models import Supplier
+from search.cursor import SearchCursor, NEXT, PREVIOUS, CURRENT, slice_sorted, keyset_clause
+
+
+class TestSearchCursor:
+    """تست‌های صفحه‌بندی keyset نتایج جستجو"""
+
+    def test_encode_decode(self):
+        """تست رمزگذاری و بازسازی مکان‌نما"""
+        cursor = SearchCursor(page=3, first=(0.5, 11), last=(0.25, 42), issued_at=1700000000)
+        assert SearchCursor.decode(cursor.encode()) == cursor
+        assert SearchCursor.decode("not-a-cursor") is None
+        assert SearchCursor.decode(None) is None
+
+    def test_expiry(self):
+        """تست انقضای مکان‌نما"""
+        assert not SearchCursor.new().is_expired(60)
+        assert SearchCursor(issued_at=0).is_expired(60)
+
+    def test_slice_sorted_navigation(self):
+        """تست پیمایش صفحات روی لیست مرتب درون حافظه"""
+        keys = [(1.0, 7), (0.5, 2), (0.5, 9)] + [(0, i) for i in range(1, 8)]
+        cursor = SearchCursor.new()
+
+        page = slice_sorted(keys, cursor.anchor(CURRENT), CURRENT, 4)
+        assert page == keys[:4]
+        cursor = cursor.moved(CURRENT, page)
+
+        page = slice_sorted(keys, cursor.anchor(NEXT), NEXT, 4)
+        assert page == keys[4:8]
+        cursor = cursor.moved(NEXT, page)
+        assert cursor.page == 2
+
+        assert slice_sorted(keys, cursor.anchor(CURRENT), CURRENT, 4) == keys[4:8]
+
+        page = slice_sorted(keys, cursor.anchor(PREVIOUS), PREVIOUS, 4)
+        assert page == keys[:4]
+        assert cursor.moved(PREVIOUS, page).page == 1
+
+    def test_direction_to_adjacent_pages_only(self):
+        """تست اینکه فقط دکمه صفحه مجاور جابه‌جا کند و دکمه قدیمی غیرمجاور رد شود"""
+        cursor = SearchCursor(page=3, first=(0.5, 11), last=(0.25, 42))
+        assert cursor.direction_to(4) == NEXT
+        assert cursor.direction_to(2) == PREVIOUS
+        assert cursor.direction_to(3) == CURRENT
+        assert cursor.direction_to(5) is None
+        assert cursor.direction_to(1) is None
+
+    def test_keyset_clause(self):
+        """تست ساخت شرط keyset در SQL"""
+        clause, order_by = keyset_clause(None, Supplier.id, (0, 15), NEXT)
+        sql = str(clause.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+        assert sql == "suppliers.id > 15"
+
+        clause, order_by = keyset_clause(None, Supplier.id, None, PREVIOUS)
+        assert clause is None
+        assert str(order_by[0]) == "suppliers.id DESC"
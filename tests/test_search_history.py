@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from utils.search_history import SearchHistoryWriter
+
+
+class RecordingWriter(SearchHistoryWriter):
+    """نسخه‌ای از writer که به جای دیتابیس دسته‌ها را نگه می‌دارد"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.batches = []
+
+    async def _write(self, batch):
+        self.batches.append(batch)
+
+
+class TestSearchHistoryWriter:
+    """تست‌های ثبت دسته‌ای تاریخچه جستجو"""
+
+    def test_drops_when_queue_full(self):
+        """تست دور ریختن رکورد هنگام پر بودن صف"""
+        writer = RecordingWriter(batch_size=10, flush_ms=1000, queue_size=2)
+        for _ in range(5):
+            writer.record(1, {'search_city': 'تهران'}, 3)
+
+        assert writer.get_stats()['pending'] == 2
+        assert writer.dropped == 3
+
+    def test_open_price_range_is_json_safe(self):
+        """تست تبدیل سقف نامحدود قیمت به null"""
+        writer = RecordingWriter(batch_size=10, flush_ms=1000, queue_size=10)
+        writer.record(1, {'search_price_range': [2000000, float('inf')]}, 0)
+
+        entry = writer.queue.get_nowait()
+        assert entry['search_criteria']['search_price_range'] == [2000000.0, None]
+        assert entry['telegram_id'] == 1
+
+    @pytest.mark.asyncio
+    async def test_flushes_by_size_and_on_stop(self):
+        """تست ذخیره بر اساس اندازه دسته و ذخیره باقی‌مانده هنگام توقف"""
+        writer = RecordingWriter(batch_size=3, flush_ms=60000, queue_size=100)
+        writer.start()
+        for user_id in range(7):
+            writer.record(user_id, {}, user_id)
+        await asyncio.sleep(0.01)
+
+        assert [len(batch) for batch in writer.batches] == [3, 3]
+
+        await writer.stop()
+        assert [len(batch) for batch in writer.batches] == [3, 3, 1]
+        assert writer.written == 7
+
+    @pytest.mark.asyncio
+    async def test_flushes_by_time(self):
+        """تست ذخیره دسته ناقص پس از گذشت بازه زمانی"""
+        writer = RecordingWriter(batch_size=100, flush_ms=20, queue_size=100)
+        writer.start()
+        writer.record(1, {}, 1)
+        await asyncio.sleep(0.1)
+
+        assert [len(batch) for batch in writer.batches] == [1]
+        await writer.stop()
@@ -0,0 +1,115 @@
+from types import SimpleNamespace
+
+from search.index import SupplierIndex, SupplierDocument, matches_criteria
+
+
+def make_supplier(id, city="تهران", gender="زن", age=25, price=(500000, 800000),
+                  styles=("fashion",), special_features=None, hair_color=None, eye_color=None):
+    return SimpleNamespace(
+        id=id, city=city, gender=gender, age=age,
+        price_range_min=price[0] if price else None,
+        price_range_max=price[1] if price else None,
+        work_styles=list(styles), cooperation_types=["in_person"],
+        special_features=special_features, hair_color=hair_color, eye_color=eye_color,
+    )
+
+
+def build_index(*suppliers):
+    index = SupplierIndex()
+    for supplier in suppliers:
+        index.upsert(supplier)
+    index.ready = True
+    return index
+
+
+class TestSupplierIndex:
+    """تست‌های ایندکس درون‌حافظه‌ای جستجو"""
+
+    def test_filters(self):
+        """تست فیلترهای گسسته و بازه‌ای"""
+        index = build_index(
+            make_supplier(1),
+            make_supplier(2, city="کرج", gender="مرد", age=40, styles=("sports",)),
+            make_supplier(3, age=31, price=(1500000, 2500000), styles=("studio", "fashion")),
+            make_supplier(4, price=None),
+        )
+
+        assert index.search({}) == [1, 2, 3, 4]
+        assert index.search({'search_city': 'تهران'}) == [1, 3, 4]
+        assert index.search({'search_gender': 'مرد'}) == [2]
+        assert index.search({'search_age_range': [20, 30]}) == [1, 4]
+        assert index.search({'search_price_range': [2000000, float('inf')]}) == [3]
+        assert index.search({'search_price_range': [0, 500000]}) == [1, 2]
+        assert index.search({'search_work_styles': ['studio', 'sports']}) == [2, 3]
+        assert index.search({'search_city': 'تهران', 'search_work_styles': ['fashion'],
+                             'search_age_range': [30, 35]}) == [3]
+
+    def test_special_features(self):
+        """تست فیلتر متنی روی ویژگی‌های ظاهری"""
+        index = build_index(
+            make_supplier(1, eye_color="سبز"),
+            make_supplier(2, special_features="Blonde hair"),
+            make_supplier(3),
+        )
+
+        assert index.search({'search_special_features': 'سبز'}) == [1]
+        assert index.search({'search_special_features': 'blonde'}) == [2]
+
+    def test_special_features_normalization_and_rank(self):
+        """تست یکسان‌سازی حروف عربی و رتبه‌بندی بر اساس شباهت"""
+        index = build_index(
+            make_supplier(1, special_features="خال روی گونه، موی مشکی بلند"),
+            make_supplier(2, special_features="موی مشكي"),
+            make_supplier(3, special_features="بدون تتو"),
+        )
+
+        ranked = index.search_ranked({'search_special_features': 'موی مشکی'})
+        assert [supplier_id for _, supplier_id in ranked] == [2, 1]
+        assert ranked[0][0] > ranked[1][0]
+
+    def test_city_normalization(self):
+        """تست یکسان‌سازی نام شهر (حروف عربی، نیم‌فاصله، نام جایگزین)"""
+        index = build_index(
+            make_supplier(1, city="طهران"),
+            make_supplier(2, city="بندر عباس"),
+            make_supplier(3, city="بندر‌انزلي"),
+        )
+
+        assert index.search({'search_city': 'تهران'}) == [1]
+        assert index.search({'search_city': 'بندرعباس'}) == [2]
+        assert index.search({'search_city': 'بندر انزلی'}) == [3]
+        assert index.search({'search_city': 'بندر'}) == [2, 3]
+
+    def test_upsert_and_remove(self):
+        """تست به‌روزرسانی و حذف تأمین‌کننده"""
+        index = build_index(make_supplier(1), make_supplier(2))
+
+        index.upsert(make_supplier(1, city="اصفهان", age=50))
+        assert index.search({'search_city': 'تهران'}) == [2]
+        assert index.search({'search_age_range': [45, 55]}) == [1]
+
+        index.remove(2)
+        index.upsert(make_supplier(5))
+        assert len(index) == 2
+        assert index.search({'search_city': 'تهران'}) == [5]
+
+    def test_matches_criteria_agrees_with_search(self):
+        """تست یکسان بودن نتیجه تابع تطابق با جستجوی ایندکس"""
+        suppliers = [make_supplier(i, age=20 + i, price=(i * 100000, i * 200000)) for i in range(1, 20)]
+        index = build_index(*suppliers)
+        criteria = {'search_age_range': [25, 33], 'search_price_range': [1000000, 2000000]}
+
+        expected = [s.id for s in suppliers if matches_criteria(SupplierDocument.from_supplier(s), criteria)]
+        assert index.search(criteria) == expected
+
+    def test_sql_filter_uses_supplier_active_flag(self):
+        """تست فیلتر فعال بودن روی ستون suppliers به جای EXISTS روی users"""
+        from sqlalchemy import select
+        from sqlalchemy.dialects import postgresql
+
+        from database.models import Supplier
+        from handlers.demander import apply_search_filters
+
+        sql = str(apply_search_filters(select(Supplier.id), {"search_city": "تهران"}).compile(dialect=postgresql.dialect()))
+        assert "suppliers.is_active = true" in sql
+        assert "EXISTS" not in sql and "users" not in sql
@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter, TelegramServerError
+from aiogram.methods import AnswerCallbackQuery, SendMessage
+
+from utils.send_scheduler import (
+    INTERACTIVE, NOTIFICATION, SendScheduler, SendSchedulerMiddleware, TokenBucket, send_priority,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class TestSendScheduler:
+    """تست‌های زمان‌بندی ارسال با سطل‌های توکن"""
+
+    def test_token_bucket(self):
+        """تست پر شدن سطل با نرخ و توقف تا retry_after"""
+        bucket = TokenBucket(rate=2, capacity=2, now=0)
+        bucket.consume()
+        bucket.consume()
+        assert bucket.delay(0) == 0.5
+        assert bucket.delay(0.5) == 0
+        bucket.block(10)
+        assert bucket.delay(1) == 9
+        assert bucket.delay(100) == 0 and bucket.tokens == 2
+
+    @pytest.mark.asyncio
+    async def test_interactive_before_notifications(self):
+        """تست اینکه با تمام شدن بودجه سراسری توکن بعدی به پاسخ تعاملی برسد"""
+        clock = FakeClock()
+        scheduler = SendScheduler(global_rate=10, chat_rate=1, group_rate=1, chat_burst=1, clock=clock)
+        scheduler.start()
+        try:
+            scheduler.global_bucket.tokens = 0
+            notification = asyncio.create_task(scheduler.acquire(1, NOTIFICATION))
+            await settle()
+            with send_priority(INTERACTIVE):
+                interactive = asyncio.create_task(scheduler.acquire(2))
+            await settle()
+            assert scheduler.get_stats()["queue_depth"] == {"interactive": 1, "notification": 1, "broadcast": 0}
+
+            clock.now += 0.1
+            scheduler._wakeup.set()
+            await settle()
+            assert interactive.done() and not notification.done()
+
+            clock.now += 0.1
+            scheduler._wakeup.set()
+            await settle()
+            assert notification.done()
+        finally:
+            await scheduler.stop()
+
+    @pytest.mark.asyncio
+    async def test_per_chat_budget_does_not_block_other_chats(self):
+        """تست اینکه چت بدون بودجه ارسال به چت‌های دیگر را معطل نکند"""
+        clock = FakeClock()
+        scheduler = SendScheduler(global_rate=100, chat_rate=1, group_rate=20 / 60, chat_burst=1, clock=clock)
+        scheduler.start()
+        try:
+            await scheduler.acquire(1)
+            second = asyncio.create_task(scheduler.acquire(1))
+            other = asyncio.create_task(scheduler.acquire(2))
+            await settle()
+            assert other.done() and not second.done()
+
+            clock.now += 1
+            scheduler._wakeup.set()
+            await settle()
+            assert second.done()
+
+            # گروه‌ها ۲۰ پیام در دقیقه
+            await scheduler.acquire(-100)
+            group = asyncio.create_task(scheduler.acquire(-100))
+            clock.now += 1
+            scheduler._wakeup.set()
+            await settle()
+            assert not group.done()
+            clock.now += 2
+            scheduler._wakeup.set()
+            await settle()
+            assert group.done()
+        finally:
+            await scheduler.stop()
+
+
+class TestSendSchedulerMiddleware:
+    """تست‌های تلاش مجدد middleware session"""
+
+    @pytest.mark.asyncio
+    async def test_retries(self):
+        """تست تلاش مجدد پس از retry_after و خطای سرور و عدم تکرار خطای درخواست"""
+        scheduler = SendScheduler(global_rate=100, chat_rate=100, group_rate=100, chat_burst=10)
+        middleware = SendSchedulerMiddleware(scheduler, max_retries=2, backoff=0)
+        method = SendMessage(chat_id=5, text="سلام")
+        errors = [TelegramRetryAfter(method, "Too Many Requests", 0), TelegramServerError(method, "Bad Gateway")]
+
+        async def make_request(bot, method):
+            if errors:
+                raise errors.pop(0)
+            return "ok"
+
+        assert await middleware(make_request, None, method) == "ok"
+        assert scheduler.stats == {"sent": 1, "retries": 2, "retry_after": 1, "failed": 0}
+
+        async def bad_request(bot, method):
+            raise TelegramBadRequest(method, "chat not found")
+
+        with pytest.raises(TelegramBadRequest):
+            await middleware(bad_request, None, method)
+        assert scheduler.stats["retries"] == 2
+
+        errors.extend(TelegramServerError(method, "Bad Gateway") for _ in range(3))
+        with pytest.raises(TelegramServerError):
+            await middleware(make_request, None, method)
+        assert scheduler.stats["failed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_methods_without_chat_pass_through(self):
+        """تست عبور مستقیم متدهای بدون chat_id"""
+        scheduler = SendScheduler(global_rate=1, chat_rate=1, group_rate=1, chat_burst=1)
+        middleware = SendSchedulerMiddleware(scheduler)
+
+        async def make_request(bot, method):
+            return True
+
+        assert await middleware(make_request, None, AnswerCallbackQuery(callback_query_id="1")) is True
+        assert scheduler.stats["sent"] == 0
@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import SendMessage
+from aiogram.types import Message
+from aiohttp.test_utils import TestClient, TestServer
+
+from server.webhook import HEALTH_PATH, METRICS_PATH, READY_PATH, create_app
+
+SECRET = "s3cret"
+
+
+class FakeTelegramSession(BaseSession):
+    """session جعلی به جای API تلگرام که فراخوانی‌های ربات را ثبت می‌کند"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls.append(method)
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+def make_update(update_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 0, "text": text,
+            "chat": {"id": 5, "type": "private"},
+            "from": {"id": 5, "is_bot": False, "first_name": "تست"},
+        },
+    }
+
+
+def make_app(checks=None):
+    session = FakeTelegramSession()
+    handled = asyncio.Event()
+    router = Router()
+
+    @router.message()
+    async def echo(message: Message):
+        await message.answer(f"pong: {message.text}")
+        handled.set()
+
+    dp = Dispatcher()
+    dp.include_router(router)
+
+    async def readiness():
+        return checks if checks is not None else {"database": True}
+
+    app = create_app(dp, Bot("42:TEST", session=session), path="/webhook", secret_token=SECRET, readiness=readiness)
+    return app, session, handled
+
+
+class TestWebhook:
+    """تست‌های حالت webhook با فرستنده جعلی تلگرام"""
+
+    @pytest.mark.asyncio
+    async def test_update_is_dispatched(self):
+        """تست پردازش آپدیت ارسال‌شده به مسیر webhook"""
+        app, session, handled = make_app()
+        async with TestClient(TestServer(app)) as client:
+            response = await client.post(
+                "/webhook", json=make_update(1, "ping"), headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}
+            )
+            assert response.status == 200
+            await asyncio.wait_for(handled.wait(), timeout=2)
+
+        assert len(session.calls) == 1
+        assert isinstance(session.calls[0], SendMessage)
+        assert session.calls[0].text == "pong: ping"
+
+    @pytest.mark.asyncio
+    async def test_wrong_secret_is_rejected(self):
+        """تست رد آپدیت بدون توکن مخفی صحیح"""
+        app, session, _ = make_app()
+        async with TestClient(TestServer(app)) as client:
+            response = await client.post(
+                "/webhook", json=make_update(2, "ping"), headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"}
+            )
+            assert response.status == 401
+            assert (await client.post("/webhook", json=make_update(3, "ping"))).status == 401
+        assert session.calls == []
+
+    @pytest.mark.asyncio
+    async def test_health_and_readiness(self):
+        """تست endpointهای سلامت و آمادگی"""
+        checks = {"database": True, "redis": True}
+        app, _, _ = make_app(checks)
+        async with TestClient(TestServer(app)) as client:
+            assert (await client.get(HEALTH_PATH)).status == 200
+            response = await client.get(READY_PATH)
+            assert response.status == 200
+            assert (await response.json())["status"] == "ok"
+
+            checks["redis"] = False
+            response = await client.get(READY_PATH)
+            assert response.status == 503
+            assert (await response.json())["redis"] is False
+
+    @pytest.mark.asyncio
+    async def test_metrics_include_cache_and_session_stats(self):
+        """تست وجود آمار session، کش هویت، کش جستجو و DataLoaderها در /metrics"""
+        app, _, _ = make_app()
+        async with TestClient(TestServer(app)) as client:
+            response = await client.get(METRICS_PATH)
+            assert response.status == 200
+            metrics = await response.json()
+        for section in ("send_scheduler", "invalidation", "sessions", "identity_cache", "search_cache", "dataloaders"):
+            assert section in metrics
+        assert {"hits", "misses"} <= set(metrics["search_cache"])
@@ -0,0 +1,481 @@
+import asyncio
+import logging
+import shlex
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest, TelegramForbiddenError
+from sqlalchemy import case, func, or_, select, true, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.settings import settings
+from database.connection import AsyncSessionLocal
+from database.models import Broadcast, Supplier, User, UserRole
+from keyboards.inline import get_broadcast_progress_keyboard
+from search.events import notify_supplier_changed
+from search.index import SupplierDocument
+from utils.identity import identity_cache
+from utils.normalize import normalize_place
+from utils.outbox import from_payload, to_payload
+from utils.send_scheduler import BROADCAST, send_priority
+from utils.users import deactivate_users
+
+logger = logging.getLogger(__name__)
+
+RUNNING = "running"
+COMPLETED = "completed"
+CANCELLED = "cancelled"
+
+SENT = "sent"
+FAILED = "failed"
+BLOCKED = "blocked"
+
+# هر cursor سمت سرور حداکثر این تعداد دسته را می‌خواند و سپس از آخرین id دوباره باز می‌شود
+# تا تراکنش خواندن (و snapshot آن) در یک پخش چندساعته باز نماند
+CURSOR_WINDOW_CHUNKS = 10
+
+STATUS_TITLES = {RUNNING: "⏳ در حال ارسال", COMPLETED: "✅ پایان یافت", CANCELLED: "⏹ متوقف شد"}
+ROLE_TITLES = {UserRole.SUPPLIER: "تأمین‌کنندگان", UserRole.DEMANDER: "درخواست‌کنندگان"}
+
+
+@dataclass(frozen=True)
+class BroadcastFilters:
+    """فیلتر گیرندگان پیام همگانی"""
+    role: Optional[UserRole] = None
+    city: Optional[str] = None  # فقط تأمین‌کنندگان شهر دارند
+    active_only: bool = True
+
+    def describe(self) -> str:
+        parts = [ROLE_TITLES[self.role] if self.role else "همه کاربران"]
+        if self.city:
+            parts.append(f"شهر {self.city}")
+        parts.append("فقط کاربران فعال" if self.active_only else "شامل کاربران غیرفعال")
+        return "، ".join(parts)
+
+
+def parse_filters(args: str) -> BroadcastFilters:
+    """فیلترها از آرگومان‌های دستور: role=supplier|demander city="..." all"""
+    role, city, active_only = None, None, True
+    try:
+        tokens = shlex.split(args or "")
+    except ValueError:
+        raise ValueError("نقل‌قول بسته نشده است") from None
+    for token in tokens:
+        key, _, value = token.partition("=")
+        if token == "all":
+            active_only = False
+        elif key == "role" and value in {r.value for r in UserRole}:
+            role = UserRole(value)
+        elif key == "city" and normalize_place(value):
+            city = value.strip()
+        else:
+            raise ValueError(f"فیلتر نامعتبر: {token}")
+    return BroadcastFilters(role, city, active_only)
+
+
+def recipients_query(filters: BroadcastFilters, after_user_id: int = 0):
+    """گیرندگان به ترتیب users.id (keyset از checkpoint)"""
+    stmt = (
+        select(User.id, User.telegram_id)
+        .where(User.id > after_user_id)
+        .order_by(User.id)
+    )
+    if filters.role is not None:
+        stmt = stmt.where(User.role == filters.role)
+    if filters.active_only:
+        # NULL مانند Identity.from_row فعال حساب می‌شود
+        stmt = stmt.where(User.is_active.is_not(False))
+    if filters.city:
+        stmt = stmt.join(Supplier, Supplier.user_id == User.id).where(Supplier.city_norm == normalize_place(filters.city))
+        if filters.active_only:
+            stmt = stmt.where(Supplier.is_active == true())
+    return stmt
+
+
+async def count_recipients(session: AsyncSession, filters: BroadcastFilters) -> int:
+    stmt = select(func.count()).select_from(recipients_query(filters).order_by(None).subquery())
+    return (await session.execute(stmt)).scalar_one()
+
+
+async def create_broadcast(
+    session: AsyncSession,
+    admin_id: int,
+    source_chat_id: int,
+    source_message_id: int,
+    filters: BroadcastFilters,
+    progress_message_id: Optional[int] = None,
+) -> Broadcast:
+    """ثبت پخش جدید؛ پس از commit فراخوانی‌کننده broadcast_manager.wake() آن را شروع می‌کند"""
+    broadcast = Broadcast(
+        created_by=admin_id,
+        source_chat_id=source_chat_id,
+        source_message_id=source_message_id,
+        progress_message_id=progress_message_id,
+        filters=to_payload(filters),
+        status=RUNNING,
+        last_user_id=0,
+        total=await count_recipients(session, filters),
+        sent=0,
+        failed=0,
+        blocked=0,
+    )
+    session.add(broadcast)
+    await session.flush()
+    return broadcast
+
+
+async def cancel_broadcast(session: AsyncSession, broadcast_id: int) -> bool:
+    """توقف پخش در جریان؛ پروسه اجراکننده در checkpoint بعدی متوجه می‌شود"""
+    result = await session.execute(
+        update(Broadcast)
+        .where(Broadcast.id == broadcast_id, Broadcast.status == RUNNING)
+        .values(status=CANCELLED, finished_at=func.now())
+        .returning(Broadcast.id)
+    )
+    return result.first() is not None
+
+
+def broadcast_stats(broadcast: Broadcast) -> Dict[str, Any]:
+    """آمار ذخیره‌شده یک پخش (تا آخرین checkpoint)"""
+    return {
+        "total": broadcast.total, "sent": broadcast.sent, "failed": broadcast.failed,
+        "blocked": broadcast.blocked, "rate": None, "eta_seconds": None,
+    }
+
+
+def format_progress(broadcast_id: int, stats: Dict[str, Any], status: str) -> str:
+    """متن پیام وضعیت پخش برای ادمین"""
+    processed = stats["sent"] + stats["failed"] + stats["blocked"]
+    text = (
+        f"📣 پیام همگانی #{broadcast_id} — {STATUS_TITLES.get(status, status)}\n\n"
+        f"📨 پردازش‌شده: {processed} از {stats['total']}\n"
+        f"✅ ارسال‌شده: {stats['sent']}\n"
+        f"🚫 مسدودکرده: {stats['blocked']}\n"
+        f"⚠️ ناموفق: {stats['failed']}"
+    )
+    if stats.get("rate"):
+        text += f"\n⚡️ سرعت: {stats['rate']:.1f} پیام در ثانیه"
+    if status == RUNNING and stats.get("eta_seconds") is not None:
+        minutes, seconds = divmod(int(stats["eta_seconds"]), 60)
+        text += f"\n⏱ زمان باقی‌مانده: {minutes // 60:02d}:{minutes % 60:02d}:{seconds:02d}"
+    return text
+
+
+@dataclass
+class _Chunk:
+    """یک دسته از cursor؛ checkpoint فقط وقتی از آن رد می‌شود که این دسته و همه دسته‌های قبلی تمام شده باشند"""
+    last_user_id: int
+    size: int
+    done: int = 0
+    sent: int = 0
+    failed: int = 0
+    blocked: List[Tuple[int, int]] = field(default_factory=list)  # (users.id, telegram_id)
+
+    @property
+    def finished(self) -> bool:
+        return self.done >= self.size
+
+
+class BroadcastRunner:
+    """اجرای یک پخش: cursor سمت سرور، workerهای هم‌زمان و checkpoint دوره‌ای
+
+    گیرندگان دسته‌دسته با cursor سمت سرور (yield_per) از users خوانده و در یک
+    صف محدود گذاشته می‌شوند تا خواندن از ارسال جلو نزند. workerها پیام ادمین
+    را با copyMessage و اولویت BROADCAST از SendScheduler عبور می‌دهند؛ پس نرخ
+    سراسری رعایت می‌شود و پاسخ‌های تعاملی و اعلان‌ها معطل پخش نمی‌مانند. هر
+    progress_interval ثانیه آخرین users.id کاملاً پردازش‌شده، شمارنده‌ها و
+    کاربران مسدودکننده (که غیرفعال می‌شوند) در یک تراکنش ذخیره و lease تمدید
+    می‌شود. پس از توقف پروسه پخش از همان checkpoint ادامه می‌یابد؛ فقط
+    دسته‌های نیمه‌تمام ممکن است دوباره ارسال شوند.
+    """
+
+    def __init__(
+        self,
+        broadcast: Broadcast,
+        bot: Bot,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+        workers: int = None,
+        chunk_size: int = None,
+        progress_interval: float = None,
+        lease_seconds: int = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.id = broadcast.id
+        self.bot = bot
+        self.session_factory = session_factory
+        self.workers = workers or settings.broadcast_workers
+        self.chunk_size = chunk_size or settings.broadcast_chunk_size
+        self.progress_interval = progress_interval or settings.broadcast_progress_interval
+        self.lease = timedelta(seconds=lease_seconds or settings.broadcast_lease_seconds)
+        self.clock = clock
+
+        self.filters = from_payload(BroadcastFilters, broadcast.filters)
+        self.source_chat_id = broadcast.source_chat_id
+        self.source_message_id = broadcast.source_message_id
+        self.admin_chat_id = broadcast.created_by
+        self.progress_message_id = broadcast.progress_message_id
+        self.total = broadcast.total
+        # وضعیت تا آخرین checkpoint
+        self.last_user_id = broadcast.last_user_id
+        self.counts = {SENT: broadcast.sent, FAILED: broadcast.failed, BLOCKED: broadcast.blocked}
+
+        self.processed = 0  # در همین اجرا، برای محاسبه سرعت
+        self.started = clock()
+        self._chunks: Deque[_Chunk] = deque()
+
+    async def run(self) -> str:
+        """اجرا تا پایان یا لغو؛ وضعیت نهایی برمی‌گردد"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.workers * 2)
+        tasks = [asyncio.create_task(self._produce(queue))]
+        tasks += [asyncio.create_task(self._work(queue)) for _ in range(self.workers)]
+        status = RUNNING
+        try:
+            pending = set(tasks)
+            while pending and status == RUNNING:
+                done, pending = await asyncio.wait(pending, timeout=self.progress_interval, return_when=asyncio.FIRST_EXCEPTION)
+                for task in done:
+                    if task.exception() is not None:
+                        raise task.exception()
+                status = await self._checkpoint(finished=not pending)
+                await self._report(status)
+        except asyncio.CancelledError:
+            # خاموش شدن پروسه: ذخیره پیشرفت و آزاد کردن lease تا اجرای بعدی بلافاصله ادامه دهد
+            await self._stop(tasks)
+            await self._checkpoint(release=True)
+            raise
+        finally:
+            await self._stop(tasks)
+        return status
+
+    def get_stats(self) -> Dict[str, Any]:
+        """آمار لحظه‌ای شامل دسته‌های در حال ارسال، سرعت و زمان باقی‌مانده"""
+        live = dict(self.counts)
+        for chunk in self._chunks:
+            live[SENT] += chunk.sent
+            live[FAILED] += chunk.failed
+            live[BLOCKED] += len(chunk.blocked)
+        elapsed = self.clock() - self.started
+        rate = self.processed / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, self.total - sum(live.values()))
+        return {
+            "total": self.total,
+            **live,
+            "rate": round(rate, 2),
+            "eta_seconds": round(remaining / rate) if rate else None,
+            "checkpoint": self.last_user_id,
+        }
+
+    # ---------- داخلی ----------
+
+    async def _produce(self, queue: asyncio.Queue):
+        after = self.last_user_id
+        window = self.chunk_size * CURSOR_WINDOW_CHUNKS
+        while True:
+            streamed = 0
+            async with self.session_factory() as session:
+                result = await session.stream(
+                    recipients_query(self.filters, after).limit(window).execution_options(yield_per=self.chunk_size)
+                )
+                async for rows in result.partitions():
+                    chunk = _Chunk(rows[-1].id, len(rows))
+                    self._chunks.append(chunk)
+                    for row in rows:
+                        await queue.put((chunk, row.id, row.telegram_id))
+                    streamed += len(rows)
+                    after = chunk.last_user_id
+            if streamed < window:
+                break
+        for _ in range(self.workers):
+            await queue.put(None)
+
+    async def _work(self, queue: asyncio.Queue):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            chunk, user_id, telegram_id = item
+            outcome = await self._send(telegram_id)
+            if outcome == BLOCKED:
+                chunk.blocked.append((user_id, telegram_id))
+            elif outcome == SENT:
+                chunk.sent += 1
+            else:
+                chunk.failed += 1
+            chunk.done += 1
+            self.processed += 1
+
+    async def _send(self, telegram_id: int) -> str:
+        try:
+            with send_priority(BROADCAST):
+                await self.bot.copy_message(
+                    chat_id=telegram_id, from_chat_id=self.source_chat_id, message_id=self.source_message_id
+                )
+            return SENT
+        except TelegramForbiddenError:
+            return BLOCKED
+        except Exception as e:
+            logger.warning(f"Broadcast {self.id} to {telegram_id} failed: {e}")
+            return FAILED
+
+    def _advance(self) -> List[Tuple[int, int]]:
+        """جلو بردن checkpoint تا آخرین دسته پیوسته تمام‌شده؛ کاربران مسدودکننده آن دسته‌ها برمی‌گردند"""
+        blocked = []
+        while self._chunks and self._chunks[0].finished:
+            chunk = self._chunks.popleft()
+            self.last_user_id = chunk.last_user_id
+            self.counts[SENT] += chunk.sent
+            self.counts[FAILED] += chunk.failed
+            self.counts[BLOCKED] += len(chunk.blocked)
+            blocked.extend(chunk.blocked)
+        return blocked
+
+    async def _checkpoint(self, finished: bool = False, release: bool = False) -> str:
+        """ذخیره checkpoint و غیرفعال کردن کاربران مسدودکننده در یک تراکنش؛ وضعیت فعلی پخش برمی‌گردد"""
+        blocked = self._advance()
+        values = {
+            "last_user_id": self.last_user_id,
+            "sent": self.counts[SENT],
+            "failed": self.counts[FAILED],
+            "blocked": self.counts[BLOCKED],
+            "lease_until": None if release or finished else func.now() + self.lease,
+        }
+        if finished:
+            # پخشی که هم‌زمان لغو شده لغوشده می‌ماند
+            values["status"] = case((Broadcast.status == RUNNING, COMPLETED), else_=Broadcast.status)
+            values["finished_at"] = func.coalesce(Broadcast.finished_at, func.now())
+
+        async with self.session_factory() as session:
+            suppliers = await deactivate_users(session, [user_id for user_id, _ in blocked])
+            result = await session.execute(
+                update(Broadcast).where(Broadcast.id == self.id).values(**values).returning(Broadcast.status)
+            )
+            status = result.scalar_one()
+            await session.commit()
+
+        for _, telegram_id in blocked:
+            await identity_cache.invalidate(telegram_id)
+        for supplier in suppliers:
+            await notify_supplier_changed(SupplierDocument.from_supplier(supplier), None)
+        return status
+
+    async def _report(self, status: str):
+        if not self.progress_message_id:
+            return
+        try:
+            await self.bot.edit_message_text(
+                format_progress(self.id, self.get_stats(), status),
+                chat_id=self.admin_chat_id,
+                message_id=self.progress_message_id,
+                reply_markup=get_broadcast_progress_keyboard(self.id) if status == RUNNING else None,
+            )
+        except TelegramBadRequest:
+            # متن تغییری نکرده (message is not modified)
+            pass
+        except TelegramAPIError as e:
+            logger.warning(f"Broadcast {self.id} progress update failed: {e}")
+
+    @staticmethod
+    async def _stop(tasks: List[asyncio.Task]):
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class BroadcastManager:
+    """اجرای پخش‌های در جریان در پس‌زمینه
+
+    هر پروسه پخش‌های running بدون lease معتبر (جدید، یا رهاشده توسط پروسه‌ای
+    که متوقف شده) را با یک UPDATE شرطی برمی‌دارد؛ پس با چند worker هر پخش فقط
+    در یک پروسه اجرا می‌شود و پس از restart از checkpoint ادامه می‌یابد.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+        lease_seconds: int = None,
+    ):
+        self.session_factory = session_factory
+        self.lease = timedelta(seconds=lease_seconds or settings.broadcast_lease_seconds)
+        self._runners: Dict[int, BroadcastRunner] = {}
+        self._runner_tasks: Dict[int, asyncio.Task] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, bot: Bot):
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch(bot))
+
+    async def stop(self):
+        """توقف بررسی و پخش‌های در حال اجرا (پیشرفت آن‌ها ذخیره می‌شود)"""
+        tasks = [task for task in (self._task, *self._runner_tasks.values()) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    def wake(self):
+        """شروع فوری پخشی که تازه commit شده"""
+        self._wakeup.set()
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {str(broadcast_id): runner.get_stats() for broadcast_id, runner in self._runners.items()}
+
+    # ---------- داخلی ----------
+
+    async def _claim(self) -> List[Broadcast]:
+        stmt = (
+            update(Broadcast)
+            .where(
+                Broadcast.status == RUNNING,
+                or_(Broadcast.lease_until.is_(None), Broadcast.lease_until < func.now()),
+                # پخشی که همین پروسه اجرا می‌کند و lease آن پیش از تمدید گذشته دوباره برداشته نشود
+                Broadcast.id.not_in(list(self._runners)),
+            )
+            .values(lease_until=func.now() + self.lease)
+            .returning(Broadcast)
+            .execution_options(synchronize_session=False)
+        )
+        async with self.session_factory() as session:
+            broadcasts = list((await session.execute(stmt)).scalars())
+            await session.commit()
+        return broadcasts
+
+    async def _execute(self, runner: BroadcastRunner):
+        try:
+            status = await runner.run()
+            logger.info(f"Broadcast {runner.id} {status}: {runner.get_stats()}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # lease منقضی می‌شود و پخش در دور بعدی بررسی دوباره برداشته می‌شود
+            logger.error(f"Broadcast {runner.id} failed: {e}")
+        finally:
+            self._runners.pop(runner.id, None)
+            self._runner_tasks.pop(runner.id, None)
+
+    async def _watch(self, bot: Bot):
+        while True:
+            try:
+                for broadcast in await self._claim():
+                    runner = BroadcastRunner(
+                        broadcast, bot, self.session_factory, lease_seconds=int(self.lease.total_seconds())
+                    )
+                    self._runners[broadcast.id] = runner
+                    self._runner_tasks[broadcast.id] = asyncio.create_task(self._execute(runner))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Broadcast manager error: {e}")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.lease.total_seconds())
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+
+broadcast_manager = BroadcastManager()
@@ -0,0 +1,248 @@
+import asyncio
+import json
+import logging
+import random
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from redis.exceptions import RedisError, ResponseError
+from sqlalchemy import BigInteger, DateTime, Integer, String, column, insert, select, update, values
+
+from config.settings import settings
+from database.connection import AsyncSessionLocal
+from database.models import Demander, Supplier, User, ViewLog
+from database.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "counters:suppliers"
+LIVE_KEY = KEY_PREFIX
+FLUSHING_KEY = f"{KEY_PREFIX}:flushing"
+LOCK_KEY = f"{KEY_PREFIX}:lock"
+VIEW_LOGS_KEY = "counters:view_logs"
+
+VIEWS = "views"
+REQUESTS = "requests"
+
+# سقف نمونه‌های در انتظار و تعداد نمونه‌های ذخیره‌شده در هر flush
+MAX_PENDING_SAMPLES = 100000
+SAMPLES_PER_FLUSH = 5000
+# محدودیت تعداد پارامترهای هر کوئری در asyncpg (۳۲۷۶۷)
+DELTAS_PER_STATEMENT = 5000
+LOCK_TTL = 60
+
+# قفل فقط اگر هنوز متعلق به همین flusher باشد حذف می‌شود؛ اگر flush بیش از
+# LOCK_TTL طول بکشد ممکن است قفل منقضی و به پروسه دیگری رسیده باشد
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _field(supplier_id: int, kind: str) -> str:
+    return f"{supplier_id}:{kind}"
+
+
+def parse_deltas(fields: Dict) -> Dict[int, Dict[str, int]]:
+    """تبدیل فیلدهای hash شمارنده‌ها به {supplier_id: {views, requests}}"""
+    deltas: Dict[int, Dict[str, int]] = {}
+    for field, value in fields.items():
+        if isinstance(field, bytes):
+            field = field.decode()
+        supplier_id, kind = field.split(":")
+        deltas.setdefault(int(supplier_id), {VIEWS: 0, REQUESTS: 0})[kind] += int(value)
+    return deltas
+
+
+class SupplierCounters:
+    """شمارنده‌های بازدید و درخواست تأمین‌کنندگان
+
+    هر بازدید (لیست یا جزئیات) و هر درخواست فقط یک HINCRBY در Redis است؛
+    flusher دوره‌ای مجموع تغییرات را با یک UPDATE دسته‌ای روی suppliers اعمال
+    می‌کند تا ردیف‌های پربازدید در هر بازدید قفل نشوند. درصدی از بازدیدها
+    (VIEW_LOG_SAMPLE_RATE) هم برای view_logs نمونه‌برداری می‌شود.
+    اگر Redis در دسترس نباشد شمارش در حافظه همین پروسه انجام می‌شود.
+    """
+
+    def __init__(self, flush_interval: int = None, sample_rate: float = None):
+        self.flush_interval = flush_interval or settings.counters_flush_interval
+        self.sample_rate = settings.view_log_sample_rate if sample_rate is None else sample_rate
+        self.flushed_suppliers = 0
+        self.flushed_samples = 0
+        self._local = Counter()
+        self._local_samples: List[list] = []
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def redis(self):
+        return get_redis()
+
+    # ---------- ثبت ----------
+
+    async def record_views(self, supplier_ids: Iterable[int], telegram_id, view_type: str):
+        """ثبت بازدید یک یا چند تأمین‌کننده (view_type: 'list' یا 'detail')"""
+        supplier_ids = list(supplier_ids)
+        now = time.time()
+        samples = [
+            json.dumps([supplier_id, int(telegram_id), view_type, now])
+            for supplier_id in supplier_ids if random.random() < self.sample_rate
+        ]
+        await self._increment([_field(supplier_id, VIEWS) for supplier_id in supplier_ids], samples)
+
+    async def record_request(self, supplier_id: int):
+        """ثبت یک درخواست همکاری برای تأمین‌کننده"""
+        await self._increment([_field(supplier_id, REQUESTS)], [])
+
+    async def _increment(self, fields: List[str], samples: List[str]):
+        if self.redis is None:
+            self._local.update(fields)
+            self._local_samples.extend(json.loads(sample) for sample in samples)
+            del self._local_samples[:-MAX_PENDING_SAMPLES]
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for field in fields:
+                    pipe.hincrby(LIVE_KEY, field, 1)
+                if samples:
+                    pipe.rpush(VIEW_LOGS_KEY, *samples)
+                    pipe.ltrim(VIEW_LOGS_KEY, -MAX_PENDING_SAMPLES, -1)
+                await pipe.execute()
+        except RedisError as e:
+            # شمارش فقط آماری است و نباید نمایش نتایج را متوقف کند
+            logger.warning(f"Supplier counters unavailable: {e}")
+
+    # ---------- flush ----------
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """توقف flusher و اعمال آخرین تغییرات"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Supplier counters flush failed: {e}")
+
+    async def flush(self):
+        """اعمال تغییرات جمع‌شده روی دیتابیس"""
+        if self.redis is None:
+            await self._flush_local()
+            return
+        try:
+            token = uuid.uuid4().hex
+            if not await self.redis.set(LOCK_KEY, token, nx=True, ex=LOCK_TTL):
+                # flusher پروسه دیگری در حال اجراست
+                return
+            try:
+                await self._flush_redis()
+            finally:
+                await self.redis.eval(RELEASE_LOCK_SCRIPT, 1, LOCK_KEY, token)
+        except RedisError as e:
+            logger.warning(f"Supplier counters flush skipped: {e}")
+
+    async def _flush_local(self):
+        fields, self._local = self._local, Counter()
+        samples, self._local_samples = self._local_samples, []
+        if fields:
+            try:
+                await self._apply_deltas(parse_deltas(fields))
+            except Exception:
+                self._local.update(fields)
+                self._local_samples[:0] = samples
+                raise
+        if samples:
+            await self._insert_view_logs(samples)
+
+    async def _flush_redis(self):
+        # hash فعلی با RENAME کنار گذاشته می‌شود تا افزایش‌های جدید روی hash تازه انجام شوند؛
+        # اگر flush قبلی ناموفق بوده، همان hash کنارگذاشته‌شده دوباره اعمال می‌شود
+        if not await self.redis.exists(FLUSHING_KEY):
+            try:
+                await self.redis.rename(LIVE_KEY, FLUSHING_KEY)
+            except ResponseError:
+                pass  # hash خالی است
+
+        fields = await self.redis.hgetall(FLUSHING_KEY)
+        if fields:
+            await self._apply_deltas(parse_deltas(fields))
+            await self.redis.delete(FLUSHING_KEY)
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lrange(VIEW_LOGS_KEY, 0, SAMPLES_PER_FLUSH - 1)
+            pipe.ltrim(VIEW_LOGS_KEY, SAMPLES_PER_FLUSH, -1)
+            raw_samples, _ = await pipe.execute()
+        if raw_samples:
+            await self._insert_view_logs([json.loads(sample) for sample in raw_samples])
+
+    async def _apply_deltas(self, deltas: Dict[int, Dict[str, int]]):
+        """یک UPDATE ... FROM (VALUES ...) برای هر دسته از تأمین‌کنندگان تغییرکرده"""
+        items = sorted(deltas.items())
+        async with AsyncSessionLocal() as session:
+            for start in range(0, len(items), DELTAS_PER_STATEMENT):
+                rows = values(
+                    column('supplier_id', Integer),
+                    column('views', Integer),
+                    column('requests', Integer),
+                    name='deltas',
+                ).data([
+                    (supplier_id, delta[VIEWS], delta[REQUESTS])
+                    for supplier_id, delta in items[start:start + DELTAS_PER_STATEMENT]
+                ])
+                await session.execute(
+                    update(Supplier)
+                    .where(Supplier.id == rows.c.supplier_id)
+                    .values(
+                        view_count=Supplier.view_count + rows.c.views,
+                        request_count=Supplier.request_count + rows.c.requests,
+                        # آمار تغییر پروفایل حساب نمی‌شود
+                        updated_at=Supplier.updated_at,
+                    )
+                )
+            await session.commit()
+        self.flushed_suppliers += len(deltas)
+
+    async def _insert_view_logs(self, samples: List[list]):
+        """درج دسته‌ای نمونه‌های بازدید؛ demander_id از روی telegram_id پیدا می‌شود"""
+        rows = values(
+            column('supplier_id', Integer),
+            column('telegram_id', BigInteger),
+            column('view_type', String),
+            column('created_at', DateTime),
+            name='samples',
+        ).data([
+            (supplier_id, int(telegram_id), view_type, datetime.utcfromtimestamp(ts))
+            for supplier_id, telegram_id, view_type, ts in samples
+        ])
+        stmt = insert(ViewLog).from_select(
+            ['supplier_id', 'demander_id', 'view_type', 'created_at'],
+            select(rows.c.supplier_id, Demander.id, rows.c.view_type, rows.c.created_at)
+            .select_from(rows)
+            .join(Supplier, Supplier.id == rows.c.supplier_id)
+            .outerjoin(User, User.telegram_id == rows.c.telegram_id)
+            .outerjoin(Demander, Demander.user_id == User.id)
+        )
+        async with AsyncSessionLocal() as session:
+            await session.execute(stmt)
+            await session.commit()
+        self.flushed_samples += len(samples)
+
+
+supplier_counters = SupplierCounters()
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Iterable, List, Optional, TypeVar
+
+from sqlalchemy import Integer, any_, bindparam, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import Supplier
+
+logger = logging.getLogger(__name__)
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+MAX_BATCH_SIZE = 500
+
+
+class DataLoader(Generic[K, V]):
+    """ادغام جستجوهای تک‌کلیدی هم‌زمان در یک کوئری دسته‌ای
+
+    همه load()هایی که در یک دور event loop (از آپدیت‌های مختلف) صادر
+    می‌شوند با یک فراخوانی batch_fn(keys) پاسخ داده می‌شوند. batch_fn یک
+    dict از کلید به مقدار برمی‌گرداند؛ کلیدهای ناموجود None می‌گیرند. نتایج
+    کش نمی‌شوند و هر دسته بعدی دوباره از دیتابیس خوانده می‌شود.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[K]], Awaitable[Dict[K, V]]], max_batch_size: int = MAX_BATCH_SIZE):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[K, List[asyncio.Future]] = {}
+        self.batches = 0
+        self.loads = 0
+
+    async def load(self, key: K) -> Optional[V]:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # هر event loop صف جداگانه خودش را دارد (مثلاً در تست‌ها)
+            self._loop = loop
+            self._pending = {}
+
+        if not self._pending:
+            loop.call_soon(self._dispatch)
+        future = loop.create_future()
+        self._pending.setdefault(key, []).append(future)
+        self.loads += 1
+        return await future
+
+    async def load_many(self, keys: Iterable[K]) -> List[Optional[V]]:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            "loads": self.loads,
+            "batches": self.batches,
+            "batch_factor": round(self.loads / self.batches, 2) if self.batches else 0,
+        }
+
+    def _dispatch(self):
+        pending, self._pending = self._pending, {}
+        keys = list(pending)
+        for start in range(0, len(keys), self.max_batch_size):
+            chunk = keys[start:start + self.max_batch_size]
+            asyncio.ensure_future(self._run_batch({key: pending[key] for key in chunk}))
+
+    async def _run_batch(self, pending: Dict[K, List[asyncio.Future]]):
+        self.batches += 1
+        try:
+            results = await self.batch_fn(list(pending))
+        except Exception as e:
+            logger.error(f"Batch load of {len(pending)} keys failed: {e}")
+            for futures in pending.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for key, futures in pending.items():
+            value = results.get(key)
+            for future in futures:
+                if not future.done():
+                    future.set_result(value)
+
+
+class SessionLoaders:
+    """DataLoaderهای مشترک بین همه آپدیت‌هایی که از یک session factory استفاده می‌کنند
+
+    برای هر تابع دسته‌ای یک DataLoader ساخته می‌شود؛ تابع دسته‌ای
+    session factory را به عنوان آرگومان اول می‌گیرد تا جستجوهای هندلرهای
+    فقط‌خواندنی روی همان replica انجام شوند.
+    """
+
+    def __init__(self, session_factory: Callable[[], AsyncSession]):
+        self.session_factory = session_factory
+        self._loaders: Dict[Callable, DataLoader] = {}
+
+    def get(self, batch_fn: Callable[..., Awaitable[Dict[Any, Any]]]) -> DataLoader:
+        loader = self._loaders.get(batch_fn)
+        if loader is None:
+            loader = self._loaders[batch_fn] = DataLoader(partial(batch_fn, self.session_factory))
+        return loader
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        return {batch_fn.__name__: loader.get_stats() for batch_fn, loader in self._loaders.items()}
+
+
+_session_loaders: Dict[Callable, SessionLoaders] = {}
+
+
+def get_session_loaders(session_factory: Callable[[], AsyncSession]) -> SessionLoaders:
+    loaders = _session_loaders.get(session_factory)
+    if loaders is None:
+        loaders = _session_loaders[session_factory] = SessionLoaders(session_factory)
+    return loaders
+
+
+def get_loader_stats() -> Dict[str, Dict[str, float]]:
+    """آمار DataLoaderهای همه session factoryها (primary و replicaها) به تفکیک تابع دسته‌ای"""
+    totals: Dict[str, Dict[str, int]] = {}
+    for loaders in _session_loaders.values():
+        for batch_fn, loader in loaders._loaders.items():
+            total = totals.setdefault(batch_fn.__name__, {"loads": 0, "batches": 0})
+            total["loads"] += loader.loads
+            total["batches"] += loader.batches
+    return {
+        name: {**total, "batch_factor": round(total["loads"] / total["batches"], 2) if total["batches"] else 0}
+        for name, total in totals.items()
+    }
+
+
+# ---------- توابع دسته‌ای ----------
+
+def suppliers_by_ids_query():
+    """SELECT ... WHERE id = ANY(:ids) با یک پارامتر آرایه (یک prepared statement برای هر اندازه دسته)"""
+    return select(Supplier).where(Supplier.id == any_(bindparam("ids", type_=ARRAY(Integer))))
+
+
+async def load_suppliers(session_factory: Callable[[], AsyncSession], supplier_ids: List[int]) -> Dict[int, Supplier]:
+    """تابع دسته‌ای DataLoader: یک کوئری برای کل دسته"""
+    async with session_factory() as session:
+        result = await session.execute(suppliers_by_ids_query(), {"ids": supplier_ids})
+        return {supplier.id: supplier for supplier in result.scalars()}
+
+
+async def get_supplier(session, supplier_id: int) -> Optional[Supplier]:
+    """تأمین‌کننده با DataLoader مشترک session (در صورت وجود) یا مستقیم از همان session"""
+    loaders = getattr(session, "loaders", None)
+    if isinstance(loaders, SessionLoaders):
+        return await loaders.get(load_suppliers).load(supplier_id)
+    return await session.get(Supplier, supplier_id)
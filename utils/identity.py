@@ -0,0 +1,183 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional
+
+from redis.exceptions import RedisError
+from sqlalchemy import BigInteger, any_, bindparam, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.settings import settings
+from database.models import Demander, Supplier, User, UserRole
+from database.redis_client import get_redis
+from utils.dataloader import SessionLoaders
+from utils.invalidation import IDENTITY, invalidation_bus
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "identity"
+
+
+@dataclass(frozen=True, slots=True)
+class Identity:
+    """اطلاعات هویتی پرکاربرد یک کاربر تلگرام"""
+    user_id: int
+    role: UserRole
+    is_active: bool
+    supplier_id: Optional[int] = None
+    demander_id: Optional[int] = None
+
+    @property
+    def is_supplier(self) -> bool:
+        return self.role == UserRole.SUPPLIER
+
+    @property
+    def is_demander(self) -> bool:
+        return self.role == UserRole.DEMANDER
+
+    def to_json(self) -> str:
+        return json.dumps({**asdict(self), "role": self.role.value})
+
+    @classmethod
+    def from_json(cls, raw) -> "Identity":
+        data = json.loads(raw)
+        return cls(**{**data, "role": UserRole(data["role"])})
+
+    @classmethod
+    def from_row(cls, row) -> "Identity":
+        user_id, role, is_active, supplier_id, demander_id = row[:5]
+        return cls(user_id, role, bool(is_active) if is_active is not None else True, supplier_id, demander_id)
+
+
+def identity_query():
+    """ستون‌های Identity با join پروفایل‌ها"""
+    return (
+        select(User.id, User.role, User.is_active, Supplier.id, Demander.id)
+        .outerjoin(Supplier, Supplier.user_id == User.id)
+        .outerjoin(Demander, Demander.user_id == User.id)
+    )
+
+
+async def load_identities(session_factory: Callable[[], AsyncSession], telegram_ids: List[int]) -> Dict[int, Identity]:
+    """تابع دسته‌ای DataLoader: هویت چند کاربر با یک WHERE telegram_id = ANY(:ids)"""
+    stmt = identity_query().add_columns(User.telegram_id).where(
+        User.telegram_id == any_(bindparam("telegram_ids", type_=ARRAY(BigInteger)))
+    )
+    async with session_factory() as session:
+        result = await session.execute(stmt, {"telegram_ids": telegram_ids})
+        return {row[-1]: Identity.from_row(row) for row in result}
+
+
+class IdentityCache:
+    """کش دوسطحی telegram_id → Identity
+
+    سطح اول یک LRU درون‌پروسه‌ای با TTL کوتاه و سطح دوم Redis است. در
+    اولین جستجو از دیتابیس (یک کوئری با join پروفایل‌ها) پر می‌شود و پس از
+    ثبت‌نام، تغییر نقش یا غیرفعال شدن باید invalidate شود. TTL کوتاه سطح
+    اول سقف ناهماهنگی بین پروسه‌ها را تعیین می‌کند.
+    """
+
+    def __init__(self, max_size: int = None, local_ttl: int = None, ttl: int = None):
+        self.max_size = max_size or settings.identity_cache_size
+        self.local_ttl = local_ttl if local_ttl is not None else settings.identity_cache_local_ttl
+        self.ttl = ttl or settings.identity_cache_ttl
+        self._local: "OrderedDict[int, tuple[float, Identity]]" = OrderedDict()
+        self.stats = {"local_hits": 0, "redis_hits": 0, "misses": 0}
+
+    @property
+    def redis(self):
+        return get_redis()
+
+    async def get(self, session: AsyncSession, telegram_id) -> Optional[Identity]:
+        """Identity کاربر یا None اگر ثبت‌نام نکرده باشد"""
+        telegram_id = int(telegram_id)
+
+        entry = self._local.get(telegram_id)
+        if entry is not None:
+            expires_at, identity = entry
+            if expires_at > time.monotonic():
+                self._local.move_to_end(telegram_id)
+                self.stats["local_hits"] += 1
+                return identity
+            del self._local[telegram_id]
+
+        identity = await self._get_redis(telegram_id)
+        if identity is not None:
+            self.stats["redis_hits"] += 1
+            self._put_local(telegram_id, identity)
+            return identity
+
+        self.stats["misses"] += 1
+        loaders = getattr(session, "loaders", None)
+        if isinstance(loaders, SessionLoaders):
+            # ادغام با جستجوهای هم‌زمان آپدیت‌های دیگر
+            identity = await loaders.get(load_identities).load(telegram_id)
+        else:
+            identity = await self._load(session, telegram_id)
+        if identity is not None:
+            self._put_local(telegram_id, identity)
+            await self._set_redis(telegram_id, identity)
+        return identity
+
+    async def invalidate(self, telegram_id):
+        """حذف از هر دو سطح (و سطح اول workerهای دیگر)؛ پس از commit تغییر فراخوانی شود"""
+        telegram_id = int(telegram_id)
+        self._local.pop(telegram_id, None)
+        if self.redis is None:
+            return
+        try:
+            await self.redis.delete(self._key(telegram_id))
+        except RedisError as e:
+            logger.warning(f"Identity cache invalidation failed for {telegram_id}: {e}")
+        await invalidation_bus.publish(IDENTITY, telegram_id)
+
+    async def forget_local(self, telegram_id):
+        """حذف فقط از سطح اول (پیام invalidate از worker دیگر)"""
+        self._local.pop(int(telegram_id), None)
+
+    async def clear_local(self):
+        self._local.clear()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats, "local_size": len(self._local)}
+
+    # ---------- داخلی ----------
+
+    async def _load(self, session: AsyncSession, telegram_id: int) -> Optional[Identity]:
+        row = (await session.execute(identity_query().where(User.telegram_id == telegram_id))).first()
+        return Identity.from_row(row) if row is not None else None
+
+    def _put_local(self, telegram_id: int, identity: Identity):
+        self._local[telegram_id] = (time.monotonic() + self.local_ttl, identity)
+        self._local.move_to_end(telegram_id)
+        while len(self._local) > self.max_size:
+            self._local.popitem(last=False)
+
+    async def _get_redis(self, telegram_id: int) -> Optional[Identity]:
+        if self.redis is None:
+            return None
+        try:
+            raw = await self.redis.get(self._key(telegram_id))
+        except RedisError as e:
+            logger.warning(f"Identity cache unavailable: {e}")
+            return None
+        return Identity.from_json(raw) if raw is not None else None
+
+    async def _set_redis(self, telegram_id: int, identity: Identity):
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(self._key(telegram_id), identity.to_json(), ex=self.ttl)
+        except RedisError as e:
+            logger.warning(f"Identity cache unavailable: {e}")
+
+    @staticmethod
+    def _key(telegram_id: int) -> str:
+        return f"{KEY_PREFIX}:{telegram_id}"
+
+
+identity_cache = IdentityCache()
+invalidation_bus.register(IDENTITY, identity_cache.forget_local, resync=identity_cache.clear_local)
@@ -0,0 +1,158 @@
+import asyncio
+import json
+import logging
+import uuid
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from redis.exceptions import RedisError
+
+from database.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "invalidation"
+RECONNECT_DELAY = 1.0
+SUBSCRIBE_TIMEOUT = 10.0
+
+SUPPLIER = "supplier"
+SAVED_SEARCH = "saved_search"
+IDENTITY = "identity"
+
+
+class InvalidationBus:
+    """پخش تغییر داده‌های درون‌حافظه‌ای بین workerها با Redis pub/sub
+
+    هر worker ایندکس تأمین‌کنندگان، ایندکس جستجوهای ذخیره‌شده و سطح اول کش
+    هویت را جداگانه نگه می‌دارد. پروسه‌ای که تغییر را انجام داده آن را در
+    حافظه خودش اعمال و شناسه موجودیت را منتشر می‌کند؛ workerهای دیگر همان
+    ردیف را دوباره می‌خوانند یا حذف می‌کنند. پس از قطع اتصال، پیام‌های از
+    دست رفته با بارگذاری کامل (resync) جبران می‌شوند. بدون Redis (یک پروسه)
+    کاری انجام نمی‌دهد.
+    """
+
+    def __init__(self, channel: str = CHANNEL):
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self.subscribed = asyncio.Event()
+        self.stats = {"published": 0, "received": 0, "failed": 0, "resyncs": 0}
+        self._handlers: Dict[str, Callable[[int], Awaitable[None]]] = {}
+        self._resyncs: List[Callable[[], Awaitable[None]]] = []
+        self._held: Dict[str, Set[int]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def redis(self):
+        return get_redis()
+
+    def register(self, kind: str, handler: Callable[[int], Awaitable[None]], resync: Callable[[], Awaitable[None]] = None):
+        """ثبت تابع اعمال تغییر یک نوع موجودیت و (اختیاری) بارگذاری کامل آن"""
+        self._handlers[kind] = handler
+        if resync is not None:
+            self._resyncs.append(resync)
+
+    async def publish(self, kind: str, entity_id: int):
+        """اعلام تغییر به workerهای دیگر؛ پس از commit و اعمال محلی فراخوانی شود"""
+        if self.redis is None:
+            return
+        message = json.dumps({"origin": self.origin, "kind": kind, "id": int(entity_id)})
+        try:
+            await self.redis.publish(self.channel, message)
+            self.stats["published"] += 1
+        except RedisError as e:
+            logger.warning(f"Invalidation publish failed for {kind}:{entity_id}: {e}")
+
+    def start(self):
+        """شروع گوش دادن؛ پیش از بارگذاری ایندکس‌ها و همراه با wait_subscribed"""
+        if self._task is None and self.redis is not None:
+            # شناسه پس از fork ساخته می‌شود تا هر worker شناسه خودش را داشته باشد
+            self.origin = uuid.uuid4().hex
+            self._task = asyncio.create_task(self._run())
+
+    async def wait_subscribed(self, timeout: float = SUBSCRIBE_TIMEOUT):
+        """صبر تا subscribe شدن کانال تا تغییرات پس از آن از دست نروند"""
+        if self._task is not None:
+            await asyncio.wait_for(self.subscribed.wait(), timeout)
+
+    @asynccontextmanager
+    async def loading(self, kind: str):
+        """نگه داشتن پیام‌های یک نوع در حین بارگذاری کامل و اعمال آن‌ها پس از آن
+
+        تغییری که پس از شروع کوئری بارگذاری commit شده در نتیجه آن نیست و
+        handler هم تا آماده شدن ایندکس آن را نادیده می‌گیرد؛ پس شناسه‌ها
+        جمع و پس از بارگذاری دوباره خوانده می‌شوند.
+        """
+        self._held[kind] = held = set()
+        try:
+            yield
+        finally:
+            del self._held[kind]
+        for entity_id in held:
+            await self._apply(kind, entity_id)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.subscribed.clear()
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.stats)
+
+    # ---------- داخلی ----------
+
+    async def _run(self):
+        reconnecting = False
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                self.subscribed.set()
+                if reconnecting:
+                    await self._resync()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        await self._handle(message["data"])
+            except RedisError as e:
+                logger.warning(f"Invalidation channel lost, resubscribing: {e}")
+                self.subscribed.clear()
+                reconnecting = True
+                await asyncio.sleep(RECONNECT_DELAY)
+            finally:
+                await pubsub.aclose()
+
+    async def _handle(self, raw):
+        message = json.loads(raw)
+        if message["origin"] == self.origin:
+            return
+        kind, entity_id = message["kind"], message["id"]
+        if kind not in self._handlers:
+            return
+        self.stats["received"] += 1
+        held = self._held.get(kind)
+        if held is not None:
+            held.add(entity_id)
+        else:
+            await self._apply(kind, entity_id)
+
+    async def _apply(self, kind: str, entity_id: int):
+        try:
+            await self._handlers[kind](entity_id)
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.error(f"Invalidation of {kind}:{entity_id} failed: {e}")
+
+    async def _resync(self):
+        self.stats["resyncs"] += 1
+        for resync in self._resyncs:
+            try:
+                await resync()
+            except Exception as e:
+                logger.error(f"Invalidation resync failed: {e}")
+
+
+invalidation_bus = InvalidationBus()
@@ -0,0 +1,61 @@
+from typing import Optional
+
+# نگاشت حروف عربی و ارقام به معادل فارسی/لاتین؛ هر تغییری اینجا باید در
+# عبارت SQL ستون features_search (migration 004) هم اعمال شود
+ARABIC_LETTERS = "يكىةۀأإٱ"
+PERSIAN_LETTERS = "یکیههااا"
+NON_LATIN_DIGITS = "٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹"
+LATIN_DIGITS = "0123456789" * 2
+ZWNJ = "‌"
+# اعراب عربی و کشیده حذف می‌شوند
+REMOVED_CHARS = "ًٌٍَُِّْـ"
+
+_TEXT_TABLE = str.maketrans(
+    ARABIC_LETTERS + NON_LATIN_DIGITS + ZWNJ,
+    PERSIAN_LETTERS + LATIN_DIGITS + " ",
+    REMOVED_CHARS,
+)
+
+def normalize_text(text: Optional[str]) -> str:
+    """یکسان‌سازی متن فارسی برای جستجو (حروف عربی، ارقام، نیم‌فاصله، فاصله‌ها)"""
+    if not text:
+        return ""
+    return " ".join(text.translate(_TEXT_TABLE).lower().split())
+
+def sql_normalize_text(expression: str) -> str:
+    """معادل SQL تابع normalize_text (immutable، قابل استفاده در ستون محاسبه‌شده)"""
+    from_chars = ARABIC_LETTERS + NON_LATIN_DIGITS + ZWNJ + REMOVED_CHARS
+    to_chars = PERSIAN_LETTERS + LATIN_DIGITS + " "
+    return (
+        f"btrim(regexp_replace(lower(translate({expression}, '{from_chars}', '{to_chars}')), "
+        f"'\\s+', ' ', 'g'))"
+    )
+
+def trigrams(text: str) -> set:
+    """مجموعه سه‌حرفی‌های یک متن به روش pg_trgm"""
+    result = set()
+    for word in text.split():
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+def trigram_similarity(first: str, second: str) -> float:
+    """شباهت سه‌حرفی دو متن (معادل similarity در pg_trgm)"""
+    first_trigrams, second_trigrams = trigrams(first), trigrams(second)
+    if not first_trigrams or not second_trigrams:
+        return 0.0
+    shared = len(first_trigrams & second_trigrams)
+    return shared / (len(first_trigrams) + len(second_trigrams) - shared)
+
+# نام‌های جایگزین رایج شهرها پس از یکسان‌سازی
+PLACE_ALIASES = {
+    "طهران": "تهران",
+}
+
+def normalize_place(text: Optional[str]) -> str:
+    """کلید یکسان شهر/محله: علاوه بر normalize_text فاصله و نیم‌فاصله کاملاً حذف می‌شوند"""
+    folded = normalize_text(text).replace(" ", "")
+    for alias, canonical in PLACE_ALIASES.items():
+        if folded.startswith(alias):
+            folded = canonical + folded[len(alias):]
+    return folded
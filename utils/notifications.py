@@ -1,125 +1,167 @@
+from datetime import timedelta
+from typing import Any, List, Optional, Tuple
+
 from aiogram import Bot
 from aiogram.types import InlineKeyboardMarkup
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from database.models import User, Supplier, Demander, Request
-from keyboards.inline import get_request_action_keyboard
+from config.settings import settings
+from database.models import NotificationMode, RequestStatus, Supplier
+from keyboards.inline import get_inbox_keyboard, get_request_action_keyboard, get_saved_search_alert_keyboard
+from utils.outbox import OutboxDispatcher, enqueue, enqueue_batched, from_payload, to_payload
+from utils.requests import CreatedRequest, RequestTransition
+from utils.send_scheduler import NOTIFICATION, send_priority
 import logging
 
 logger = logging.getLogger(__name__)
 
-async def notify_supplier_new_request(
-    bot: Bot, 
-    session: AsyncSession, 
-    request: Request
-):
-    """ارسال نوتیفیکیشن به تأمین‌کننده برای درخواست جدید"""
-    try:
-        # دریافت اطلاعات تأمین‌کننده
-        supplier = request.supplier
-        user = supplier.user
-        
-        if not user.telegram_id:
-            logger.warning(f"No telegram_id for supplier {supplier.id}")
-            return
-        
-        # دریافت اطلاعات درخواست‌کننده
-        demander = request.demander
-        
-        text = f"""
+NEW_REQUEST = "new_request"
+NEW_REQUEST_DIGEST = "new_request_digest"
+REQUEST_ACCEPTED = "request_accepted"
+REQUEST_REJECTED = "request_rejected"
+
+# ---------- متن اعلان‌ها ----------
+
+def new_request_message(request: CreatedRequest) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+    """متن و کیبورد اعلان درخواست جدید به تأمین‌کننده"""
+    text = f"""
 🔔 درخواست جدید
 
-👤 از طرف: {demanderfull_name}
-🏢 رکت: {demander.company_name or '-'}
-📱 تمس: {demander.phone_number}
+👤 از طرف: {request.demander_name or '-'}
+🏢 شرکت: {request.demander_company or '-'}
+📱 تماس: {request.demander_phone or '-'}
 
-💬 یام:
+💬 پیام:
 {request.message}
 
-📅 زمان: {reques.created_at.strftime('%Y/%m/%d %H:%M')}
+📅 زمان: {request.created_at.strftime('%Y/%m/%d %H:%M')}
 """
-        
-        await bot.send_message(
-            chat_id=user.telegram_id,
-            text=text,
-            reply_markup=get_request_action_keyboard(request.id)
-        )
-        
-    except Exception as e:
-        logger.error(f"Error sending notification to supplier: {e}")
+    return text, get_request_action_keyboard(request.id)
 
-async def notify_demander_request_accepted(
-    bot: Bot,
-    session: AsyncSession,
-    request: Request
-):
-    """ارسال نوتیفیکیشن به درخواست‌کننده برای پذیرش درخواست"""
-    try:
-        demander = request.demander
-        user = demander.user
-        supplier = request.supplier
-        
-        if not user.telegram_id:
-            logger.warning(f"No telegram_id for demander {demander.id}")
-            return
-        
-        text = f"""
+def request_accepted_message(transition: RequestTransition) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+    """متن اعلان پذیرش درخواست به درخواست‌کننده"""
+    text = f"""
 ✅ درخواست شما پذیرفته شد!
 
-� تأمین‌کننده: {supplier.full_name}
-📱 شماره ماس: {supplier.phone_number}
-📍 مقعیت: {supplier.city} - {supplier.area}
+🎭 تأمین‌کننده: {transition.supplier_name}
+📱 شماره تماس: {transition.supplier_phone}
+📍 موقعیت: {transition.supplier_city} - {transition.supplier_area}
 
 برای هماهنگی جزئیات با ایشان تماس بگیرید.
 """
-        
-        if supplier.instagram_id:
-            text += f"\n📷اینستاگرام: @{supplier.instagram_id}"
-        
-        if request.response_message:
-            text += f"\n\n💬 پیا تأمین‌کننده:\n{request.response_message}"
-        
-        await bot.send_message(
-            chat_id=user.telegram_id,
-            text=text
+    
+    if transition.supplier_instagram:
+        text += f"\n📷 اینستاگرام: @{transition.supplier_instagram}"
+    
+    if transition.response_message:
+        text += f"\n\n💬 پیام تأمین‌کننده:\n{transition.response_message}"
+    
+    return text, None
+
+def request_rejected_message(transition: RequestTransition) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+    """متن اعلان رد درخواست به درخواست‌کننده"""
+    text = f"""
+❌ متأسفانه درخواست شما رد شد.
+
+🎭 تأمین‌کننده: {transition.supplier_name}
+
+می‌توانید تأمین‌کننده دیگری را جستجو کنید.
+"""
+    
+    if transition.response_message:
+        text += f"\n\n💬 پیام تأمین‌کننده:\n{transition.response_message}"
+    
+    return text, None
+
+DIGEST_MAX_ITEMS = 10
+DIGEST_PREVIEW_LENGTH = 60
+
+def new_request_digest_message(requests: List[CreatedRequest]) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+    """متن خلاصه چند درخواست جدید با یک دکمه به درخواست‌های دریافتی"""
+    if len(requests) == 1:
+        return new_request_message(requests[0])
+    
+    text = f"🔔 {len(requests)} درخواست جدید\n\n"
+    for i, request in enumerate(requests[:DIGEST_MAX_ITEMS], 1):
+        sender = request.demander_name or '-'
+        if request.demander_company:
+            sender += f" ({request.demander_company})"
+        preview = request.message[:DIGEST_PREVIEW_LENGTH]
+        text += f"{i}. {sender} — {request.created_at.strftime('%H:%M')}\n"
+        text += f"   💬 {preview}{'...' if len(request.message) > DIGEST_PREVIEW_LENGTH else ''}\n"
+    
+    if len(requests) > DIGEST_MAX_ITEMS:
+        text += f"\n... و {len(requests) - DIGEST_MAX_ITEMS} درخواست دیگر\n"
+    text += "\nبرای پاسخ، درخواست‌های دریافتی را باز کنید."
+    return text, get_inbox_keyboard()
+
+# نوع اعلان → (dataclass ذخیره‌شده در payload، سازنده متن)
+# سازنده نوع‌های BATCHED_NOTIFICATIONS فهرست همه اعلان‌های ادغام‌شده را می‌گیرد
+NOTIFICATIONS = {
+    NEW_REQUEST: (CreatedRequest, new_request_message),
+    NEW_REQUEST_DIGEST: (CreatedRequest, new_request_digest_message),
+    REQUEST_ACCEPTED: (RequestTransition, request_accepted_message),
+    REQUEST_REJECTED: (RequestTransition, request_rejected_message),
+}
+BATCHED_NOTIFICATIONS = {NEW_REQUEST_DIGEST}
+
+# ---------- صف اعلان‌ها (utils.outbox) ----------
+
+async def queue_supplier_new_request(session: AsyncSession, request: CreatedRequest):
+    """ثبت اعلان درخواست جدید در outbox؛ همراه با درخواست commit می‌شود
+
+    برای تأمین‌کنندگان حالت خلاصه، درخواست‌های NOTIFICATION_DIGEST_WINDOW ثانیه
+    در یک پیام ارسال می‌شوند.
+    """
+    if request.supplier_notification_mode == NotificationMode.DIGEST:
+        await enqueue_batched(
+            session, NEW_REQUEST_DIGEST, request.supplier_telegram_id, to_payload(request),
+            timedelta(seconds=settings.notification_digest_window)
         )
-        
-    except Exception as e:
-        logger.error(f"Error sending notification to demander: {e}")
+    else:
+        await enqueue(session, NEW_REQUEST, request.supplier_telegram_id, to_payload(request))
 
-async def notify_demander_request_rejected(
+async def queue_request_response(session: AsyncSession, transition: RequestTransition):
+    """ثبت اعلان پذیرش/رد درخواست در outbox؛ همراه با تغییر وضعیت commit می‌شود"""
+    kind = REQUEST_ACCEPTED if transition.status == RequestStatus.ACCEPTED else REQUEST_REJECTED
+    await enqueue(session, kind, transition.demander_telegram_id, to_payload(transition))
+
+async def deliver_notification(bot: Bot, kind: str, chat_id: int, payload: Any):
+    """ارسال یک اعلان outbox؛ خطا به dispatcher می‌رسد تا تلاش مجدد یا dead-letter شود"""
+    cls, render = NOTIFICATIONS[kind]
+    if kind in BATCHED_NOTIFICATIONS:
+        text, reply_markup = render([from_payload(cls, item) for item in payload])
+    else:
+        text, reply_markup = render(from_payload(cls, payload))
+    # اعلان‌ها بعد از پاسخ‌های تعاملی در صف ارسال قرار می‌گیرند
+    with send_priority(NOTIFICATION):
+        await bot.send_message(chat_id=chat_id, text=text, reply_markup=reply_markup)
+
+notification_dispatcher = OutboxDispatcher(deliver_notification, batch_kinds=BATCHED_NOTIFICATIONS)
+
+async def notify_demander_new_match(
     bot: Bot,
-    session: AsyncSession,
-    request: Request
+    telegram_id: int,
+    supplier: Supplier,
+    saved_search_id: int
 ):
-    """ارسال نوتیفیکیشن به درخواست‌کننده برای رد درخواست"""
+    """ارسال نوتیفیکیشن به درخواست‌کننده برای تأمین‌کننده جدید منطبق با جستجوی ذخیره‌شده"""
     try:
-        demander = request.demander
-        user = demander.user
-        supplier = request.supplier
-        
-        if not user.telegram_id:
-            logger.warning(f"No telegram_id for demander {demander.id}")
-            return
-        
         text = f"""
-❌ متأسفانه درخواست شما رد شد.
+🔔 تأمین‌کننده جدیدی با جستجوی ذخیره‌شده شما مطابقت دارد!
 
-🎭 تأین‌کننده: {supplier.full_name}
-
-می‌توانید تأمین‌کننده دیگری را جستجو کنید.
+👤 {supplier.full_name}
+📍 {supplier.city}
 """
         
-        if request.response_message:
-            text += f"\n\n� پیام تأمین‌کننده:\n{request.response_message}"
-        
-        await bot.send_message(
-            chat_id=user.telegram_id,
-            text=text
-        )
+        with send_priority(NOTIFICATION):
+            await bot.send_message(
+                chat_id=telegram_id,
+                text=text,
+                reply_markup=get_saved_search_alert_keyboard(supplier.id, saved_search_id)
+            )
         
     except Exception as e:
-        logger.error(f"Error sending notification to demander: {e}")
+        logger.error(f"Error sending search alert to {telegram_id}: {e}")
 
 async def send_reminder(
     bot: Bot,
@@ -129,10 +171,11 @@ async def send_reminder(
 ):
     """ارسال یادآوری عمومی"""
     try:
-        await bot.send_message(
-            chat_id=chat_id,
-            text=text,
-            reply_markup=reply_markup
-        )
+        with send_priority(NOTIFICATION):
+            await bot.send_message(
+                chat_id=chat_id,
+                text=text,
+                reply_markup=reply_markup
+            )
     except Exception as e:
         logger.error(f"Error sending reminder to {chat_id}: {e}")
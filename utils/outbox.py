@@ -0,0 +1,293 @@
+import asyncio
+import logging
+import time
+from dataclasses import asdict, fields
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Type, TypeVar, Union, get_args, get_origin, get_type_hints
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from sqlalchemy import delete, func, insert, literal_column, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.settings import settings
+from database.connection import AsyncSessionLocal
+from database.models import NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+SENT = "sent"
+DEAD = "dead"
+
+RETRY_BASE_SECONDS = 5
+RETRY_MAX_SECONDS = 3600
+PRUNE_INTERVAL = 3600
+PRUNE_BATCH_SIZE = 5000
+MAX_ERROR_LENGTH = 1000
+# خطاهایی که با تکرار برطرف نمی‌شوند (ربات مسدود شده، چت وجود ندارد)
+PERMANENT_ERRORS = (TelegramForbiddenError, TelegramBadRequest)
+
+T = TypeVar("T")
+
+
+# ---------- payload ----------
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def to_payload(obj) -> Dict[str, Any]:
+    """dataclass به dict قابل ذخیره در JSONB"""
+    return {name: _encode(value) for name, value in asdict(obj).items()}
+
+
+def from_payload(cls: Type[T], payload: Dict[str, Any]) -> T:
+    """ساخت دوباره dataclass از payload (datetime و enumها بر اساس type hint)
+
+    فیلدهایی که در payload قدیمی‌تر نیستند مقدار پیش‌فرض dataclass را می‌گیرند.
+    """
+    hints = get_type_hints(cls)
+    values = {}
+    for field in fields(cls):
+        if field.name not in payload:
+            continue
+        value = payload[field.name]
+        hint = hints[field.name]
+        if get_origin(hint) is Union:
+            hint = next(arg for arg in get_args(hint) if arg is not type(None))
+        if value is not None and hint is datetime:
+            value = datetime.fromisoformat(value)
+        elif value is not None and isinstance(hint, type) and issubclass(hint, Enum):
+            value = hint(value)
+        values[field.name] = value
+    return cls(**values)
+
+
+async def enqueue(session: AsyncSession, kind: str, chat_id: int, payload: Dict[str, Any]):
+    """ثبت اعلان در outbox در همان تراکنش فراخوانی‌کننده (با commit او ذخیره می‌شود)"""
+    await session.execute(insert(NotificationOutbox).values(kind=kind, chat_id=chat_id, payload=payload))
+
+
+def _status_is(status: str):
+    # literal (نه پارامتر) تا پلن‌های generic هم با ایندکس‌های جزئی WHERE status = '...' تطبیق داده شوند
+    return NotificationOutbox.status == literal_column(f"'{status}'")
+
+
+async def enqueue_batched(session: AsyncSession, kind: str, chat_id: int, payload: Dict[str, Any], window: timedelta):
+    """ثبت اعلانی که با اعلان‌های هم‌نوع همان چت در یک پیام ارسال می‌شود
+
+    اولین اعلان یک دسته برای window بعد زمان‌بندی می‌شود و اعلان‌های بعدی تا
+    پیش از برداشته شدن دسته (attempts = 0) همان زمان را می‌گیرند؛ dispatcher
+    ردیف‌های هم‌زمان یک چت را با هم برمی‌دارد (batch_kinds).
+    """
+    open_batch = (
+        select(func.min(NotificationOutbox.available_at))
+        .where(
+            NotificationOutbox.chat_id == chat_id,
+            NotificationOutbox.kind == kind,
+            _status_is(PENDING),
+            NotificationOutbox.attempts == 0,
+        )
+        .scalar_subquery()
+    )
+    await session.execute(
+        insert(NotificationOutbox).values(
+            kind=kind, chat_id=chat_id, payload=payload,
+            available_at=func.coalesce(open_batch, func.now() + window),
+        )
+    )
+
+
+def retry_delay(attempts: int) -> float:
+    """تأخیر نمایی پس از attempts تلاش ناموفق"""
+    return min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** max(0, attempts - 1))
+
+
+# ---------- dispatcher ----------
+
+class OutboxDispatcher:
+    """ارسال اعلان‌های outbox در پس‌زمینه با lease، تلاش مجدد و dead-letter
+
+    هر دور حداکثر batch_size ردیف آماده با FOR UPDATE SKIP LOCKED برداشته و
+    available_at آن‌ها به اندازه lease جلو برده می‌شود؛ پس چند worker هم‌زمان
+    ردیف تکراری برنمی‌دارند و ردیف پروسه‌ای که وسط ارسال متوقف شده پس از
+    lease دوباره ارسال می‌شود (حداقل یک بار). ارسال موفق ردیف را sent می‌کند،
+    خطای موقت آن را با تأخیر نمایی به صف برمی‌گرداند و خطای دائمی یا عبور از
+    max_attempts آن را dead می‌کند. ردیف‌های sent پس از retention پاک می‌شوند.
+    ردیف‌های برداشته‌شده از نوع‌های batch_kinds برای هر چت با هم و با فهرست
+    payloadها به deliver داده می‌شوند و نتیجه ارسال به همه آن‌ها اعمال می‌شود.
+    """
+
+    def __init__(
+        self,
+        deliver: Callable[[Bot, str, int, Any], Awaitable[None]],
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+        batch_size: int = None,
+        poll_interval: float = None,
+        max_attempts: int = None,
+        lease_seconds: int = None,
+        batch_kinds: Iterable[str] = (),
+    ):
+        self.deliver = deliver
+        self.batch_kinds = frozenset(batch_kinds)
+        self.session_factory = session_factory
+        self.batch_size = batch_size or settings.notification_batch_size
+        self.poll_interval = poll_interval or settings.notification_poll_interval
+        self.max_attempts = max_attempts or settings.notification_max_attempts
+        self.lease = timedelta(seconds=lease_seconds or settings.notification_lease_seconds)
+        self.stats = {"claimed": 0, "sent": 0, "retried": 0, "dead": 0}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, bot: Bot):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(bot))
+
+    async def stop(self):
+        """توقف dispatcher؛ ردیف‌های در حال ارسال پس از پایان lease دوباره ارسال می‌شوند"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self):
+        """بررسی فوری outbox پس از commit یک اعلان جدید (به جای انتظار تا دور بعدی)"""
+        self._wakeup.set()
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.stats)
+
+    async def run_once(self, bot: Bot) -> int:
+        """یک دور برداشتن و ارسال؛ تعداد ردیف‌های برداشته‌شده"""
+        rows = await self._claim()
+        if not rows:
+            return 0
+        self.stats["claimed"] += len(rows)
+
+        groups = self._group(rows)
+        results = await asyncio.gather(
+            *(
+                self.deliver(bot, group[0].kind, group[0].chat_id, [row.payload for row in group] if batched else group[0].payload)
+                for batched, group in groups
+            ),
+            return_exceptions=True,
+        )
+        sent_ids, failures = [], []
+        for (_, group), result in zip(groups, results):
+            if isinstance(result, BaseException):
+                failures.extend((row, result) for row in group)
+            else:
+                sent_ids.extend(row.id for row in group)
+        await self._record(sent_ids, failures)
+        return len(rows)
+
+    async def prune(self, retention_days: int = None) -> int:
+        """حذف دسته‌ای ردیف‌های ارسال‌شده قدیمی‌تر از retention"""
+        retention = timedelta(days=retention_days or settings.notification_retention_days)
+        deleted = 0
+        while True:
+            expired = (
+                select(NotificationOutbox.id)
+                .where(_status_is(SENT), NotificationOutbox.sent_at < func.now() - retention)
+                .limit(PRUNE_BATCH_SIZE)
+            )
+            async with self.session_factory() as session:
+                result = await session.execute(
+                    delete(NotificationOutbox).where(NotificationOutbox.id.in_(expired))
+                    .execution_options(synchronize_session=False)
+                )
+                await session.commit()
+            deleted += result.rowcount
+            if result.rowcount < PRUNE_BATCH_SIZE:
+                return deleted
+
+    # ---------- داخلی ----------
+
+    def _group(self, rows: List[Any]) -> List[Tuple[bool, List[Any]]]:
+        """(batched, ردیف‌ها) برای هر ارسال؛ نوع‌های batch_kinds بر اساس (kind, chat_id) ادغام می‌شوند"""
+        groups: Dict[Any, Tuple[bool, List[Any]]] = {}
+        for row in rows:
+            batched = row.kind in self.batch_kinds
+            key = (row.kind, row.chat_id) if batched else row.id
+            groups.setdefault(key, (batched, []))[1].append(row)
+        return list(groups.values())
+
+    async def _claim(self) -> List[Any]:
+        ready = (
+            select(NotificationOutbox.id)
+            .where(_status_is(PENDING), NotificationOutbox.available_at <= func.now())
+            .order_by(NotificationOutbox.available_at, NotificationOutbox.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            update(NotificationOutbox)
+            .where(NotificationOutbox.id.in_(ready))
+            .values(available_at=func.now() + self.lease, attempts=NotificationOutbox.attempts + 1)
+            .returning(
+                NotificationOutbox.id, NotificationOutbox.kind, NotificationOutbox.chat_id,
+                NotificationOutbox.payload, NotificationOutbox.attempts,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        async with self.session_factory() as session:
+            rows = (await session.execute(stmt)).all()
+            await session.commit()
+        return rows
+
+    async def _record(self, sent_ids: List[int], failures: List[Tuple[Any, BaseException]]):
+        async with self.session_factory() as session:
+            if sent_ids:
+                await session.execute(
+                    update(NotificationOutbox)
+                    .where(NotificationOutbox.id.in_(sent_ids))
+                    .values(status=SENT, sent_at=func.now(), last_error=None)
+                    .execution_options(synchronize_session=False)
+                )
+            for row, error in failures:
+                values = {"last_error": f"{type(error).__name__}: {error}"[:MAX_ERROR_LENGTH]}
+                if isinstance(error, PERMANENT_ERRORS) or row.attempts >= self.max_attempts:
+                    values["status"] = DEAD
+                    self.stats["dead"] += 1
+                    logger.error(f"Notification {row.id} ({row.kind} to {row.chat_id}) dead after {row.attempts} attempts: {error}")
+                else:
+                    values["available_at"] = func.now() + timedelta(seconds=retry_delay(row.attempts))
+                    self.stats["retried"] += 1
+                    logger.warning(f"Notification {row.id} ({row.kind} to {row.chat_id}) failed, will retry: {error}")
+                await session.execute(
+                    update(NotificationOutbox).where(NotificationOutbox.id == row.id).values(**values)
+                    .execution_options(synchronize_session=False)
+                )
+            await session.commit()
+        self.stats["sent"] += len(sent_ids)
+
+    async def _run(self, bot: Bot):
+        last_prune = 0.0
+        while True:
+            claimed = 0
+            try:
+                claimed = await self.run_once(bot)
+                if time.monotonic() - last_prune > PRUNE_INTERVAL:
+                    last_prune = time.monotonic()
+                    await self.prune()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification dispatcher error: {e}")
+
+            # دسته کامل یعنی احتمالاً ردیف آماده دیگری هست
+            if claimed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
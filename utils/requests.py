@@ -0,0 +1,236 @@
+import math
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import func, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import Demander, NotificationMode, Request, RequestStatus, Supplier, User
+
+REQUESTS_PAGE_SIZE = 10
+MESSAGE_PREVIEW_LENGTH = 200
+RESPONSE_PREVIEW_LENGTH = 50
+
+
+@dataclass(frozen=True, slots=True)
+class RequestListItem:
+    """یک سطر از لیست درخواست‌ها با نام طرف مقابل (بدون بارگذاری مدل‌ها)"""
+    id: int
+    status: RequestStatus
+    created_at: datetime
+    counterpart_name: Optional[str]
+    message_preview: str
+    message_truncated: bool
+    response_preview: Optional[str] = None
+
+
+@dataclass(frozen=True, slots=True)
+class RequestPage:
+    items: List[RequestListItem]
+    page: int
+    total: int
+    page_size: int
+
+    @property
+    def total_pages(self) -> int:
+        return max(1, math.ceil(self.total / self.page_size))
+
+
+def _preview(column, length: int):
+    # یک کاراکتر بیشتر تا کوتاه شدن متن مشخص شود
+    return func.left(func.coalesce(column, ""), length + 1)
+
+
+def page_query(base, page: int, page_size: int = REQUESTS_PAGE_SIZE):
+    """یک صفحه از کوئری لیست؛ تعداد کل با count() OVER () در همان کوئری محاسبه می‌شود
+
+    ترتیب created_at DESC, id DESC با ایندکس‌های ix_requests_supplier_status_created
+    و ix_requests_demander_created یکی است.
+    """
+    return (
+        base.add_columns(func.count().over().label("total"))
+        .order_by(Request.created_at.desc(), Request.id.desc())
+        .limit(page_size)
+        .offset((max(1, page) - 1) * page_size)
+    )
+
+
+async def _fetch_page(session: AsyncSession, base, page: int, page_size: int) -> RequestPage:
+    """اجرای کوئری لیست و ساخت RequestPage"""
+    page = max(1, page)
+    rows = (await session.execute(page_query(base, page, page_size))).all()
+    if not rows and page > 1:
+        # صفحه قدیمی که دیگر وجود ندارد (مثلاً پس از پاسخ به درخواست‌ها)
+        return await _fetch_page(session, base, 1, page_size)
+
+    items = [
+        RequestListItem(
+            id=row.id,
+            status=row.status,
+            created_at=row.created_at,
+            counterpart_name=row.counterpart_name,
+            message_preview=row.message_preview[:MESSAGE_PREVIEW_LENGTH],
+            message_truncated=len(row.message_preview) > MESSAGE_PREVIEW_LENGTH,
+            response_preview=row.response_preview,
+        )
+        for row in rows
+    ]
+    return RequestPage(items, page, rows[0].total if rows else 0, page_size)
+
+
+async def list_supplier_inbox(
+    session: AsyncSession,
+    supplier_id: int,
+    page: int = 1,
+    status: Optional[RequestStatus] = RequestStatus.PENDING,
+    page_size: int = REQUESTS_PAGE_SIZE,
+) -> RequestPage:
+    """درخواست‌های دریافتی تأمین‌کننده، جدیدترین اول، با نام درخواست‌کننده در یک کوئری"""
+    return await _fetch_page(session, supplier_inbox_query(supplier_id, status), page, page_size)
+
+
+def supplier_inbox_query(supplier_id: int, status: Optional[RequestStatus] = RequestStatus.PENDING):
+    """کوئری پایه inbox تأمین‌کننده (بدون صفحه‌بندی)"""
+    stmt = (
+        select(
+            Request.id,
+            Request.status,
+            Request.created_at,
+            Demander.full_name.label("counterpart_name"),
+            _preview(Request.message, MESSAGE_PREVIEW_LENGTH).label("message_preview"),
+            func.left(Request.response_message, RESPONSE_PREVIEW_LENGTH).label("response_preview"),
+        )
+        .outerjoin(Demander, Demander.id == Request.demander_id)
+        .where(Request.supplier_id == supplier_id)
+    )
+    if status is not None:
+        stmt = stmt.where(Request.status == status)
+    return stmt
+
+
+async def list_demander_outbox(
+    session: AsyncSession,
+    demander_id: int,
+    page: int = 1,
+    page_size: int = REQUESTS_PAGE_SIZE,
+) -> RequestPage:
+    """درخواست‌های ارسالی درخواست‌کننده، جدیدترین اول، با نام تأمین‌کننده در یک کوئری"""
+    return await _fetch_page(session, demander_outbox_query(demander_id), page, page_size)
+
+
+def demander_outbox_query(demander_id: int):
+    """کوئری پایه outbox درخواست‌کننده (بدون صفحه‌بندی)"""
+    return (
+        select(
+            Request.id,
+            Request.status,
+            Request.created_at,
+            Supplier.full_name.label("counterpart_name"),
+            _preview(Request.message, MESSAGE_PREVIEW_LENGTH).label("message_preview"),
+            func.left(Request.response_message, RESPONSE_PREVIEW_LENGTH).label("response_preview"),
+        )
+        .outerjoin(Supplier, Supplier.id == Request.supplier_id)
+        .where(Request.demander_id == demander_id)
+    )
+
+
+# ---------- تغییر وضعیت اتمیک ----------
+
+@dataclass(frozen=True, slots=True)
+class CreatedRequest:
+    """درخواست ثبت‌شده به همراه اطلاعات لازم برای اعلان به تأمین‌کننده"""
+    id: int
+    created_at: datetime
+    message: str
+    supplier_telegram_id: int
+    demander_name: Optional[str]
+    demander_company: Optional[str]
+    demander_phone: Optional[str]
+    supplier_notification_mode: NotificationMode = NotificationMode.IMMEDIATE
+
+
+@dataclass(frozen=True, slots=True)
+class RequestTransition:
+    """نتیجه یک تغییر وضعیت موفق به همراه اطلاعات لازم برای اعلان به درخواست‌کننده"""
+    id: int
+    status: RequestStatus
+    response_message: Optional[str]
+    demander_telegram_id: int
+    supplier_name: str
+    supplier_phone: Optional[str]
+    supplier_city: Optional[str]
+    supplier_area: Optional[str]
+    supplier_instagram: Optional[str]
+
+
+async def create_request(session: AsyncSession, demander_id: int, supplier_id: int, message: str) -> Optional[CreatedRequest]:
+    """ثبت درخواست در یک رفت‌وبرگشت؛ اگر درخواست در انتظار دیگری برای همین جفت باشد None
+
+    INSERT ... ON CONFLICT DO NOTHING روی ایندکس یکتای جزئی uq_requests_pending_pair
+    دوبار زدن دکمه را بدون قفل یا تلاش مجدد بی‌اثر می‌کند. فراخوانی‌کننده commit می‌کند.
+    """
+    inserted = (
+        pg_insert(Request)
+        .values(demander_id=demander_id, supplier_id=supplier_id, message=message, status=RequestStatus.PENDING)
+        .on_conflict_do_nothing(
+            index_elements=[Request.demander_id, Request.supplier_id],
+            # باید literal باشد تا PostgreSQL ایندکس جزئی را استنتاج کند
+            index_where=text("status = 'pending'"),
+        )
+        .returning(Request.id, Request.created_at, Request.message, Request.demander_id, Request.supplier_id)
+        .cte("inserted")
+    )
+    SupplierUser = User.__table__.alias("supplier_user")
+    stmt = (
+        select(
+            inserted.c.id, inserted.c.created_at, inserted.c.message,
+            SupplierUser.c.telegram_id, Demander.full_name, Demander.company_name, Demander.phone_number,
+            Supplier.notification_mode,
+        )
+        .select_from(inserted)
+        .join(Supplier, Supplier.id == inserted.c.supplier_id)
+        .join(SupplierUser, SupplierUser.c.id == Supplier.user_id)
+        .join(Demander, Demander.id == inserted.c.demander_id)
+    )
+    row = (await session.execute(stmt)).first()
+    return CreatedRequest(*row[:-1], NotificationMode(row[-1])) if row is not None else None
+
+
+async def transition_request(
+    session: AsyncSession,
+    request_id: int,
+    supplier_id: int,
+    status: RequestStatus,
+    response_message: Optional[str] = None,
+) -> Optional[RequestTransition]:
+    """پذیرش یا رد درخواست با یک UPDATE ... WHERE status = 'pending' RETURNING
+
+    فقط اولین کلیک برنده می‌شود؛ اگر درخواست وجود نداشته باشد، متعلق به این
+    تأمین‌کننده نباشد یا قبلاً پاسخ داده شده باشد None برمی‌گردد. اطلاعات
+    اعلان در همان کوئری (CTE) خوانده می‌شود. فراخوانی‌کننده commit می‌کند.
+    """
+    updated = (
+        update(Request)
+        .where(
+            Request.id == request_id,
+            Request.supplier_id == supplier_id,
+            Request.status == RequestStatus.PENDING,
+        )
+        .values(status=status, response_message=response_message, updated_at=func.now())
+        .returning(Request.id, Request.status, Request.response_message, Request.demander_id, Request.supplier_id)
+        .cte("updated")
+    )
+    stmt = (
+        select(
+            updated.c.id, updated.c.status, updated.c.response_message, User.telegram_id,
+            Supplier.full_name, Supplier.phone_number, Supplier.city, Supplier.area, Supplier.instagram_id,
+        )
+        .select_from(updated)
+        .join(Demander, Demander.id == updated.c.demander_id)
+        .join(User, User.id == Demander.user_id)
+        .join(Supplier, Supplier.id == updated.c.supplier_id)
+    )
+    row = (await session.execute(stmt)).first()
+    return RequestTransition(*row) if row is not None else None
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import BigInteger, DateTime, Integer, column, insert, select, values
+from sqlalchemy.dialects.postgresql import JSONB
+
+from config.settings import settings
+from database.connection import AsyncSessionLocal
+from database.models import Demander, SearchHistory, User
+from search.cache import to_json_criteria
+
+logger = logging.getLogger(__name__)
+
+
+class SearchHistoryWriter:
+    """ثبت غیرهمزمان و دسته‌ای تاریخچه جستجوها
+
+    record() فقط رکورد را در صف درون‌پروسه‌ای می‌گذارد و هیچ رفت‌وبرگشتی به
+    دیتابیس اضافه نمی‌کند. یک task پس‌زمینه هر batch_size رکورد یا هر
+    flush_ms میلی‌ثانیه همه را با یک INSERT چندردیفی ذخیره می‌کند. اگر صف پر
+    باشد رکورد دور ریخته و شمرده می‌شود.
+    """
+
+    def __init__(self, batch_size: int = None, flush_ms: int = None, queue_size: int = None):
+        self.batch_size = batch_size or settings.search_history_batch_size
+        self.flush_interval = (flush_ms or settings.search_history_flush_ms) / 1000
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or settings.search_history_queue_size)
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, telegram_id: int, search_criteria: dict, results_count: int):
+        """افزودن یک جستجو به صف (بدون انتظار)"""
+        entry = {
+            'telegram_id': int(telegram_id),
+            'search_criteria': to_json_criteria(search_criteria),
+            'results_count': int(results_count),
+            'created_at': datetime.utcnow(),
+        }
+        try:
+            self.queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return
+        self.enqueued += 1
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """توقف task و ذخیره رکوردهای باقی‌مانده در صف"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        while not self.queue.empty():
+            await self._flush(self._drain(self.batch_size))
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "written": self.written,
+            "failed": self.failed,
+            "pending": self.queue.qsize(),
+        }
+
+    # ---------- داخلی ----------
+
+    async def _run(self):
+        while True:
+            batch = [await self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            try:
+                while len(batch) < self.batch_size:
+                    batch.extend(self._drain(self.batch_size - len(batch)))
+                    timeout = deadline - time.monotonic()
+                    if len(batch) >= self.batch_size or timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                # دسته نیمه‌کاره هنگام توقف از دست نرود
+                await self._flush(batch)
+                raise
+            await self._flush(batch)
+
+    def _drain(self, limit: int) -> List[dict]:
+        batch = []
+        while len(batch) < limit and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _flush(self, batch: List[dict]):
+        if not batch:
+            return
+        try:
+            await self._write(batch)
+        except Exception as e:
+            # تاریخچه جستجو فقط برای آمار است؛ خطا نباید task را متوقف کند
+            self.failed += len(batch)
+            logger.error(f"Failed to write {len(batch)} search history records: {e}")
+            return
+        self.written += len(batch)
+
+    async def _write(self, batch: List[dict]):
+        """یک INSERT ... SELECT برای کل دسته؛ demander_id از روی telegram_id پیدا می‌شود"""
+        rows = values(
+            column('telegram_id', BigInteger),
+            column('search_criteria', JSONB),
+            column('results_count', Integer),
+            column('created_at', DateTime),
+            name='batch',
+        ).data([
+            (entry['telegram_id'], entry['search_criteria'], entry['results_count'], entry['created_at'])
+            for entry in batch
+        ])
+        stmt = insert(SearchHistory).from_select(
+            ['demander_id', 'search_criteria', 'results_count', 'created_at'],
+            select(Demander.id, rows.c.search_criteria, rows.c.results_count, rows.c.created_at)
+            .select_from(rows)
+            .join(User, User.telegram_id == rows.c.telegram_id)
+            .join(Demander, Demander.user_id == User.id)
+        )
+        async with AsyncSessionLocal() as session:
+            await session.execute(stmt)
+            await session.commit()
+
+
+search_history_writer = SearchHistoryWriter()
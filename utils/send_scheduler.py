@@ -0,0 +1,282 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Optional, Union
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+from aiogram.methods import TelegramMethod
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# اولویت کمتر زودتر ارسال می‌شود
+INTERACTIVE = 0
+NOTIFICATION = 1
+BROADCAST = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", NOTIFICATION: "notification", BROADCAST: "broadcast"}
+
+WAIT_SAMPLES = 1000
+MAX_IDLE_CHATS = 10000
+RETRY_BACKOFF = 0.5
+
+_send_priority: ContextVar[int] = ContextVar("send_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def send_priority(priority: int):
+    """اولویت ارسال‌های داخل بلوک (مثلاً NOTIFICATION برای اعلان‌ها)"""
+    token = _send_priority.set(priority)
+    try:
+        yield
+    finally:
+        _send_priority.reset(token)
+
+
+class TokenBucket:
+    """سطل توکن با rate توکن در ثانیه و ظرفیت capacity"""
+    __slots__ = ("rate", "capacity", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+        self.blocked_until = 0.0
+
+    def delay(self, now: float) -> float:
+        """ثانیه‌های باقی‌مانده تا در دسترس بودن یک توکن"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def consume(self):
+        self.tokens -= 1
+
+    def block(self, until: float):
+        """توقف کامل تا زمان داده‌شده (retry_after)"""
+        self.blocked_until = max(self.blocked_until, until)
+
+    def idle(self, now: float) -> bool:
+        return self.delay(now) == 0 and self.tokens >= self.capacity
+
+
+@dataclass
+class _Waiter:
+    chat_id: Union[int, str]
+    future: asyncio.Future
+    enqueued: float
+
+
+class SendScheduler:
+    """زمان‌بندی ارسال پیام‌ها با بودجه سراسری و بودجه هر چت
+
+    هر ارسال (پاسخ، ویرایش یا اعلان) قبل از رفتن به Bot API یک توکن از سطل
+    سراسری و یک توکن از سطل همان چت می‌گیرد. صف‌ها به ترتیب اولویت بررسی
+    می‌شوند و چتی که بودجه‌اش تمام شده ارسال‌های بقیه را معطل نمی‌کند. بودجه‌ها
+    درون‌پروسه‌ای هستند؛ با چند worker نرخ سراسری بین آن‌ها تقسیم می‌شود. تا
+    start() صدا زده نشود ارسال‌ها بدون انتظار انجام می‌شوند.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = None,
+        chat_rate: float = None,
+        group_rate: float = None,
+        chat_burst: int = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        workers = settings.webhook_workers if settings.use_webhook else 1
+        self.global_rate = global_rate or settings.send_global_rate / max(1, workers)
+        self.chat_rate = chat_rate or settings.send_chat_rate
+        self.group_rate = group_rate or settings.send_group_rate_per_minute / 60
+        self.chat_burst = chat_burst or settings.send_chat_burst
+        self.clock = clock
+        self.global_bucket = TokenBucket(self.global_rate, max(1.0, self.global_rate), clock())
+        self.stats = {"sent": 0, "retries": 0, "retry_after": 0, "failed": 0}
+        self._chats: Dict[Union[int, str], TokenBucket] = {}
+        self._queues: Dict[int, Deque[_Waiter]] = {}
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """توقف زمان‌بندی؛ ارسال‌های در انتظار بدون محدودیت آزاد می‌شوند"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for queue in self._queues.values():
+            for waiter in queue:
+                if not waiter.future.done():
+                    waiter.future.set_result(None)
+        self._queues.clear()
+
+    async def acquire(self, chat_id: Union[int, str], priority: int = None):
+        """انتظار تا رسیدن نوبت ارسال به این چت"""
+        if self._task is None:
+            return
+        priority = _send_priority.get() if priority is None else priority
+
+        now = self.clock()
+        if not any(self._queues.values()) and self._try_consume(chat_id, now) is None:
+            self._waits.append(0.0)
+            return
+
+        waiter = _Waiter(chat_id, asyncio.get_running_loop().create_future(), self.clock())
+        self._queues.setdefault(priority, deque()).append(waiter)
+        self._wakeup.set()
+        try:
+            await waiter.future
+        finally:
+            self._waits.append(self.clock() - waiter.enqueued)
+
+    def record_retry_after(self, chat_id: Union[int, str], retry_after: float):
+        """توقف ارسال به چت تا پایان retry_after اعلام‌شده توسط تلگرام"""
+        self.stats["retry_after"] += 1
+        self._bucket(chat_id).block(self.clock() + retry_after)
+
+    def get_stats(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+
+        def percentile(p: float) -> float:
+            return round(waits[min(len(waits) - 1, int(p / 100 * len(waits)))] * 1000, 1) if waits else 0.0
+
+        return {
+            **self.stats,
+            "queue_depth": {name: len(self._queues.get(priority, ())) for priority, name in PRIORITY_NAMES.items()},
+            "wait_p50_ms": percentile(50),
+            "wait_p95_ms": percentile(95),
+            "wait_max_ms": round(waits[-1] * 1000, 1) if waits else 0.0,
+            "chats": len(self._chats),
+        }
+
+    # ---------- داخلی ----------
+
+    def _bucket(self, chat_id: Union[int, str]) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            # شناسه منفی یا @username یعنی گروه/کانال
+            is_group = not isinstance(chat_id, int) or chat_id < 0
+            rate = self.group_rate if is_group else self.chat_rate
+            bucket = self._chats[chat_id] = TokenBucket(rate, self.chat_burst, self.clock())
+        return bucket
+
+    def _try_consume(self, chat_id: Union[int, str], now: float) -> Optional[float]:
+        """گرفتن توکن سراسری و توکن چت؛ در صورت نبود، زمان انتظار برمی‌گردد"""
+        global_delay = self.global_bucket.delay(now)
+        chat_bucket = self._bucket(chat_id)
+        chat_delay = chat_bucket.delay(now)
+        if global_delay or chat_delay:
+            return max(global_delay, chat_delay)
+        self.global_bucket.consume()
+        chat_bucket.consume()
+        return None
+
+    def _grant(self) -> Optional[float]:
+        """آزاد کردن ارسال‌هایی که توکن دارند؛ خروجی زمان تا بررسی بعدی (None یعنی صف خالی)"""
+        now = self.clock()
+        next_check = None
+        for priority in sorted(self._queues):
+            queue = self._queues[priority]
+            for waiter in list(queue):
+                if waiter.future.done():
+                    queue.remove(waiter)
+                    continue
+                global_delay = self.global_bucket.delay(now)
+                if global_delay:
+                    # بودجه سراسری تمام شده؛ اولین توکن بعدی به بالاترین اولویت می‌رسد
+                    return global_delay
+                delay = self._try_consume(waiter.chat_id, now)
+                if delay is None:
+                    queue.remove(waiter)
+                    waiter.future.set_result(None)
+                else:
+                    next_check = delay if next_check is None else min(next_check, delay)
+
+        if len(self._chats) > MAX_IDLE_CHATS:
+            waiting = {waiter.chat_id for queue in self._queues.values() for waiter in queue}
+            for chat_id in [chat_id for chat_id, bucket in self._chats.items() if chat_id not in waiting and bucket.idle(now)]:
+                del self._chats[chat_id]
+        return next_check
+
+    async def _run(self):
+        while True:
+            # clear قبل از _grant تا درخواستی که در این فاصله می‌رسد بیدارباش را از دست ندهد
+            self._wakeup.clear()
+            try:
+                timeout = self._grant()
+            except Exception as e:
+                logger.error(f"Send scheduler error: {e}")
+                timeout = 1.0
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+send_scheduler = SendScheduler()
+
+
+class SendSchedulerMiddleware(BaseRequestMiddleware):
+    """middleware session ربات: زمان‌بندی و تلاش مجدد همه متدهای دارای chat_id
+
+    ارسال و ویرایش پیام (message.answer، edit_text، bot.send_message و ...)
+    از SendScheduler عبور می‌کنند؛ متدهای بدون chat_id مانند getUpdates و
+    answerCallbackQuery مستقیم ارسال می‌شوند. پس از TelegramRetryAfter ارسال
+    به آن چت تا پایان retry_after متوقف و پس از خطای شبکه یا 5xx با تأخیر
+    نمایی دوباره تلاش می‌شود.
+    """
+
+    def __init__(self, scheduler: SendScheduler = send_scheduler, max_retries: int = None, backoff: float = RETRY_BACKOFF):
+        self.scheduler = scheduler
+        self.max_retries = settings.send_max_retries if max_retries is None else max_retries
+        self.backoff = backoff
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot: Bot, method: TelegramMethod):
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        attempt = 0
+        while True:
+            await self.scheduler.acquire(chat_id)
+            try:
+                result = await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.scheduler.record_retry_after(chat_id, e.retry_after)
+                error, delay = e, e.retry_after if not self.scheduler.running else 0
+            except (TelegramNetworkError, TelegramServerError) as e:
+                error, delay = e, self.backoff * 2 ** attempt
+            else:
+                self.scheduler.stats["sent"] += 1
+                return result
+
+            if attempt >= self.max_retries:
+                self.scheduler.stats["failed"] += 1
+                raise error
+            attempt += 1
+            self.scheduler.stats["retries"] += 1
+            logger.warning(f"{type(method).__name__} to {chat_id} failed ({error}); retry {attempt}/{self.max_retries}")
+            if delay:
+                await asyncio.sleep(delay)
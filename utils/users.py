@@ -1,16 +1,17 @@
+from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from database.models import User, UserRole
+from sqlalchemy import select, true, update
+from database.models import NotificationMode, Supplier, User, UserRole
 
 async def get_or_create_user(session: AsyncSession, telegram_user, role: UserRole) -> User:
     """دریافت یا ایجاد کاربر"""
-    stmt = select(User).where(User.telegram_id == str(telegram_user.id))
+    stmt = select(User).where(User.telegram_id == telegram_user.id)
     result = await session.execute(stmt)
     user = result.scalar_one_or_none()
     
     if not user:
         user = User(
-            telegram_id=str(telegram_user.id),
+            telegram_id=telegram_user.id,
             username=telegram_user.username,
             role=role
         )
@@ -18,3 +19,47 @@ async def get_or_create_user(session: AsyncSession, telegram_user, role: UserRol
         await session.flush()
     
     return user
+
+async def set_supplier_active(session: AsyncSession, supplier_id: int, is_active: bool) -> Optional[Supplier]:
+    """فعال/غیرفعال کردن پروفایل تأمین‌کننده
+
+    users.is_active و کپی آن در suppliers.is_active (که جستجو و ایندکس‌های
+    جزئی روی آن هستند) با هم تغییر می‌کنند. فراخوانی‌کننده commit می‌کند.
+    """
+    result = await session.execute(
+        update(Supplier)
+        .where(Supplier.id == supplier_id)
+        .values(is_active=is_active)
+        .returning(Supplier)
+    )
+    supplier = result.scalar_one_or_none()
+    if supplier is not None:
+        await session.execute(update(User).where(User.id == supplier.user_id).values(is_active=is_active))
+    return supplier
+
+async def set_supplier_notification_mode(session: AsyncSession, supplier_id: int, mode: NotificationMode) -> Optional[Supplier]:
+    """تغییر نحوه اعلان درخواست‌های جدید (فوری یا خلاصه)؛ فراخوانی‌کننده commit می‌کند"""
+    result = await session.execute(
+        update(Supplier)
+        .where(Supplier.id == supplier_id)
+        .values(notification_mode=mode.value)
+        .returning(Supplier)
+    )
+    return result.scalar_one_or_none()
+
+async def deactivate_users(session: AsyncSession, user_ids: List[int]) -> List[Supplier]:
+    """غیرفعال کردن دسته‌ای کاربران (مثلاً کاربرانی که ربات را مسدود کرده‌اند)
+
+    تأمین‌کنندگانی که تازه غیرفعال شده‌اند برگردانده می‌شوند تا فراخوانی‌کننده
+    پس از commit آن‌ها را از ایندکس و کش جستجو حذف کند.
+    """
+    if not user_ids:
+        return []
+    await session.execute(update(User).where(User.id.in_(user_ids)).values(is_active=False))
+    result = await session.execute(
+        update(Supplier)
+        .where(Supplier.user_id.in_(user_ids), Supplier.is_active == true())
+        .values(is_active=False)
+        .returning(Supplier)
+    )
+    return list(result.scalars())